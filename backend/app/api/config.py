@@ -1,5 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends
+from sqlmodel import Session
+from app.database import get_session
 from app.services.llm.client import llm_client
+from app.services.score_cache import score_cache
+from app.services.extraction_cache import extraction_cache
 from app.schemas.config import LLMConfig
 from typing import List
 
@@ -30,3 +34,18 @@ async def list_llm_models():
 async def get_llm_status():
     """Check LLM provider health status."""
     return await llm_client.check_health()
+
+@router.get("/llm/stats", response_model=dict)
+async def get_llm_stats():
+    """Rate limiter state and throttle/retry counters."""
+    return llm_client.get_stats()
+
+@router.get("/score-cache", response_model=dict)
+async def get_score_cache_stats(db: Session = Depends(get_session)):
+    """Score cache size and hit/miss statistics (hit counters reset on restart)."""
+    return score_cache.stats(db)
+
+@router.get("/extraction-cache", response_model=dict)
+async def get_extraction_cache_stats(db: Session = Depends(get_session)):
+    """Extraction cache size and hit/miss statistics (hit counters reset on restart)."""
+    return extraction_cache.stats(db)
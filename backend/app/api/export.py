@@ -8,6 +8,7 @@ import os
 from app.database import get_session
 from app.models.session import ScreeningSession
 from app.models.candidate import Candidate
+from app.services.file_store import candidate_file_path
 
 router = APIRouter(prefix="/screening", tags=["export"])
 
@@ -74,9 +75,7 @@ async def get_resume_pdf(
     if not candidate or candidate.session_id != session_id:
         raise HTTPException(status_code=404, detail="Candidate not found")
 
-    # Get the file path
-    upload_dir = f"../data/uploads/{session_id}"
-    file_path = os.path.join(upload_dir, candidate.filename)
+    file_path = candidate_file_path(session_id, candidate.filename, candidate.file_hash)
 
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="PDF file not found")
@@ -1,20 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Header, Query
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
-from typing import List
+from sqlalchemy import and_, or_, false, func
+from typing import BinaryIO, Callable, Iterator, List, Literal, Optional
+import base64
 import json
 import logging
-from app.database import get_session
+from app.config import settings
+from app.database import get_session, engine
 from app.models.session import ScreeningSession, CriteriaConversation
 from app.models.candidate import Candidate
 from app.schemas.common import (
     SessionCreate, SessionResponse, CriteriaRefinementRequest, CriteriaRefinementResponse,
-    CandidateResponse, CandidateDetailResponse
+    CandidateResponse, CandidateDetailResponse, DuplicateResponse
 )
 from app.services.llm.criteria import generate_criteria, refine_criteria
-from app.services.pdf_extractor import extract_text_from_pdf
-from app.services.batch_processor import process_session_background  # We will create this next
-import shutil
-import os
+from app.services.extraction import extraction_stage
+from app.services.extraction_cache import extraction_cache
+from app.services.file_store import store_stream, StoredFile
+from app.services.fingerprint import index_candidate, find_duplicates
+from app.services.archive import open_archive
+from app.services.criteria_diff import diff_criteria
+from app.services.compaction import display_text
+from app.services.job_queue import enqueue, job_runner
+from app.services.events import session_events, session_progress, TERMINAL_STATUSES
+from app.services.forecast import estimate_session
+from app.services.llm.client import llm_client
+import asyncio
 
 router = APIRouter(prefix="/screening", tags=["screening"])
 logger = logging.getLogger(__name__)
@@ -80,50 +92,112 @@ async def upload_resumes(
     session = db.get(ScreeningSession, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-        
-    upload_dir = f"../data/uploads/{session_id}"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    uploaded_count = 0
-    failed_files = []
-    warnings = []
 
-    for file in files:
+    results = await _ingest_files(db, session, iter([(file.filename, lambda file=file: file.file) for file in files]))
+    return _upload_response(results)
+
+@router.post("/{session_id}/upload-archive")
+async def upload_resume_archive(
+    session_id: str,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_session)
+):
+    """
+    Upload a ZIP, tar or tar.gz archive of resume PDFs.
+
+    Entries are decompressed and stored one at a time, so the archive is never
+    unpacked as a whole, and each batch of stored files goes to the background
+    extraction stage while the rest of the archive is still being read. Entries
+    that are not PDFs or are larger than ARCHIVE_MAX_ENTRY_MB are reported in
+    failed_files; folders and archiver metadata are skipped.
+    """
+    session = db.get(ScreeningSession, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    try:
+        entries = await asyncio.to_thread(open_archive, file.file)
+    except ValueError as e:
+        await file.close()
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        results = await _ingest_files(db, session, entries, max_bytes=settings.ARCHIVE_MAX_ENTRY_MB * 1024 * 1024)
+    finally:
+        await file.close()
+    logger.info(f"Session {session_id}: archive {file.filename} had {len(results)} files")
+    return _upload_response(results)
+
+def _upload_response(results: list[dict]) -> dict:
+    uploaded = [r for r in results if r["status"] != "failed"]
+    return {
+        "uploaded_count": len(uploaded),
+        "extracting_count": sum(1 for r in results if r["status"] == "extracting"),
+        "failed_files": [{"filename": r["filename"], "error": r["error"]} for r in results if r["status"] == "failed"],
+        "warnings": [{"filename": r["filename"], "warning": r["warning"]} for r in results if r["status"] == "warning"],
+        "files": results
+    }
+
+def _store_file(open_file: Callable[[], BinaryIO], session_id: str, max_bytes: int | None) -> StoredFile:
+    with open_file() as source:
+        return store_stream(source, session_id, max_bytes)
+
+async def _ingest_files(
+    db: Session, session: ScreeningSession, files: Iterator[tuple[str, Callable[[], BinaryIO]]], max_bytes: int | None = None
+) -> list[dict]:
+    """
+    Store files given as (name, opener) pairs and add them as candidates,
+    committing every UPLOAD_BATCH_SIZE files.
+
+    Each file is streamed to its content-addressed path while it is hashed, so it
+    is read once. Files extracted before (in any session) take their text from the
+    extraction cache; the others are added in the "extracting" state and handed to
+    the background extraction stage, which starts on the first batch while later
+    ones are still being stored. The iterator is advanced in a worker thread, so
+    it may block (e.g. decompressing an archive). Returns each file's outcome, in
+    upload order.
+    """
+    results = []
+    stored = []
+    batch_size = max(1, settings.UPLOAD_BATCH_SIZE)
+    while (item := await asyncio.to_thread(next, files, None)) is not None:
+        filename, open_file = item
+        entry = {"filename": filename, "status": "failed"}
+        results.append(entry)
         try:
-            file_path = os.path.join(upload_dir, file.filename)
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-
-            candidate = Candidate(
-                session_id=session_id,
-                filename=file.filename,
-            )
-
-            # Extract text from PDF
-            with open(file_path, "rb") as f:
-                content = f.read()
-                text, warning = extract_text_from_pdf(content)
-                candidate.original_text = text
-                candidate.extraction_warning = warning
-                candidate.parsed_at = datetime.utcnow()
-
-                if warning:
-                    warnings.append({"filename": file.filename, "warning": warning})
-
-            db.add(candidate)
-            uploaded_count += 1
+            stored.append((entry, await asyncio.to_thread(_store_file, open_file, session.id, max_bytes)))
         except Exception as e:
-            failed_files.append({"filename": file.filename, "error": str(e)})
+            entry["error"] = str(e)
+        if len(stored) >= batch_size:
+            _add_candidates(db, session, stored)
+            stored = []
+    if stored:
+        _add_candidates(db, session, stored)
+    return results
 
-    session.total_resumes += uploaded_count
+def _add_candidates(db: Session, session: ScreeningSession, stored: list[tuple[dict, StoredFile]]):
+    """Add stored files as candidates (text from the extraction cache, or queued for extraction) and commit."""
+    cached = extraction_cache.get_many(db, [f.sha256 for _, f in stored]) if extraction_cache.enabled else {}
+    for entry, stored_file in stored:
+        now = datetime.utcnow()
+        candidate = Candidate(session_id=session.id, filename=entry["filename"], file_hash=stored_file.sha256, uploaded_at=now)
+        if stored_file.sha256 in cached:
+            text, warning = cached[stored_file.sha256]
+            candidate.original_text, candidate.extraction_warning, candidate.parsed_at = text, warning, now
+            entry.update(status="warning" if warning else "ok", characters=len(text), cached=True)
+            if warning:
+                entry["warning"] = warning
+        else:
+            candidate.extraction_status = "extracting"
+            entry.update(status="extracting", cached=False)
+        db.add(candidate)
+        if candidate.original_text is not None and index_candidate(db, candidate):
+            entry["duplicate_of"] = candidate.duplicate_of_id
+        entry["candidate_id"] = candidate.id
+
+    session.total_resumes += len(stored)
     db.add(session)
     db.commit()
-
-    return {
-        "uploaded_count": uploaded_count,
-        "failed_files": failed_files,
-        "warnings": warnings
-    }
+    extraction_stage.notify()
 
 from datetime import datetime
 
@@ -193,22 +267,44 @@ async def refine_session_criteria(
 @router.post("/{session_id}/process")
 async def process_resumes(
     session_id: str,
-    background_tasks: BackgroundTasks,
+    mode: Literal["interactive", "bulk"] = "interactive",
+    token_budget: Optional[int] = Query(None, ge=1),
     db: Session = Depends(get_session)
 ):
+    """
+    Start scoring the session's resumes.
+
+    Queues a durable job (replacing any unfinished one for this session) that the
+    job runner picks up; it survives restarts and resumes where it left off.
+    mode=bulk submits everything as one provider batch job: cheaper and outside the
+    interactive rate limits, but results can take hours to arrive.
+    token_budget caps the input + output tokens the run may spend (see /estimate);
+    once it is spent the run stops and the remaining candidates stay unscored.
+    """
     session = db.get(ScreeningSession, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
     # Check if this is a re-process (criteria updated after completion)
     is_reprocess = session.status == "criteria_updated"
+    is_incremental = False
 
     if is_reprocess:
+        # Keep existing scores when only weighted categories changed; the batch
+        # processor re-scores just those categories
+        diff = diff_criteria(
+            json.loads(session.scored_criteria_json) if session.scored_criteria_json else None,
+            json.loads(session.criteria_json) if session.criteria_json else None
+        )
+        is_incremental = not diff.requires_full_rescore
+
+    if is_reprocess and not is_incremental:
         # Reset candidate scores for re-processing
         candidates = db.query(Candidate).filter(Candidate.session_id == session_id).all()
         for c in candidates:
             c.passed_dealbreakers = None
             c.rejection_reason = None
+            c.prefilter_rule = None
             c.final_score = None
             c.one_liner = None
             c.category_scores_json = None
@@ -217,37 +313,201 @@ async def process_resumes(
             c.highlights_json = None
             c.processed_at = None
             db.add(c)
-        # Reset session counters but keep token usage (cumulative)
-        session.processed_count = 0
-        session.qualified_count = 0
+
+    # Reset session counters but keep token usage (cumulative); the job counts from here
+    session.processed_count = 0
+    session.qualified_count = 0
+    session.score_cache_hits = 0
+    session.prefilter_rejected_count = 0
+    session.duplicates_reused = 0
+    session.unscored_count = 0
+    session.budget_exhausted = False
+    session.error = None
+    session.bulk_batch_id = None
 
     session.status = "processing"
     session.criteria_locked_at = datetime.utcnow()
     db.add(session)
+    job = enqueue(db, session_id, mode, token_budget)
     db.commit()
+    session_events.publish(session_id, "status", {"status": "processing"})
+    job_runner.notify()
+
+    return {
+        "status": "processing_started",
+        "job_id": job.id,
+        "mode": mode,
+        "token_budget": token_budget,
+        "is_reprocess": is_reprocess,
+        "is_incremental": is_incremental
+    }
 
-    background_tasks.add_task(process_session_background, session_id)
+@router.get("/{session_id}/estimate", response_model=dict)
+def estimate_processing(
+    session_id: str,
+    token_budget: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_session)
+):
+    """
+    Forecast tokens and duration of processing the session with the current criteria.
+
+    Input tokens come from the uploaded texts and the rendered criteria prompt;
+    output tokens and time from this model's past runs. The figures are for a full
+    interactive run: an incremental re-process or packed scoring needs less.
+    Compacting and counting every resume takes a while on large sessions, so this
+    runs in the threadpool rather than on the event loop.
+    """
+    session = db.get(ScreeningSession, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return estimate_session(db, session, llm_client.model, token_budget)
 
-    return {"status": "processing_started", "is_reprocess": is_reprocess}
+def _sse(event_id: str, event: str, data: dict) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _read_progress(session_id: str) -> dict | None:
+    with Session(engine) as db:
+        session = db.get(ScreeningSession, session_id)
+        return session_progress(session) if session else None
+
+
+@router.get("/{session_id}/events")
+async def stream_events(
+    session_id: str,
+    request: Request,
+    last_event_id: str | None = Header(None)
+):
+    """
+    Server-sent events for a processing session, instead of polling /results.
+
+    Events: "progress" (counters, status, token usage), "candidate" (one scored
+    candidate) and "status". A new connection, or one whose Last-Event-ID can't be
+    resumed, starts with a progress snapshot. The stream ends after the session
+    completes or fails. Jobs run by separate worker processes only produce
+    progress events, from polling the session row every EVENTS_POLL_SECONDS.
+    """
+    snapshot = _read_progress(session_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    async def stream():
+        with session_events.subscribe(session_id) as wake:
+            last_id = last_event_id
+            last_progress = None
+            while not await request.is_disconnected():
+                wake.clear()
+                events = session_events.since(session_id, last_id) if last_id else None
+                if events is None:
+                    last_id = session_events.last_id(session_id)
+                    events = [(last_id, "progress", await asyncio.to_thread(_read_progress, session_id) or snapshot)]
+                for event_id, event, data in events:
+                    yield _sse(event_id, event, data)
+                    last_id = event_id
+                    if event == "progress":
+                        last_progress = data
+                    if data.get("status") in TERMINAL_STATUSES and event != "candidate":
+                        return
+                if events:
+                    continue
+
+                try:
+                    await asyncio.wait_for(wake.wait(), timeout=settings.EVENTS_POLL_SECONDS)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+                # Nothing published here: the job may run in another process
+                progress = await asyncio.to_thread(_read_progress, session_id)
+                if progress is None:
+                    return
+                if progress != last_progress:
+                    last_progress = progress
+                    yield _sse(last_id, "progress", progress)
+                    if progress["status"] in TERMINAL_STATUSES:
+                        return
+                else:
+                    yield ": keepalive\n\n"
+
+    return StreamingResponse(
+        stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Results are ranked qualified first, then by score. Pages continue after the
+# last row of the previous one (a keyset cursor) instead of using an offset, so
+# deep pages cost no more than the first and rows scored between polls neither
+# repeat nor go missing. Every column is descending, so the ranking index is
+# read backwards; SQLite sorts NULLs last in descending order.
+_RANKING = (Candidate.passed_dealbreakers, Candidate.final_score, Candidate.id)
+_RESULT_COLUMNS = (
+    Candidate.id, Candidate.filename, Candidate.final_score, Candidate.passed_dealbreakers, Candidate.one_liner,
+    Candidate.rejection_reason, Candidate.prefilter_rule, Candidate.duplicate_of_id, Candidate.extraction_warning,
+    Candidate.processed_at
+)
+
+def _encode_cursor(row) -> str:
+    return base64.urlsafe_b64encode(json.dumps([getattr(row, c.key) for c in _RANKING]).encode()).decode()
+
+def _after_cursor(cursor: str):
+    """Condition selecting the rows ranked after the cursor's row."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(_RANKING) or not all(
+            v is None or isinstance(v, (int, str)) for v in values
+        ):
+            raise ValueError
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    condition = None
+    for column, value in reversed(list(zip(_RANKING, values))):
+        # Descending with NULLs last: after value come smaller values, then NULLs
+        if value is None:
+            after, equal = false(), column.is_(None)
+        else:
+            value = int(value) if isinstance(value, bool) else value  # Booleans are stored as 0/1
+            after, equal = or_(column < value, column.is_(None)), column == value
+        condition = after if condition is None else or_(after, and_(equal, condition))
+    return condition
 
 @router.get("/{session_id}/results", response_model=dict) # Using dict for flexibility with insights
-async def get_results(session_id: str, db: Session = Depends(get_session)):
+async def get_results(
+    session_id: str,
+    limit: int = Query(100, ge=1, le=1000, description="Page size"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    status: Optional[Literal["qualified", "rejected", "skipped"]] = None,
+    min_score: Optional[int] = Query(None, ge=0, le=100),
+    max_score: Optional[int] = Query(None, ge=0, le=100),
+    db: Session = Depends(get_session)
+):
     session = db.get(ScreeningSession, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    
-    # Get candidates ranked
-    # Ranking logic: Passed dealbreakers first, then score
-    candidates = db.exec(
-        select(Candidate)
-        .where(Candidate.session_id == session_id)
-        .order_by(Candidate.passed_dealbreakers.desc(), Candidate.final_score.desc())
-    ).all()
-    
-    # Simple transform to response schema - include ALL candidates
+
+    # Processed candidates, and those that failed extraction (shown with their warning)
+    skipped = and_(Candidate.processed_at.is_(None), Candidate.extraction_warning.is_not(None))
+    query = select(*_RESULT_COLUMNS).where(Candidate.session_id == session_id)
+    if status == "qualified":
+        query = query.where(Candidate.processed_at.is_not(None), Candidate.passed_dealbreakers.is_(True))
+    elif status == "rejected":
+        query = query.where(Candidate.processed_at.is_not(None), Candidate.passed_dealbreakers.is_not(True))
+    elif status == "skipped":
+        query = query.where(skipped)
+    else:
+        query = query.where(or_(Candidate.processed_at.is_not(None), skipped))
+    if min_score is not None:
+        query = query.where(Candidate.final_score >= min_score)
+    if max_score is not None:
+        query = query.where(Candidate.final_score <= max_score)
+    if cursor:
+        query = query.where(_after_cursor(cursor))
+    query = query.order_by(*(column.desc() for column in _RANKING))
+    rows = db.exec(query.limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1])
+
     candidate_list = []
-    skipped_count = 0
-    for c in candidates:
+    for c in rows:
         if c.processed_at is not None:  # Processed candidates
             candidate_list.append({
                 "id": c.id,
@@ -256,10 +516,11 @@ async def get_results(session_id: str, db: Session = Depends(get_session)):
                 "passed_dealbreakers": c.passed_dealbreakers,
                 "one_liner": c.one_liner,
                 "rejection_reason": c.rejection_reason,
+                "prefilter_rule": c.prefilter_rule,
+                "duplicate_of_id": c.duplicate_of_id,
                 "extraction_warning": c.extraction_warning
             })
-        elif c.extraction_warning:  # Failed to extract - show in results with warning
-            skipped_count += 1
+        else:  # Failed to extract - show in results with warning
             candidate_list.append({
                 "id": c.id,
                 "filename": c.filename,
@@ -270,18 +531,30 @@ async def get_results(session_id: str, db: Session = Depends(get_session)):
                 "extraction_warning": c.extraction_warning,
                 "skipped": True
             })
-            
+    skipped_count = db.exec(
+        select(func.count()).select_from(Candidate).where(Candidate.session_id == session_id, skipped)
+    ).one()
+
     return {
         "session": {
             "total_resumes": session.total_resumes,
             "processed_count": session.processed_count,
             "qualified_count": session.qualified_count,
             "skipped_count": skipped_count,
+            "score_cache_hits": session.score_cache_hits or 0,
+            "prefilter_rejected_count": session.prefilter_rejected_count or 0,
+            "duplicates_reused": session.duplicates_reused or 0,
+            "unscored_count": session.unscored_count or 0,
+            "budget_exhausted": bool(session.budget_exhausted),
+            "error": session.error,
             "status": session.status,
             "total_input_tokens": session.total_input_tokens or 0,
-            "total_output_tokens": session.total_output_tokens or 0
+            "total_output_tokens": session.total_output_tokens or 0,
+            "total_cache_read_tokens": session.total_cache_read_tokens or 0,
+            "total_cache_write_tokens": session.total_cache_write_tokens or 0
         },
         "candidates": candidate_list,
+        "next_cursor": next_cursor,
         "insights": json.loads(session.insights_json) if session.insights_json else {}
     }
 
@@ -302,9 +575,38 @@ async def get_candidate_detail(
         passed_dealbreakers=candidate.passed_dealbreakers,
         one_liner=candidate.one_liner,
         rejection_reason=candidate.rejection_reason,
+        prefilter_rule=candidate.prefilter_rule,
         category_scores=json.loads(candidate.category_scores_json) if candidate.category_scores_json else None,
         strengths=json.loads(candidate.strengths_json) if candidate.strengths_json else None,
         concerns=json.loads(candidate.concerns_json) if candidate.concerns_json else None,
         highlights=json.loads(candidate.highlights_json) if candidate.highlights_json else None,
-        original_text=candidate.original_text
+        original_text=display_text(candidate.original_text),
+        original_token_count=candidate.original_token_count,
+        compacted_token_count=candidate.compacted_token_count,
+        text_truncated=bool(candidate.text_truncated),
+        duplicate_of_id=candidate.duplicate_of_id
     )
+
+@router.get("/{session_id}/candidate/{candidate_id}/duplicates", response_model=List[DuplicateResponse])
+async def get_candidate_duplicates(
+    session_id: str,
+    candidate_id: str,
+    db: Session = Depends(get_session)
+):
+    """Near-duplicate resumes of a candidate in this and other sessions, closest first."""
+    candidate = db.get(Candidate, candidate_id)
+    if not candidate or candidate.session_id != session_id:
+        raise HTTPException(status_code=404, detail="Candidate not found")
+
+    return [
+        DuplicateResponse(
+            id=c.id,
+            session_id=c.session_id,
+            filename=c.filename,
+            distance=distance,
+            final_score=c.final_score,
+            passed_dealbreakers=c.passed_dealbreakers,
+            one_liner=c.one_liner
+        )
+        for c, distance in find_duplicates(db, candidate)
+    ]
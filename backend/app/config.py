@@ -14,7 +14,103 @@ class Settings(BaseSettings):
     LLM_PROVIDER: str = "openai" 
     LLM_BASE_URL: Optional[str] = "http://localhost:11434/v1"
     LLM_MODEL: str = "llama3.2"
+    # openai provider: several servers as comma-separated "url|weight" entries
+    # (weight = max concurrent requests on that server). Overrides LLM_BASE_URL.
+    LLM_ENDPOINTS: Optional[str] = None
+    LLM_POOL_EJECT_AFTER: int = 3  # Consecutive failures before an endpoint is ejected
+    LLM_POOL_PROBE_SECONDS: int = 15  # Wait before re-probing an ejected endpoint
 
+    # Client-side rate limiting and retries (0 = no limit)
+    LLM_REQUESTS_PER_MINUTE: int = 0
+    LLM_TOKENS_PER_MINUTE: int = 0
+    LLM_MAX_CONCURRENCY: int = 16  # Ceiling for the adaptive concurrency limit
+    LLM_MAX_RETRIES: int = 6
+    LLM_RETRY_MAX_SECONDS: float = 300  # Total time budget for retrying one call
+
+    # Scoring concurrency. A scoring call needs a slot under every limit, so the
+    # lowest wins: SCORING_CONCURRENCY for one session, SCORING_GLOBAL_CONCURRENCY
+    # for all sessions of one process, then LLM_MAX_CONCURRENCY (or less after 429s)
+    # and, with LLM_ENDPOINTS, the endpoint weights for all LLM calls of the process.
+    SCORING_CONCURRENCY: int = 4  # Max in-flight LLM calls per session (1 = sequential)
+    SCORING_GLOBAL_CONCURRENCY: int = 16  # Max in-flight LLM calls across all sessions
+    # Stream scoring responses and stop as soon as a candidate fails the dealbreakers.
+    # Saves output tokens, but rejected candidates get no strengths, concerns or
+    # category evidence, so it is opt-in.
+    SCORING_STREAM_EARLY_EXIT: bool = False
+    # Packed scoring: put several short resumes into one request, up to this many
+    # estimated resume tokens (0 = one resume per request). The output limit grows
+    # with the pack size, so keep SCORING_PACK_MAX_RESUMES within the model's limit.
+    SCORING_PACK_TOKEN_BUDGET: int = 0
+    SCORING_PACK_MAX_RESUMES: int = 4
+
+    # Job queue: processing runs are durable jobs, leased by a runner that renews
+    # the lease while it works; expired leases are picked up again
+    JOB_LEASE_SECONDS: int = 60
+    JOB_POLL_SECONDS: float = 2
+    JOB_MAX_ATTEMPTS: int = 3  # Times a job that raised is requeued before the session fails
+    JOB_RUNNER_CONCURRENCY: int = 2  # Jobs (sessions) worked on at once by one runner
+    # Run a job runner inside the API process. Set to false when scoring runs in
+    # separate `python -m app.worker` processes; the API then only enqueues.
+    EMBEDDED_WORKER: bool = True
+    WORK_ITEM_CHUNK_SIZE: int = 32  # Candidates leased per claim
+    WORK_ITEM_MAX_ATTEMPTS: int = 3  # LLM scoring attempts per candidate before it is marked failed
+    # Scoring results are buffered and written in one transaction every
+    # RESULT_FLUSH_MAX_RESULTS results or RESULT_FLUSH_INTERVAL_MS, whichever comes first
+    RESULT_FLUSH_MAX_RESULTS: int = 25
+    RESULT_FLUSH_INTERVAL_MS: int = 1000
+
+    # Progress events (GET /screening/{id}/events)
+    EVENTS_BUFFER_SIZE: int = 1000  # Events kept per session for Last-Event-ID resume
+    EVENTS_POLL_SECONDS: float = 2  # Session row poll / keepalive interval when no events arrive
+
+    # Bulk mode: provider batch APIs. For the openai provider, batches can go to a
+    # different endpoint than interactive calls (e.g. the local stand-in batch server).
+    LLM_BATCH_BASE_URL: Optional[str] = None
+    BULK_POLL_INTERVAL_SECONDS: int = 30
+
+    # PDF text extraction runs in a process pool of this many workers (0 = one per CPU core)
+    EXTRACTION_WORKERS: int = 0
+    # Text layer engine: pypdf, pdfium (pypdfium2) or pdfminer (pdfminer.six).
+    # Compare them on your own resumes with `python -m app.extraction_benchmark <folder>`.
+    PDF_TEXT_ENGINE: str = "pypdf"
+    # Pages OCR'd at once within one PDF (only pages without a text layer are OCR'd)
+    OCR_PAGE_CONCURRENCY: int = 2
+    # Uploads return once files are stored; a background stage extracts up to this
+    # many files at once (0 = twice EXTRACTION_WORKERS), oldest upload first
+    EXTRACTION_QUEUE_SIZE: int = 0
+    # A file whose text could not be stored this many times is given up on (stored
+    # empty, with a warning) instead of being retried
+    EXTRACTION_MAX_ATTEMPTS: int = 3
+    # Uploaded files are stored and committed this many at a time
+    UPLOAD_BATCH_SIZE: int = 32
+    # Largest file accepted from an archive (guards against decompression bombs)
+    ARCHIVE_MAX_ENTRY_MB: int = 50
+
+    # Resume compaction: strip page furniture, whitespace and duplicate lines before
+    # prompting, then trim to RESUME_TOKEN_BUDGET by section priority (0 = no limit).
+    # Trimmed content can't count for the candidate, so trimming is opt-in; trimmed
+    # candidates are marked text_truncated.
+    RESUME_COMPACTION_ENABLED: bool = True
+    RESUME_TOKEN_BUDGET: int = 0
+
+    # Score cache (reuse results for identical resume text + criteria + model)
+    SCORE_CACHE_ENABLED: bool = True
+    SCORE_CACHE_MAX_MB: int = 256
+
+    # Extraction cache (reuse extracted text for identical PDF files, across sessions)
+    EXTRACTION_CACHE_ENABLED: bool = True
+    EXTRACTION_CACHE_MAX_MB: int = 256
+
+    # Near-duplicate resumes (same CV uploaded twice, or with another cover page) are
+    # linked to the first copy in the session and reuse its score. Fingerprints
+    # within this many bits (of 64) count as duplicates; at most 3 is supported.
+    DUPLICATE_DETECTION_ENABLED: bool = True
+    DUPLICATE_MAX_DISTANCE: int = 3
+
+    # Reject resumes that clearly miss a degree/clearance/language/certification
+    # dealbreaker without an LLM call. Off by default: a rejected candidate gets a
+    # score of 0 from a keyword match and is never seen by the model.
+    PREFILTER_ENABLED: bool = False
     
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
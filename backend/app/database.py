@@ -1,15 +1,50 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import inspect
 from app.config import settings
 
 # Import all models to ensure SQLModel relationships resolve correctly
 # This must happen before create_db_and_tables() is called
-from app.models import ScreeningSession, CriteriaConversation, Candidate
+from app.models import ScreeningSession, CriteriaConversation, Candidate, ScoreCacheEntry, ExtractionCacheEntry, ScoringJob, WorkItem, ModelUsageStats, ResumeFingerprint
 
-# check_same_thread=False is needed for SQLite
-engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
+# check_same_thread=False is needed for SQLite; the longer busy timeout lets
+# several worker processes share the database file
+engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False, "timeout": 30})
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns()
+    _add_missing_indexes()
+
+def _add_missing_columns():
+    """
+    create_all() only creates missing tables, so columns added to a model after its
+    table exists would be missing from older databases. Add them in place.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                default = column.default.arg if column.default is not None and column.default.is_scalar else None
+                if isinstance(default, bool):
+                    ddl += f" DEFAULT {int(default)}"
+                elif isinstance(default, (int, float)):
+                    ddl += f" DEFAULT {default}"
+                elif isinstance(default, str):
+                    ddl += " DEFAULT '" + default.replace("'", "''") + "'"
+                conn.exec_driver_sql(ddl)
+
+def _add_missing_indexes():
+    """Likewise, create indexes added to a model after its table exists."""
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
 
 def get_session():
     with Session(engine) as session:
@@ -0,0 +1,117 @@
+"""
+Benchmark the PDF text engines on a folder of PDFs.
+
+Each engine reads every PDF's text layer in a fresh process, one at a time, and
+reports throughput (pages and files per second), peak memory growth of that
+process (not on Windows, which lacks the resource module), and text yield: characters extracted and pages left with too little
+text, which would be sent to OCR. OCR itself is the same for every engine and is
+not run unless --ocr is given. Set PDF_TEXT_ENGINE to the engine you pick.
+
+Usage:
+    python -m app.extraction_benchmark <folder> [--engines pypdf,pdfium] [--ocr] [--json]
+"""
+from app.services.pdf_extractor import available_engines, get_engine, extract_text_from_file, _MIN_PAGE_TEXT
+from app.services.compaction import PAGE_BREAK
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Unix only
+    resource = None
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB elsewhere
+
+
+def _run_engine(engine: str, paths: list[str], ocr: bool) -> dict:
+    """Runs in its own process, so peak memory is the engine's alone."""
+    _, read_pages = get_engine(engine)
+    baseline = _peak_rss_mb()
+    pages = chars = short_pages = failed = 0
+    started = time.perf_counter()
+    for path in paths:
+        try:
+            if ocr:
+                text, _ = extract_text_from_file(path, engine=engine)
+                # Pages that yielded no text at all are left out of the joined text
+                page_texts = text.split(PAGE_BREAK) if text else []
+                pages += len(page_texts)
+                chars += sum(len(page_text.strip()) for page_text in page_texts)
+                continue
+            document = read_pages(path)
+        except Exception:
+            failed += 1
+            continue
+        pages += len(document)
+        chars += sum(len(page.text.strip()) for page in document)
+        short_pages += sum(1 for page in document if len(page.text.strip()) < _MIN_PAGE_TEXT)
+    seconds = time.perf_counter() - started
+    result = {
+        "engine": engine,
+        "files": len(paths),
+        "failed_files": failed,
+        "seconds": round(seconds, 3),
+        "files_per_second": round(len(paths) / seconds, 2) if seconds else None,
+        "pages": pages,
+        "pages_per_second": round(pages / seconds, 2) if seconds else None,
+        "characters": chars,
+    }
+    if baseline is not None:
+        result["peak_memory_mb"] = round(_peak_rss_mb() - baseline, 1)
+    if not ocr:
+        result["pages_needing_ocr"] = short_pages
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Folder searched recursively for .pdf files")
+    parser.add_argument("--engines", default=",".join(available_engines()),
+                        help=f"Comma-separated engines to compare (installed: {', '.join(available_engines())})")
+    parser.add_argument("--ocr", action="store_true", help="Run full extraction, including OCR of pages without text")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(args.folder) for name in names if name.lower().endswith(".pdf")
+    )
+    if not paths:
+        parser.error(f"No PDF files found in {args.folder}")
+    engines = [name.strip() for name in args.engines.split(",") if name.strip()]
+    unknown = [name for name in engines if name not in available_engines()]
+    if unknown:
+        parser.error(f"Not installed: {', '.join(unknown)} (installed: {', '.join(available_engines())})")
+
+    results = []
+    for engine in engines:
+        # A fresh process per engine keeps imports and caches of one from skewing the next
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results.append(pool.submit(_run_engine, engine, paths, args.ocr).result())
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    columns = ["engine", "files", "failed_files", "seconds", "files_per_second", "pages", "pages_per_second", "characters", "peak_memory_mb"]
+    if not args.ocr:
+        columns[7:7] = ["pages_needing_ocr"]
+    if resource is None:
+        columns.remove("peak_memory_mb")
+    widths = [max(len(column), *(len(str(r.get(column))) for r in results)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for r in results:
+        print("  ".join(str(r.get(column)).ljust(width) for column, width in zip(columns, widths)))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,25 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.database import create_db_and_tables
+from app.services.job_queue import job_runner
+from app.services.extraction import extraction_pool, extraction_stage
 from contextlib import asynccontextmanager
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     create_db_and_tables()
+    # Picks up queued jobs, including ones left unfinished by a restart or crash
+    if settings.EMBEDDED_WORKER:
+        job_runner.start()
+    # Extracts uploaded resumes in the background, including ones left over from a restart
+    extraction_stage.start()
     yield
     # Shutdown
+    await extraction_stage.stop()
+    if settings.EMBEDDED_WORKER:
+        job_runner.stop()
+    extraction_pool.shutdown()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
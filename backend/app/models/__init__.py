@@ -1,3 +1,7 @@
 # Import all models to ensure SQLModel relationships resolve correctly
 from app.models.session import ScreeningSession, CriteriaConversation
 from app.models.candidate import Candidate
+from app.models.cache import ScoreCacheEntry, ExtractionCacheEntry
+from app.models.job import ScoringJob, WorkItem
+from app.models.usage import ModelUsageStats
+from app.models.fingerprint import ResumeFingerprint
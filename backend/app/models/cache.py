@@ -0,0 +1,29 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime
+
+class ScoreCacheEntry(SQLModel, table=True):
+    """A scoring result keyed by what produced it: resume text, criteria and model."""
+    __tablename__ = "score_cache"
+
+    key: str = Field(primary_key=True)  # sha256 of resume hash + criteria hash + model
+    resume_hash: str
+    criteria_hash: str
+    model: str
+    result_json: str
+    size_bytes: int = 0
+    hit_count: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_used_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+class ExtractionCacheEntry(SQLModel, table=True):
+    """Text extracted from a PDF, keyed by the file's content hash and the extractor version."""
+    __tablename__ = "extraction_cache"
+
+    key: str = Field(primary_key=True)  # sha256 of the file bytes + extractor version
+    text: str
+    warning: Optional[str] = None
+    size_bytes: int = 0
+    hit_count: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_used_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional, Any
 from datetime import datetime
 import uuid
@@ -7,12 +8,17 @@ class CandidateBase(SQLModel):
     filename: str
     original_text: Optional[str] = None
     extraction_warning: Optional[str] = None  # Warning from PDF extraction (OCR used, failed, etc.)
+    # Estimated tokens of the extracted text and of the compacted text sent to the LLM
+    original_token_count: Optional[int] = None
+    compacted_token_count: Optional[int] = None
+    text_truncated: bool = False  # Sections were dropped or cut to fit RESUME_TOKEN_BUDGET
 
     # Evaluation
     passed_dealbreakers: Optional[bool] = None
     rejection_reason: Optional[str] = None
     final_score: Optional[int] = None
     one_liner: Optional[str] = None
+    prefilter_rule: Optional[str] = None  # Pre-filter rule that rejected the candidate without an LLM call
 
     # Stored as JSON strings
     category_scores_json: Optional[str] = None
@@ -22,9 +28,23 @@ class CandidateBase(SQLModel):
 
 class Candidate(CandidateBase, table=True):
     __tablename__ = "candidates"
+    __table_args__ = (
+        # Results ranking (scanned backwards for the descending order) and its keyset pages
+        Index("ix_candidates_ranking", "session_id", "passed_dealbreakers", "final_score", "id"),
+        # Unscored candidates of a session (skipped ones in the results)
+        Index("ix_candidates_session_processed", "session_id", "processed_at"),
+    )
     
     id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
     session_id: str = Field(foreign_key="screening_sessions.id")
+    file_hash: Optional[str] = None  # sha256 of the uploaded PDF, stored as uploads/{session_id}/{file_hash}.pdf
+    extraction_status: str = Field(default="ready", index=True)  # extracting (text not extracted yet), ready
+    # Lease of the API process extracting the file, and how often extraction was started
+    extraction_lease_expires_at: Optional[datetime] = None
+    extraction_attempts: int = 0
+    # Earlier candidate of the same session with a near-identical resume; its score is reused
+    duplicate_of_id: Optional[str] = Field(default=None, foreign_key="candidates.id", index=True)
+    uploaded_at: Optional[datetime] = None
     parsed_at: Optional[datetime] = None
     processed_at: Optional[datetime] = None
     
@@ -0,0 +1,22 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+
+class ResumeFingerprint(SQLModel, table=True):
+    """
+    64-bit SimHash of a candidate's resume text, split into four 16-bit bands.
+
+    Fingerprints within DUPLICATE_MAX_DISTANCE bits of each other share at least
+    one band exactly, so near-duplicate candidates are found with indexed band
+    lookups. A candidate has one fingerprint of its whole text and, for multi-page
+    resumes, one without the first page (agencies add their own cover page).
+    """
+    __tablename__ = "resume_fingerprints"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    candidate_id: str = Field(foreign_key="candidates.id", index=True)
+    session_id: str = Field(foreign_key="screening_sessions.id", index=True)
+    simhash: str  # 16 hex digits
+    band0: int = Field(index=True)
+    band1: int = Field(index=True)
+    band2: int = Field(index=True)
+    band3: int = Field(index=True)
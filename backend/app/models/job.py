@@ -0,0 +1,39 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime
+import uuid
+
+class ScoringJob(SQLModel, table=True):
+    """One processing run over a session, claimed by a runner through a renewable lease."""
+    __tablename__ = "scoring_jobs"
+
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
+    session_id: str = Field(foreign_key="screening_sessions.id", index=True)
+    mode: str = "interactive"  # interactive, bulk
+    status: str = Field(default="queued", index=True)  # queued, running, completed, failed, cancelled
+    planned: bool = False  # Work items created; cache hits and pre-filter results committed
+    attempts: int = 0
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    token_budget: Optional[int] = None  # Input + output tokens the job may spend (None = unlimited)
+    tokens_used: int = 0
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class WorkItem(SQLModel, table=True):
+    """One candidate that still needs an LLM call within a job."""
+    __tablename__ = "work_items"
+
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
+    job_id: str = Field(foreign_key="scoring_jobs.id", index=True)
+    candidate_id: str = Field(foreign_key="candidates.id")
+    kind: str = "full"  # full, incremental (changed categories only)
+    state: str = Field(default="pending", index=True)  # waiting (for extraction), pending, leased, done, failed
+    planned: bool = True  # False if the candidate was still extracting when the job was planned
+    attempts: int = 0
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -13,17 +13,27 @@ class ScreeningSessionBase(SQLModel):
     criteria_human_readable: Optional[str] = None
     criteria_json: Optional[str] = None # Stored as JSON string
     criteria_version: int = 1
+    scored_criteria_json: Optional[str] = None  # Criteria the current candidate scores were computed against
 
     # Stats (Denormalized)
     total_resumes: int = 0
     processed_count: int = 0
     qualified_count: int = 0
+    score_cache_hits: int = 0  # Candidates filled from the score cache in the last run
+    prefilter_rejected_count: int = 0  # LLM calls avoided by the dealbreaker pre-filter in the last run
+    duplicates_reused: int = 0  # LLM calls avoided by reusing a near-duplicate resume's score in the last run
+    unscored_count: int = 0  # Candidates the last run could not score (failed, or cut off by the token budget)
+    budget_exhausted: bool = False  # The last run stopped early because its token budget was spent
 
     # Token usage tracking
     total_input_tokens: int = 0
     total_output_tokens: int = 0
+    total_cache_read_tokens: int = 0  # Input tokens served from the provider prompt cache
+    total_cache_write_tokens: int = 0  # Input tokens written to the provider prompt cache
 
     status: str = "draft" # draft, criteria_locked, processing, completed
+    bulk_batch_id: Optional[str] = None  # Provider batch job while processing in bulk mode
+    error: Optional[str] = None  # Why the last run failed
     insights_json: Optional[str] = None
 
 class ScreeningSession(ScreeningSessionBase, table=True):
@@ -0,0 +1,16 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+class ModelUsageStats(SQLModel, table=True):
+    """Running totals of scoring calls per model, used to forecast the cost and duration of a run."""
+    __tablename__ = "model_usage_stats"
+
+    model: str = Field(primary_key=True)
+    resumes_scored: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    # Resumes scored by interactive requests and the time those requests took
+    # (bulk batches excluded); a packed request's time is shared by its resumes
+    timed_resumes: int = 0
+    timed_seconds: float = 0.0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
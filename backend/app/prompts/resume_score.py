@@ -59,3 +59,67 @@ REMEMBER:
 - Specific achievements with metrics = higher scores (70+)
 - Be consistent: same evidence quality = same score range
 """
+
+RESUME_CATEGORY_SCORE_USER_TEMPLATE = """
+<resume>
+{resume_text}
+</resume>
+
+Evaluate this candidate STRICTLY against ONLY the criteria categories listed above. Return JSON:
+{{
+  "category_scores": {{
+    "category_id": {{
+      "score": 0-100,
+      "confidence": "high|medium|low",
+      "evidence": ["exact quote from resume supporting this score"],
+      "notes": "brief assessment explaining the score"
+    }}
+  }}
+}}
+
+REMEMBER:
+- Include every listed category id and no others
+- No evidence = low score (30-40)
+- Generic claims = medium score at best (50-60)
+- Specific achievements with metrics = higher scores (70+)
+"""
+
+RESUME_PACK_ENTRY_TEMPLATE = """<resume id="{resume_id}">
+{resume_text}
+</resume>
+"""
+
+RESUME_PACK_SCORE_USER_TEMPLATE = """
+{resumes}
+Evaluate EACH of the {count} candidates above INDEPENDENTLY and STRICTLY against the criteria.
+Never let one resume influence the score of another. Return JSON:
+{{
+  "results": [
+    {{
+      "resume_id": "id attribute of the <resume> tag",
+      "passed_dealbreakers": true/false,
+      "rejection_reason": null or "Lacks [specific requirement]",
+      "category_scores": {{
+        "category_id": {{
+          "score": 0-100,
+          "confidence": "high|medium|low",
+          "evidence": ["exact quote from resume supporting this score"],
+          "notes": "brief assessment explaining the score"
+        }}
+      }},
+      "final_score": 0-100,
+      "one_liner": "1-2 sentence summary highlighting fit or key gap",
+      "strengths": ["specific strength with evidence"],
+      "concerns": ["specific concern or gap"],
+      "highlights": ["Notable achievement if any"]
+    }}
+  ]
+}}
+
+REMEMBER:
+- Exactly one entry per resume id: {resume_ids}
+- No evidence = low score (30-40)
+- Generic claims = medium score at best (50-60)
+- Specific achievements with metrics = higher scores (70+)
+- Be consistent: same evidence quality = same score range
+"""
@@ -62,8 +62,17 @@ class CandidateResponse(BaseModel):
     
 class CandidateDetailResponse(CandidateResponse):
     rejection_reason: Optional[str] = None
+    prefilter_rule: Optional[str] = None
     category_scores: Optional[Dict[str, Any]] = None # Parsed from json
     strengths: Optional[List[str]] = None
     concerns: Optional[List[str]] = None
     highlights: Optional[List[str]] = None
     original_text: Optional[str] = None
+    original_token_count: Optional[int] = None
+    compacted_token_count: Optional[int] = None
+    text_truncated: bool = False  # The LLM saw a trimmed resume (RESUME_TOKEN_BUDGET)
+    duplicate_of_id: Optional[str] = None  # Near-duplicate whose score this candidate reuses
+
+class DuplicateResponse(CandidateResponse):
+    session_id: str
+    distance: int  # Differing SimHash bits (of 64)
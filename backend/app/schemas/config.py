@@ -1,8 +1,14 @@
 from pydantic import BaseModel
-from typing import Optional, Literal
+from typing import Optional, Literal, List
+
+class LLMEndpoint(BaseModel):
+    url: str
+    weight: int = 4  # Max concurrent requests sent to this endpoint
 
 class LLMConfig(BaseModel):
     provider: Literal["openai", "anthropic"]
     model: str
     base_url: Optional[str] = None
     api_key: Optional[str] = None
+    # openai provider only: spread requests over several servers instead of base_url
+    endpoints: Optional[List[LLMEndpoint]] = None
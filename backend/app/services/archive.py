@@ -0,0 +1,61 @@
+from typing import BinaryIO, Callable, Iterator
+import posixpath
+import tarfile
+import zipfile
+
+# Reading resume archives (ZIP, tar, tar.gz) entry by entry. Entries are
+# decompressed as they are read, so neither the archive nor an entry is ever
+# unpacked to disk or held in memory as a whole.
+
+ArchiveEntry = tuple[str, Callable[[], BinaryIO]]  # (file name, opener)
+
+
+def _ignored(name: str) -> bool:
+    """Folder metadata that archivers add alongside the real files."""
+    parts = name.split("/")
+    return "__MACOSX" in parts or parts[-1].startswith(".")
+
+
+def _pdf_opener(name: str, open_entry: Callable[[], BinaryIO]) -> Callable[[], BinaryIO]:
+    def opener() -> BinaryIO:
+        if not name.lower().endswith(".pdf"):
+            raise ValueError("Not a PDF file")
+        return open_entry()
+    return opener
+
+
+def _zip_entries(archive: zipfile.ZipFile) -> Iterator[ArchiveEntry]:
+    with archive:
+        for info in archive.infolist():
+            if info.is_dir() or _ignored(info.filename):
+                continue
+            yield posixpath.basename(info.filename), _pdf_opener(info.filename, lambda info=info: archive.open(info))
+
+
+def _tar_entries(archive: tarfile.TarFile) -> Iterator[ArchiveEntry]:
+    # Stream mode: each entry can only be read before moving on to the next
+    with archive:
+        for member in archive:
+            if not member.isfile() or _ignored(member.name):
+                continue
+            yield posixpath.basename(member.name), _pdf_opener(member.name, lambda member=member: archive.extractfile(member))
+
+
+def open_archive(source: BinaryIO) -> Iterator[ArchiveEntry]:
+    """
+    Iterate a ZIP or (optionally gzip/bz2/xz compressed) tar archive's files as
+    (name, opener) pairs, in archive order. Directories and metadata files are
+    skipped; the opener of an entry that isn't a PDF raises ValueError.
+    A tar entry must be read before the next one is requested.
+
+    Raises:
+        ValueError: source is not a supported archive.
+    """
+    if zipfile.is_zipfile(source):
+        source.seek(0)
+        return _zip_entries(zipfile.ZipFile(source))
+    source.seek(0)
+    try:
+        return _tar_entries(tarfile.open(fileobj=source, mode="r|*"))
+    except tarfile.TarError:
+        raise ValueError("Unsupported archive: expected a .zip, .tar or .tar.gz file")
@@ -1,88 +1,943 @@
-from sqlmodel import Session
+from sqlmodel import Session, select
+from sqlalchemy import update, func, or_, and_
+from app.config import settings
 from app.database import engine
 from app.models.session import ScreeningSession
 from app.models.candidate import Candidate
-from app.services.llm.scoring import score_resume
+from app.models.job import ScoringJob, WorkItem
+from app.services.llm.client import llm_client
+from app.services.llm.scoring import (
+    score_resume, score_resume_pack, score_resume_categories, render_scoring_system_prompt,
+    render_category_scoring_system_prompt
+)
+from app.prompts.resume_score import RESUME_SCORE_USER_TEMPLATE, RESUME_CATEGORY_SCORE_USER_TEMPLATE
+from app.services.criteria_diff import diff_criteria, compute_final_score, CriteriaDiff
+from app.services.score_cache import score_cache, hash_text, hash_criteria, make_cache_key
+from app.services.prefilter import compile_prefilter, run_prefilter
+from app.services.tokens import estimate_tokens
+from app.services.compaction import prompt_text
+from app.services.events import session_events, session_progress
+from app.services.forecast import record_usage, expected_output_tokens
+from app.models.usage import ModelUsageStats
+from app.services.wakeup import Wakeups
+from app.services.job_queue import (
+    claim_items, finish_items, fail_open_items, complete_job, open_item_count, renew_leases, release_waiting_items,
+    abort_job
+)
+from contextlib import asynccontextmanager
 import json
 import asyncio
 import logging
+import threading
+import time
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+BUDGET_EXHAUSTED = "Token budget exhausted"
 
-def process_session_background(session_id: str):
+# Each job runs in its own thread with its own event loop (see process_job), so
+# the cross-session limit has to be a thread-level primitive rather than an
+# asyncio.Semaphore; waiters on other loops are woken through Wakeups.
+_global_slots = threading.BoundedSemaphore(max(1, settings.SCORING_GLOBAL_CONCURRENCY))
+_global_slot_freed = Wakeups()
+
+
+@asynccontextmanager
+async def _global_slot():
+    """Hold one of the process-wide LLM call slots without blocking the event loop."""
+    while True:
+        with _global_slot_freed.waiting() as wake:
+            if _global_slots.acquire(blocking=False):
+                break
+            await wake.wait()
+    try:
+        yield
+    finally:
+        _global_slots.release()
+        _global_slot_freed.notify()
+
+
+def _result_values(result: dict) -> dict:
+    """Candidate column values for an LLM scoring result."""
+    return {
+        "passed_dealbreakers": result.get("passed_dealbreakers"),
+        "rejection_reason": result.get("rejection_reason"),
+        "final_score": result.get("final_score"),
+        "one_liner": result.get("one_liner"),
+        "prefilter_rule": result.get("prefilter_rule"),
+        "category_scores_json": json.dumps(result.get("category_scores")),
+        "strengths_json": json.dumps(result.get("strengths")),
+        "concerns_json": json.dumps(result.get("concerns")),
+        "highlights_json": json.dumps(result.get("highlights")),
+        "processed_at": datetime.utcnow(),
+    }
+
+
+# Candidate column values of a candidate without a result
+_CLEARED_RESULT = {
+    "passed_dealbreakers": None, "rejection_reason": None, "final_score": None, "one_liner": None,
+    "prefilter_rule": None, "category_scores_json": None, "strengths_json": None, "concerns_json": None,
+    "highlights_json": None, "processed_at": None,
+}
+
+
+def _result_from_candidate(candidate: Candidate) -> dict | None:
+    """Rebuild a scoring result from a previously scored candidate, if it has one."""
+    if candidate.processed_at is None or candidate.passed_dealbreakers is None:
+        return None
+    category_scores = json.loads(candidate.category_scores_json) if candidate.category_scores_json else None
+    if category_scores is None and candidate.passed_dealbreakers is False:
+        # Minimal record from an early-terminated rejection
+        category_scores = {}
+    if not isinstance(category_scores, dict):
+        return None
+    return {
+        "passed_dealbreakers": candidate.passed_dealbreakers,
+        "rejection_reason": candidate.rejection_reason,
+        "category_scores": category_scores,
+        "final_score": candidate.final_score,
+        "one_liner": candidate.one_liner,
+        "prefilter_rule": candidate.prefilter_rule,
+        "strengths": json.loads(candidate.strengths_json) if candidate.strengths_json else None,
+        "concerns": json.loads(candidate.concerns_json) if candidate.concerns_json else None,
+        "highlights": json.loads(candidate.highlights_json) if candidate.highlights_json else None,
+    }
+
+
+def _merge_category_scores(previous: dict, new_scores: dict, diff: CriteriaDiff, criteria_json: dict) -> dict:
+    """
+    Combine kept and re-scored categories and recompute final_score from the weights.
+    A passing candidate's summary (one_liner, strengths, concerns) was written
+    against the old categories, so it is cleared once any category is re-scored or
+    removed. A rejected candidate's summary explains the unchanged verdict.
+    """
+    result = dict(previous)
+    category_scores = {k: v for k, v in previous["category_scores"].items() if k not in diff.removed}
+    category_scores.update(new_scores)
+    result["category_scores"] = category_scores
+    if (new_scores or diff.removed) and result.get("passed_dealbreakers"):
+        result.update(one_liner=None, strengths=None, concerns=None)
+    if new_scores or diff.removed or diff.weights_changed:
+        final_score = compute_final_score(category_scores, criteria_json)
+        if final_score is not None:
+            result["final_score"] = final_score
+    return result
+
+
+def _add_usage(a: dict, b: dict) -> dict:
+    return {k: a.get(k, 0) + b.get(k, 0) for k in ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens")}
+
+
+def _pack(to_score: list[tuple[Candidate, dict | None]], texts: dict[str, str]) -> list[list[tuple[Candidate, dict | None]]]:
     """
-    Wrapper to run async processing in a background thread.
-    FastAPI's BackgroundTasks runs sync functions in a thread pool.
+    Group full-scoring work into packs of short resumes that fit SCORING_PACK_TOKEN_BUDGET.
+
+    Incremental rescores, empty resumes and resumes too large to share a request
+    stay in packs of one.
     """
-    asyncio.run(_process_session_async(session_id))
+    budget = settings.SCORING_PACK_TOKEN_BUDGET
+    max_resumes = max(1, settings.SCORING_PACK_MAX_RESUMES)
+    if budget <= 0 or max_resumes == 1:
+        return [[item] for item in to_score]
+
+    packs, current, current_tokens = [], [], 0
+    for item in to_score:
+        candidate, previous = item
+        tokens = estimate_tokens(texts.get(candidate.id, ""))
+        if previous is not None or not tokens or tokens * 2 > budget:
+            packs.append([item])
+            continue
+        if current and (current_tokens + tokens > budget or len(current) >= max_resumes):
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+class _ScoringRun:
+    """
+    State for one processing run over a session, shared by the interactive and bulk paths.
+
+    Holds the rendered prompts, the criteria diff against the last run, the progress
+    counters and the write-behind buffer of scoring results. All methods touch the DB
+    session, so they must only be called from the coroutine driving the run.
+    """
+
+    def __init__(self, db: Session, session: ScreeningSession):
+        self.db = db
+        self.session = session
+        self.criteria_json = json.loads(session.criteria_json) if session.criteria_json else {}
+        # Rendered once per run so every call shares a cacheable system prompt prefix
+        self.system_prompt = render_scoring_system_prompt(self.criteria_json)
+        self.criteria_hash = hash_criteria(self.criteria_json)
+        self.model = llm_client.model
+
+        self.diff = diff_criteria(
+            json.loads(session.scored_criteria_json) if session.scored_criteria_json else None,
+            self.criteria_json
+        )
+        self.incremental = not self.diff.requires_full_rescore
+        self.category_prompt = (
+            render_category_scoring_system_prompt(self.criteria_json, self.diff.changed) if self.diff.changed else None
+        )
+        if self.incremental and not self.diff.is_empty:
+            logger.info(f"Session {session.id}: incremental rescore (changed={sorted(self.diff.changed)}, removed={sorted(self.diff.removed)})")
+        self.prefilter_rules = compile_prefilter(self.criteria_json) if settings.PREFILTER_ENABLED else []
+        self.texts: dict[str, str] = {}  # candidate id -> compacted prompt text
+        self.token_counts: dict[str, dict] = {}  # candidate id -> original/compacted token counts
+
+        # Write-behind buffer: outcomes not yet written, as
+        # (item_id, candidate_id, result_or_None, usage, error, final, from_llm)
+        self.pending: list[tuple[str, str, dict | None, dict, str | None, bool, bool]] = []
+        self.pending_since = 0.0
+        self.rows: dict[str, dict] = {}  # candidate id -> column values not yet written
+        self.scored: list[dict] = []  # Candidate event payloads, published once committed
+        # Near-duplicates waiting for their canonical candidate's result, as (item_id, candidate)
+        self.handed_over: list[tuple[str, Candidate]] = []
+
+        # Progress not yet added to the session row. Several workers can record
+        # results for the same session, so counters are applied as increments.
+        self.processed = 0
+        self.qualified = 0
+        self.cache_hits = 0
+        self.prefilter_rejected = 0
+        self.duplicates_reused = 0
+        self.usage = _add_usage({}, {})
+        # Full scoring requests not yet added to the model's usage stats (see count_request)
+        self.counted_resumes = 0
+        self.counted_usage = _add_usage({}, {})
+        self.timed_resumes = 0
+        self.timed_seconds = 0.0
+
+        # Token budget of the job, shared by every runner working on it
+        self.job_id: str | None = None
+        self.token_budget: int | None = None
+        self.tokens_used = 0  # Job total as of the last flush
+
+    def plan(self, candidates: list[Candidate]) -> list[tuple[Candidate, dict | None]]:
+        """
+        Serve cache hits, pre-filter rejections and LLM-free incremental updates.
+        Not committed, so the caller can commit them together with the work items.
+
+        Returns:
+            list of (candidate, previous_result) still needing an LLM call. previous_result
+            is set when only the changed categories need scoring.
+        """
+        to_score = []
+        for candidate in candidates:
+            result = self._cached(candidate)
+            if result is None:
+                previous = _result_from_candidate(candidate) if self.incremental else None
+                if previous is None:
+                    result = self._prefilter(candidate)
+                    if result is None:
+                        to_score.append((candidate, None))
+                        continue
+                    self._count(candidate.id, result)
+                    continue
+                if self.diff.changed and previous["passed_dealbreakers"]:
+                    to_score.append((candidate, previous))
+                    continue
+                # Rejected candidates keep their verdict; weight or removal-only
+                # changes just need the final score recomputed
+                result = _merge_category_scores(previous, {}, self.diff, self.criteria_json)
+
+            self._count(candidate.id, result)
+
+        if self.cache_hits:
+            logger.info(f"Session {self.session.id}: {self.cache_hits} candidates served from score cache")
+        if self.prefilter_rejected:
+            logger.info(f"Session {self.session.id}: {self.prefilter_rejected} candidates rejected by pre-filter without an LLM call")
+        self._write()
+        return to_score
+
+    def buffer(self, item_id: str, candidate_id: str, result: dict | None, usage: dict, error: str | None = None,
+               final: bool = False, from_llm: bool = True):
+        """Queue an item's outcome (result None on failure) for the next flush()."""
+        if not self.pending:
+            self.pending_since = time.monotonic()
+        self.pending.append((item_id, candidate_id, result, usage, error, final, from_llm))
+
+    def hand_over(self, item_id: str, candidate: Candidate):
+        """
+        Close a near-duplicate's item at the next flush(); the candidate takes its
+        canonical's result then, or when that is written (see _reuse_for_duplicates).
+        """
+        self.handed_over.append((item_id, candidate))
+
+    def flush_wait(self) -> float | None:
+        """Seconds until the buffer is due for a time-based flush, or None if it is empty."""
+        if not self.pending:
+            return None
+        return max(0.0, self.pending_since + settings.RESULT_FLUSH_INTERVAL_MS / 1000 - time.monotonic())
+
+    def flush_due(self) -> bool:
+        return len(self.pending) >= max(1, settings.RESULT_FLUSH_MAX_RESULTS) or self.flush_wait() == 0
+
+    def flush(self, owner: str | None):
+        """
+        Write buffered outcomes, their work items and the session counters in one
+        transaction. Results for items owner no longer holds are discarded.
+        """
+        if not self.pending and not self.handed_over:
+            return
+        held = finish_items(
+            self.db,
+            [(item_id, result is not None, error, final) for item_id, _, result, _, error, final, _ in self.pending]
+            + [(item_id, True, None, False) for item_id, _ in self.handed_over],
+            owner
+        )
+        flushed_usage = _add_usage({}, {})
+        for item_id, candidate_id, result, usage, _, _, from_llm in self.pending:
+            if item_id not in held:
+                if result is not None:
+                    logger.warning(f"Lost work item for candidate {candidate_id} (lease expired or job cancelled), discarding its result")
+                result = None
+            if result is not None:
+                if score_cache.enabled and from_llm:
+                    resume_hash = hash_text(self.texts[candidate_id])
+                    key = make_cache_key(resume_hash, self.criteria_hash, self.model)
+                    score_cache.put(self.db, key, resume_hash, self.criteria_hash, self.model, result)
+                self._count(candidate_id, result)
+            elif candidate_id in self.token_counts:
+                self.rows.setdefault(candidate_id, {})
+            flushed_usage = _add_usage(flushed_usage, usage)
+        for item_id, candidate in self.handed_over:
+            # A canonical result written in this flush is copied by _reuse_for_duplicates;
+            # one committed since the hand-over is copied here
+            if item_id in held and candidate.duplicate_of_id not in self.rows:
+                result = _duplicate_result(self, candidate)
+                if result is not None:
+                    self._count(candidate.id, result)
+
+        self.usage = _add_usage(self.usage, flushed_usage)
+        tokens = flushed_usage["input_tokens"] + flushed_usage["output_tokens"]
+        if self.job_id and tokens:
+            self.tokens_used = self.db.execute(
+                update(ScoringJob)
+                .where(ScoringJob.id == self.job_id)
+                .values(tokens_used=ScoringJob.tokens_used + tokens)
+                .returning(ScoringJob.tokens_used)
+            ).scalar_one()
+        record_usage(
+            self.db, self.model, self.counted_resumes, self.counted_usage["input_tokens"],
+            self.counted_usage["output_tokens"], self.timed_resumes, self.timed_seconds
+        )
+        self.counted_resumes, self.counted_usage = 0, _add_usage({}, {})
+        self.timed_resumes, self.timed_seconds = 0, 0.0
+        self._write()
+        self.db.commit()
+        self.pending = []
+        self.handed_over = []
+        self.publish()
+
+    def count_request(self, resumes: int, usage: dict, seconds: float | None = None):
+        """
+        Note a full scoring request for this many resumes in the model's usage stats,
+        which feed the forecast, with its duration for interactive requests. Requests
+        cut short by an early exit are left out: their usage is estimated and they
+        end sooner, so token and time averages both cover only complete requests.
+        """
+        if usage.get("estimated"):
+            return
+        self.counted_resumes += resumes
+        self.counted_usage = _add_usage(self.counted_usage, usage)
+        if seconds is not None:
+            self.timed_resumes += resumes
+            self.timed_seconds += seconds
+
+    def budget_spent(self, refresh: bool = False) -> bool:
+        """
+        True once the job's token budget (if any) is used up, counting buffered usage.
+        refresh=True first re-reads the job's total, which other runners add to.
+        """
+        if self.token_budget is None:
+            return False
+        if refresh and self.job_id:
+            self.tokens_used = self.db.exec(select(ScoringJob.tokens_used).where(ScoringJob.id == self.job_id)).one()
+        buffered = sum(usage.get("input_tokens", 0) + usage.get("output_tokens", 0) for _, _, _, usage, *_ in self.pending)
+        return self.tokens_used + buffered >= self.token_budget
+
+    def publish(self):
+        """Publish committed results and the session's progress to event subscribers."""
+        for summary in self.scored:
+            session_events.publish(self.session.id, "candidate", summary)
+        self.scored = []
+        session_events.publish(self.session.id, "progress", session_progress(self.session))
+
+    def finish(self):
+        """
+        Complete the run. The criteria snapshot only advances when every work item
+        succeeded. Candidates whose item failed (and their near-duplicates) lose the
+        results they had before the run, so they show as unscored rather than scored
+        against the old criteria, and the next run scores them again.
+        """
+        failures = self.db.exec(
+            select(WorkItem.candidate_id, WorkItem.last_error).where(WorkItem.job_id == self.job_id, WorkItem.state == "failed")
+        ).all()
+        failed = [candidate_id for candidate_id, _ in failures]
+        if failed:
+            started_at = self.db.exec(select(ScoringJob.started_at).where(ScoringJob.id == self.job_id)).one()
+            self.db.execute(
+                update(Candidate)
+                .where(
+                    Candidate.session_id == self.session.id,
+                    or_(Candidate.id.in_(failed), Candidate.duplicate_of_id.in_(failed)),
+                    Candidate.processed_at < started_at
+                )
+                .values(_CLEARED_RESULT)
+            )
+            logger.warning(f"Session {self.session.id}: {len(failed)} candidates could not be scored, keeping the previous criteria snapshot")
+        else:
+            self.session.scored_criteria_json = self.session.criteria_json
+        self.session.status = "completed"
+        self.session.unscored_count = len(failed)
+        self.session.budget_exhausted = any(error == BUDGET_EXHAUSTED for _, error in failures)
+        self.db.add(self.session)
+        self.db.commit()
+        self.publish()
+        session_events.publish(self.session.id, "status", {
+            "status": "completed",
+            "unscored_count": self.session.unscored_count,
+            "budget_exhausted": self.session.budget_exhausted,
+        })
+        if score_cache.enabled:
+            score_cache.evict(self.db)
+        logger.info(
+            f"Completed batch processing for session {self.session.id}. Tokens used: "
+            f"{self.session.total_input_tokens} in, {self.session.total_output_tokens} out, "
+            f"{self.session.total_cache_read_tokens} cache reads, {self.session.total_cache_write_tokens} cache writes"
+        )
+
+    def complete_incremental(self, previous: dict, new_scores: dict) -> dict | None:
+        """Merge re-scored categories, or None if the LLM didn't return all of them."""
+        new_scores = {k: v for k, v in new_scores.items() if k in self.diff.changed}
+        if set(new_scores) != self.diff.changed:
+            return None
+        return _merge_category_scores(previous, new_scores, self.diff, self.criteria_json)
+
+    def text(self, candidate: Candidate) -> str:
+        """Compacted resume text to send to the LLM (empty if there is none)."""
+        if candidate.id not in self.texts:
+            text, truncated = prompt_text(candidate.original_text)
+            self.texts[candidate.id] = text
+            if text and settings.RESUME_COMPACTION_ENABLED:
+                self.token_counts[candidate.id] = {
+                    "original_token_count": estimate_tokens(candidate.original_text),
+                    "compacted_token_count": estimate_tokens(text),
+                    "text_truncated": truncated,
+                }
+        return self.texts[candidate.id]
+
+    def _cached(self, candidate: Candidate) -> dict | None:
+        """Score cache hit for the candidate's text under the current criteria and model."""
+        text = self.text(candidate)
+        if not text or not score_cache.enabled:
+            return None
+        result = score_cache.get(self.db, make_cache_key(hash_text(text), self.criteria_hash, self.model))
+        if result is not None:
+            self.cache_hits += 1
+        return result
+
+    def _prefilter(self, candidate: Candidate) -> dict | None:
+        """Run the dealbreaker pre-filter; returns a rejection result if a rule fired."""
+        # OCR output can drop or garble words, so absence of a term proves nothing
+        if not self.prefilter_rules or not candidate.original_text or candidate.extraction_warning:
+            return None
+        result = run_prefilter(self.prefilter_rules, candidate.original_text)
+        if result is not None:
+            self.prefilter_rejected += 1
+            logger.info(f"Candidate {candidate.id} rejected by pre-filter: {result['prefilter_rule']}")
+        return result
+
+    def _count(self, candidate_id: str, result: dict):
+        self.rows[candidate_id] = _result_values(result)
+        self.scored.append({
+            "id": candidate_id,
+            **{k: result.get(k) for k in ("passed_dealbreakers", "final_score", "one_liner", "rejection_reason", "prefilter_rule")}
+        })
+        self.processed += 1
+        if result.get("passed_dealbreakers"):
+            self.qualified += 1
+
+    def _reuse_for_duplicates(self):
+        """
+        Copy pending results to the near-duplicates of their candidates: those left
+        out of the job when it was planned and those handed over to their canonical
+        candidate (item done, no result yet). Duplicates still working on an item of
+        their own are left to it.
+        """
+        results = {cid: values for cid, values in self.rows.items() if "passed_dealbreakers" in values}
+        if not results:
+            return
+        query = select(Candidate.id, Candidate.duplicate_of_id).where(Candidate.duplicate_of_id.in_(list(results)))
+        if self.job_id:
+            items = select(WorkItem.candidate_id).where(WorkItem.job_id == self.job_id)
+            query = query.where(or_(
+                Candidate.id.not_in(items),
+                and_(Candidate.processed_at.is_(None), Candidate.id.in_(items.where(WorkItem.state == "done")))
+            ))
+        for candidate_id, canonical_id in self.db.exec(query).all():
+            if candidate_id in self.rows:
+                continue
+            values = results[canonical_id]
+            self.rows[candidate_id] = dict(values)
+            self.scored.append({
+                "id": candidate_id,
+                "duplicate_of_id": canonical_id,
+                **{k: values[k] for k in ("passed_dealbreakers", "final_score", "one_liner", "rejection_reason", "prefilter_rule")}
+            })
+            self.processed += 1
+            self.duplicates_reused += 1
+            if values["passed_dealbreakers"]:
+                self.qualified += 1
 
+    def _write(self):
+        """Write pending candidate rows with one bulk UPDATE, then the session counters."""
+        self._reuse_for_duplicates()
+        rows = [{"id": cid, **self.token_counts.get(cid, {}), **values} for cid, values in self.rows.items()]
+        rows = [row for row in rows if len(row) > 1]
+        if rows:
+            self.db.execute(update(Candidate), rows)
+        self.rows = {}
+        self._update_session()
 
-async def _process_session_async(session_id: str):
+    def _update_session(self):
+        """Add unapplied progress to the session row, in the caller's transaction."""
+        deltas = {
+            "processed_count": self.processed,
+            "qualified_count": self.qualified,
+            "score_cache_hits": self.cache_hits,
+            "prefilter_rejected_count": self.prefilter_rejected,
+            "duplicates_reused": self.duplicates_reused,
+            "total_input_tokens": self.usage["input_tokens"],
+            "total_output_tokens": self.usage["output_tokens"],
+            "total_cache_read_tokens": self.usage["cache_read_tokens"],
+            "total_cache_write_tokens": self.usage["cache_write_tokens"],
+        }
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        self.db.execute(
+            update(ScreeningSession)
+            .where(ScreeningSession.id == self.session.id)
+            .values({name: func.coalesce(getattr(ScreeningSession, name), 0) + delta for name, delta in deltas.items()})
+        )
+        self.processed = self.qualified = self.cache_hits = self.prefilter_rejected = self.duplicates_reused = 0
+        self.usage = _add_usage({}, {})
+
+
+def process_job(job_id: str, owner: str, should_stop=lambda: False) -> bool:
     """
-    Background task to process all resumes in a session.
-    Tracks token usage across all LLM calls.
+    Work on a ScoringJob in this thread's own event loop (see job_queue.JobRunner).
+
+    If owner holds the job lease, plans the job first (and for bulk jobs, submits and
+    polls the batch). Interactive jobs are then worked through their items until none
+    are left to claim; the runner that finishes the last item completes the job.
+
+    Returns:
+        True if there is nothing left for this runner, False if it stopped early
+        (shutdown or lost lease) and its leases should be handed back.
     """
-    logger.info(f"Starting batch processing for session {session_id}")
+    return asyncio.run(_run_job_async(job_id, owner, should_stop))
+
 
+async def _run_job_async(job_id: str, owner: str, should_stop) -> bool:
     with Session(engine) as db:
-        session = db.get(ScreeningSession, session_id)
+        job = db.get(ScoringJob, job_id)
+        if not job or job.status != "running":
+            return True
+        session = db.get(ScreeningSession, job.session_id)
         if not session:
-            return
+            logger.error(f"Job {job_id} has no session, dropping it")
+            job.status = "failed"
+            db.add(job)
+            db.commit()
+            return True
+
+        run = _ScoringRun(db, session)
+        run.job_id, run.token_budget, run.tokens_used = job_id, job.token_budget, job.tokens_used or 0
+        is_owner = job.lease_owner == owner
+        if is_owner and not job.planned:
+            logger.info(f"Planning {job.mode} job {job_id} for session {session.id}")
+            candidates = db.exec(select(Candidate).where(Candidate.session_id == session.id)).all()
+            # Near-duplicates get their canonical candidate's result once it is scored
+            ids = {c.id for c in candidates}
+            duplicates = [c for c in candidates if c.duplicate_of_id in ids]
+            if duplicates:
+                logger.info(f"Job {job_id}: {len(duplicates)} near-duplicate candidates reuse another candidate's score")
+                candidates = [c for c in candidates if c.duplicate_of_id not in ids]
+            ready = [c for c in candidates if c.extraction_status != "extracting"]
+            for candidate, previous in run.plan(ready):
+                db.add(WorkItem(job_id=job_id, candidate_id=candidate.id, kind="incremental" if previous is not None else "full"))
+            # Candidates still being extracted are planned when their items are claimed
+            extracting = [c for c in candidates if c.extraction_status == "extracting"]
+            for candidate in extracting:
+                db.add(WorkItem(job_id=job_id, candidate_id=candidate.id, state="waiting", planned=False))
+            job.planned = True
+            if job.mode != "bulk":
+                # From here on any runner can lease the items
+                job.lease_owner = None
+                job.lease_expires_at = None
+            db.add(job)
+            db.commit()
+            if extracting:
+                logger.info(f"Job {job_id}: {len(extracting)} candidates wait for text extraction")
+                release_waiting_items(db, job_id=job_id)
+                db.commit()
+            run.publish()
+        elif job.mode == "bulk" and not is_owner:
+            return True  # Only the lease holder polls the batch
+        elif is_owner:
+            logger.info(f"Resuming {job.mode} job {job_id} for session {session.id}")
+
+        lease_lost = asyncio.Event()
+
+        async def keep_leases():
+            while True:
+                await asyncio.sleep(max(1, settings.JOB_LEASE_SECONDS / 3))
+                if not renew_leases(job_id, owner):
+                    logger.warning(f"Lost the lease on job {job_id}, stopping")
+                    lease_lost.set()
+                    return
+
+        def should_continue() -> bool:
+            return not lease_lost.is_set() and not should_stop()
+
+        heartbeat = asyncio.create_task(keep_leases())
+        try:
+            if job.mode == "bulk":
+                finished = await _process_job_bulk(run, job_id, should_continue)
+            else:
+                finished = await _process_job_interactive(run, job_id, owner, should_continue)
+        finally:
+            heartbeat.cancel()
+
+        if not finished or not should_continue():
+            return False
+
+        if open_item_count(job_id) == 0 and complete_job(db, job_id):
+            run.finish()
+        return True
+
+
+def _canonical_open(run: _ScoringRun, candidate: Candidate) -> bool:
+    """True while the candidate's canonical near-duplicate still has an open item in this job."""
+    return candidate.duplicate_of_id is not None and run.db.exec(
+        select(WorkItem.id).where(
+            WorkItem.job_id == run.job_id, WorkItem.candidate_id == candidate.duplicate_of_id,
+            WorkItem.state.in_(("waiting", "pending", "leased"))
+        )
+    ).first() is not None
+
+
+def _duplicate_result(run: _ScoringRun, candidate: Candidate) -> dict | None:
+    """The result of the candidate's canonical near-duplicate, once scored in this job."""
+    if not candidate.duplicate_of_id:
+        return None
+    canonical = run.db.exec(
+        select(Candidate).where(Candidate.id == candidate.duplicate_of_id).execution_options(populate_existing=True)
+    ).first()
+    if canonical is None:
+        return None
+    # Scored in this run: either served while planning (no item) or its item is done
+    unfinished = run.db.exec(
+        select(WorkItem.id).where(
+            WorkItem.job_id == run.job_id, WorkItem.candidate_id == canonical.id, WorkItem.state != "done"
+        )
+    ).first()
+    result = _result_from_candidate(canonical) if unfinished is None else None
+    if result is not None:
+        run.duplicates_reused += 1
+    return result
+
+
+def _load_items(run: _ScoringRun, item_ids: list[str], owner: str | None) -> list[tuple[WorkItem, Candidate, dict | None]]:
+    """
+    Load claimed work items with their candidates and, for incremental items, the
+    previous result. Items that cannot be scored are buffered as failed; items
+    planned before their text was extracted are served from their near-duplicate's
+    result, the score cache or the pre-filter here when possible, and written at once.
+    Near-duplicates whose canonical candidate is still being scored are handed over
+    to it instead of being scored themselves.
+    """
+    db = run.db
+    items = db.exec(select(WorkItem).where(WorkItem.id.in_(item_ids))).all()
+    candidates = {
+        c.id: c for c in db.exec(select(Candidate).where(Candidate.id.in_([i.candidate_id for i in items]))).all()
+    }
+    loaded = []
+    served = False
+    for item in items:
+        candidate = candidates.get(item.candidate_id)
+        error = "Candidate no longer exists" if candidate is None else None if run.text(candidate) else "No resume text"
+        if error:
+            run.buffer(item.id, item.candidate_id, None, {}, error, final=True)
+            continue
+        if not item.planned:
+            if _canonical_open(run, candidate):
+                # Takes the canonical candidate's result when that is written
+                run.hand_over(item.id, candidate)
+                served = True
+                continue
+            result = _duplicate_result(run, candidate) or run._cached(candidate) or run._prefilter(candidate)
+            if result is not None:
+                run.buffer(item.id, candidate.id, result, {}, from_llm=False)
+                served = True
+                continue
+        previous = _result_from_candidate(candidate) if item.kind == "incremental" else None
+        loaded.append((item, candidate, previous))
+    if served:
+        # Cache hits are recorded on their entries; leaving that write open would
+        # block this runner's own lease updates
+        run.flush(owner)
+    return loaded
+
+
+async def _process_job_interactive(run: _ScoringRun, job_id: str, owner: str, should_continue) -> bool:
+    """
+    Score a job's work items with one LLM call each (or one per pack).
+
+    Items are leased in chunks of WORK_ITEM_CHUNK_SIZE and scored concurrently,
+    bounded by SCORING_CONCURRENCY for this session and SCORING_GLOBAL_CONCURRENCY
+    across sessions. Results are buffered in completion order from this coroutine
+    only, so the DB session and progress counters are never touched concurrently, and
+    written every RESULT_FLUSH_MAX_RESULTS results or RESULT_FLUSH_INTERVAL_MS (and
+    before returning). Each result is committed together with its work item, and only
+    if this runner still holds the item, so a resumed job never re-scores a finished
+    candidate and two runners never both record one.
 
-        candidates = db.query(Candidate).filter(Candidate.session_id == session_id).all()
-        criteria_json = json.loads(session.criteria_json) if session.criteria_json else {}
+    When the criteria changed since the last run but no dealbreaker category did,
+    previously scored candidates are re-scored incrementally: only the changed
+    categories are sent to the LLM (and only for candidates that passed the
+    dealbreakers), and final_score is recomputed from the category weights.
 
-        processed = 0
-        qualified = 0
-        total_input_tokens = session.total_input_tokens or 0
-        total_output_tokens = session.total_output_tokens or 0
+    With SCORING_PACK_TOKEN_BUDGET set, short resumes are scored several per
+    request; resumes missing or malformed in a pack's output are re-scored alone.
 
-        async def process_one(candidate) -> tuple[bool, dict]:
-            """Returns (success, usage_dict)"""
-            if not candidate.original_text:
-                return False, {"input_tokens": 0, "output_tokens": 0}
+    With a job token budget, no new request starts once the budget is spent; the
+    remaining items are marked failed and the job completes with what it scored.
+    Requests already in flight finish, so the budget can be overshot by those.
+    """
+    db = run.db
+    session_slots = asyncio.Semaphore(max(1, settings.SCORING_CONCURRENCY))
+
+    async def process_one(candidate, previous: dict | None) -> tuple[Candidate, dict | None, dict]:
+        """Returns (candidate, result_or_None, usage_dict)"""
+        text = run.text(candidate)
+        if not text:
+            return candidate, None, {"input_tokens": 0, "output_tokens": 0}
 
+        async with session_slots, _global_slot():
+            if run.budget_spent():
+                return candidate, None, {"input_tokens": 0, "output_tokens": 0}
             try:
-                result, usage = await score_resume(candidate.original_text, criteria_json)
-
-                candidate.passed_dealbreakers = result.get("passed_dealbreakers")
-                candidate.rejection_reason = result.get("rejection_reason")
-                candidate.final_score = result.get("final_score")
-                candidate.one_liner = result.get("one_liner")
-                candidate.category_scores_json = json.dumps(result.get("category_scores"))
-                candidate.strengths_json = json.dumps(result.get("strengths"))
-                candidate.concerns_json = json.dumps(result.get("concerns"))
-                candidate.highlights_json = json.dumps(result.get("highlights"))
-                candidate.processed_at = datetime.utcnow()
-
-                return True, usage
+                if previous is not None:
+                    new_scores, usage = await score_resume_categories(
+                        text, run.criteria_json, run.diff.changed, system_prompt=run.category_prompt
+                    )
+                    result = run.complete_incremental(previous, new_scores)
+                    if result is not None:
+                        return candidate, result, usage
+                    logger.warning(f"Incremental rescore of candidate {candidate.id} missed categories, rescoring fully")
+                    result, full_usage = await score_resume(text, run.criteria_json, system_prompt=run.system_prompt)
+                    return candidate, result, _add_usage(usage, full_usage)
+
+                started = time.monotonic()
+                result, usage = await score_resume(text, run.criteria_json, system_prompt=run.system_prompt)
+                run.count_request(1, usage, time.monotonic() - started)
+                return candidate, result, usage
             except Exception as e:
                 logger.error(f"Failed to score candidate {candidate.id}: {e}")
-                return False, {"input_tokens": 0, "output_tokens": 0}
+                return candidate, None, {"input_tokens": 0, "output_tokens": 0}
 
-        for candidate in candidates:
-            success, usage = await process_one(candidate)
-            if success:
-                processed += 1
-                if candidate.passed_dealbreakers:
-                    qualified += 1
-
-            # Accumulate token usage
-            total_input_tokens += usage.get("input_tokens", 0)
-            total_output_tokens += usage.get("output_tokens", 0)
-
-            # Update progress incrementally
-            session.processed_count = processed
-            session.qualified_count = qualified
-            session.total_input_tokens = total_input_tokens
-            session.total_output_tokens = total_output_tokens
-            db.add(session)
-            db.add(candidate)
-            db.commit()  # Commit frequently so frontend sees progress
-
-        session.status = "completed"
+    async def process_pack(pack: list[tuple[Candidate, dict | None]]) -> list[tuple[Candidate, dict | None, dict]]:
+        if len(pack) == 1:
+            return [await process_one(*pack[0])]
+
+        by_id = {str(i + 1): candidate for i, (candidate, _) in enumerate(pack)}
+        results, usage = {}, {"input_tokens": 0, "output_tokens": 0}
+        async with session_slots, _global_slot():
+            if run.budget_spent():
+                return [(candidate, None, {"input_tokens": 0, "output_tokens": 0}) for candidate in by_id.values()]
+            try:
+                started = time.monotonic()
+                results, usage = await score_resume_pack(
+                    {rid: run.text(c) for rid, c in by_id.items()}, run.criteria_json, system_prompt=run.system_prompt
+                )
+                run.count_request(len(results), usage, time.monotonic() - started)
+            except Exception as e:
+                logger.warning(f"Packed scoring of {len(pack)} candidates failed, scoring individually: {e}")
+
+        # The pack's usage is attributed to its first result
+        outcomes = []
+        for rid, candidate in by_id.items():
+            if rid in results:
+                outcomes.append((candidate, results[rid], usage))
+                usage = {"input_tokens": 0, "output_tokens": 0}
+        missing = [c for rid, c in by_id.items() if rid not in results]
+        if missing:
+            logger.warning(f"Packed scoring returned no valid result for {len(missing)} of {len(pack)} candidates, scoring them individually")
+            retried = await asyncio.gather(*(process_one(c, None) for c in missing))
+            if usage["input_tokens"] or usage["output_tokens"]:
+                candidate, result, retry_usage = retried[0]
+                retried[0] = (candidate, result, _add_usage(usage, retry_usage))
+            outcomes.extend(retried)
+        return outcomes
+
+    while should_continue():
+        if run.budget_spent(refresh=True):
+            run.flush(owner)
+            skipped = fail_open_items(db, job_id, BUDGET_EXHAUSTED)
+            db.commit()
+            if skipped:
+                logger.warning(f"Session {run.session.id}: token budget of {run.token_budget} spent, {skipped} candidates left unscored")
+            return True
+
+        item_ids = claim_items(job_id, owner, max(1, settings.WORK_ITEM_CHUNK_SIZE))
+        if not item_ids:
+            # Anything still open is leased by other runners
+            run.flush(owner)
+            return True
+
+        loaded = _load_items(run, item_ids, owner)
+        items_by_candidate = {candidate.id: item for item, candidate, _ in loaded}
+        to_score = [(candidate, previous) for _, candidate, previous in loaded]
+        packs = _pack(to_score, run.texts)
+        if len(packs) < len(to_score):
+            logger.info(f"Session {run.session.id}: scoring {len(to_score)} candidates in {len(packs)} requests")
+        pending = {asyncio.create_task(process_pack(pack)) for pack in packs}
+
+        while pending:
+            # Wake up for the flush deadline even if no call completes by then
+            done, pending = await asyncio.wait(pending, timeout=run.flush_wait(), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                for candidate, result, usage in task.result():
+                    if result is not None:
+                        run.buffer(items_by_candidate[candidate.id].id, candidate.id, result, usage)
+                    elif run.budget_spent():
+                        run.buffer(items_by_candidate[candidate.id].id, candidate.id, None, usage, BUDGET_EXHAUSTED, final=True)
+                    else:
+                        run.buffer(items_by_candidate[candidate.id].id, candidate.id, None, usage, "LLM scoring failed")
+            if run.flush_due():
+                run.flush(owner)  # Progress reaches the frontend at most RESULT_FLUSH_INTERVAL_MS late
+    # Stopping (shutdown or lost lease): keep what has been scored
+    run.flush(owner)
+    return False
+
+
+async def _process_job_bulk(run: _ScoringRun, job_id: str, should_continue) -> bool:
+    """
+    Bulk processing: submit every open work item of the job as one provider batch,
+    poll until it ends, then apply all results in one transaction.
+
+    Trades latency (batches may take hours) for the providers' lower batch pricing
+    and separate rate limits. The batch id is stored on the session, so a resumed
+    job goes back to polling instead of submitting again. With a job token budget,
+    only the candidates the budget is expected to cover are submitted.
+    """
+    db = run.db
+    session = run.session
+    # A batch can't take more work once submitted, so wait for extraction to finish
+    if not session.bulk_batch_id:
+        while open_item_count(job_id, states=("waiting",)):
+            if not should_continue():
+                return False
+            await asyncio.sleep(settings.JOB_POLL_SECONDS)
+    open_ids = db.exec(
+        select(WorkItem.id).where(WorkItem.job_id == job_id, WorkItem.state.in_(("pending", "leased")))
+    ).all()
+    # Bulk items are never leased individually; the job lease covers them
+    loaded = _load_items(run, list(open_ids), None) if open_ids else []
+    if not loaded:
+        session.bulk_batch_id = None
         db.add(session)
+        run.flush(None)
         db.commit()
-        logger.info(f"Completed batch processing for session {session_id}. Tokens used: {total_input_tokens} in, {total_output_tokens} out")
+        return True
+
+    batch_id = session.bulk_batch_id
+    if not batch_id:
+        requests = []
+        for _, candidate, previous in loaded:
+            if previous is not None:
+                system, user = run.category_prompt, RESUME_CATEGORY_SCORE_USER_TEMPLATE.format(resume_text=run.text(candidate))
+            else:
+                system, user = run.system_prompt, RESUME_SCORE_USER_TEMPLATE.format(resume_text=run.text(candidate))
+            requests.append({"custom_id": candidate.id, "system": system, "user": user, "cache_system": True})
+
+        if run.token_budget is not None:
+            # A batch can't be stopped part way, so only submit what the budget is expected to cover
+            allowance = run.token_budget - run.tokens_used
+            output_tokens = expected_output_tokens(db.get(ModelUsageStats, run.model))
+            within = []
+            for entry, request in zip(loaded, requests):
+                cost = estimate_tokens(request["system"]) + estimate_tokens(request["user"]) + output_tokens
+                if cost > allowance:
+                    run.buffer(entry[0].id, entry[1].id, None, {}, BUDGET_EXHAUSTED, final=True)
+                    continue
+                allowance -= cost
+                within.append((entry, request))
+            if len(within) < len(requests):
+                logger.warning(f"Session {session.id}: token budget of {run.token_budget} covers {len(within)} of {len(requests)} candidates")
+            loaded = [entry for entry, _ in within]
+            requests = [request for _, request in within]
+            if not requests:
+                run.flush(None)
+                return True
+
+        try:
+            batch_id = await llm_client.submit_batch(requests)
+        except Exception as e:
+            logger.error(f"Failed to submit batch for session {session.id}: {e}")
+            raise
+
+        session.bulk_batch_id = batch_id
+        db.add(session)
+        run.flush(None)
+        db.commit()
+        logger.info(f"Session {session.id}: submitted batch {batch_id} with {len(requests)} requests")
+    else:
+        logger.info(f"Session {session.id}: resuming batch {batch_id}")
+
+    while True:
+        if not should_continue():
+            return False
+        await asyncio.sleep(settings.BULK_POLL_INTERVAL_SECONDS)
+        try:
+            status = await llm_client.get_batch_status(batch_id)
+        except Exception as e:
+            logger.warning(f"Polling batch {batch_id} failed, retrying: {e}")
+            continue
+        if status != "in_progress":
+            break
+
+    if status != "ended":
+        # Nothing was scored; the session fails rather than completing without results
+        abort_job(db, job_id, f"Provider batch {batch_id} ended with status {status}")
+        return True
+    results = await llm_client.get_batch_results(batch_id)
+
+    for item, candidate, previous in loaded:
+        parsed, usage, error = results.get(candidate.id, (None, {}, "Missing from batch results"))
+        result = None
+        if error:
+            logger.error(f"Failed to score candidate {candidate.id}: {error}")
+        elif previous is not None:
+            result = run.complete_incremental(previous, parsed.get("category_scores") or {})
+            if result is None:
+                error = "Incremental rescore missed categories"
+                logger.error(f"Incremental rescore of candidate {candidate.id} missed categories")
+        else:
+            result = parsed
+            run.count_request(1, usage)
+        # A batch is not retried item by item
+        run.buffer(item.id, candidate.id, result, usage, error, final=True)
+    session.bulk_batch_id = None
+    db.add(session)
+    run.flush(None)
+    return True
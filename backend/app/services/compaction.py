@@ -0,0 +1,181 @@
+from app.config import settings
+from app.services.tokens import estimate_tokens
+import math
+import re
+
+# Resume text normalization before prompting.
+#
+# Extracted PDF text carries page furniture (headers, footers, page numbers), runs
+# of whitespace and repeated lines that cost tokens without adding evidence.
+# compact_resume_text() removes those and, if a budget is given, trims the text
+# section by section so the least useful sections go first.
+
+PAGE_BREAK = "\f"  # Separator extract_text_from_pdf puts between pages (after each page's last newline)
+
+_PAGE_NUMBER_RE = re.compile(r"^(page\s*)?\d{1,3}(\s*(of|/)\s*\d{1,3})?$|^-\s*\d{1,3}\s*-$", re.IGNORECASE)
+_SPACES_RE = re.compile(r"[ \t\u00a0]+")
+_DIGITS_RE = re.compile(r"\d+")
+_EDGE_LINES = 3  # Lines at the top and bottom of a page checked for headers/footers
+_MIN_DEDUPE_LENGTH = 40  # Shorter lines (titles, skills) legitimately repeat
+
+# Section priority when trimming to the budget: lower numbers are kept first
+_SECTION_PRIORITIES = [
+    (1, re.compile(r"experience|employment|work history|career history|professional background", re.IGNORECASE)),
+    (2, re.compile(r"skills|competencies|technologies|technical|education|qualifications|academic", re.IGNORECASE)),
+    (3, re.compile(r"certifications?|licen[sc]es?|projects|summary|profile|objective|about", re.IGNORECASE)),
+    (4, re.compile(r"publications|patents|awards|honou?rs|volunteer|activities|interests|hobbies|references|languages|courses", re.IGNORECASE)),
+]
+_DEFAULT_SECTION_PRIORITY = 3
+_HEADING_RE = re.compile(r"^[A-Za-z][A-Za-z &/,'-]{1,38}:?$")
+_TRUNCATED_MARKER = "[... truncated ...]"
+
+
+def _normalize(line: str) -> str:
+    return _DIGITS_RE.sub("#", line.lower())
+
+
+def _strip_page_furniture(pages: list[list[str]]) -> list[list[str]]:
+    """Drop lines that repeat at the top or bottom of most pages, keeping the first occurrence."""
+    if len(pages) < 2:
+        return pages
+
+    def edges(lines):
+        return set(range(min(_EDGE_LINES, len(lines)))) | set(range(max(0, len(lines) - _EDGE_LINES), len(lines)))
+
+    page_counts = {}
+    for lines in pages:
+        for norm in {_normalize(lines[i]) for i in edges(lines)}:
+            page_counts[norm] = page_counts.get(norm, 0) + 1
+
+    threshold = max(2, math.ceil(len(pages) / 2))
+    furniture = {norm for norm, count in page_counts.items() if count >= threshold}
+    seen = set()
+    stripped = []
+    for lines in pages:
+        page_edges = edges(lines)
+        kept = []
+        for i, line in enumerate(lines):
+            norm = _normalize(line)
+            if i in page_edges and norm in furniture:
+                if norm in seen:
+                    continue
+                seen.add(norm)
+            kept.append(line)
+        stripped.append(kept)
+    return stripped
+
+
+def _section_priority(heading: str) -> int:
+    for priority, pattern in _SECTION_PRIORITIES:
+        if pattern.search(heading):
+            return priority
+    return _DEFAULT_SECTION_PRIORITY
+
+
+def _is_heading(line: str) -> bool:
+    words = len(line.split())
+    if not _HEADING_RE.match(line) or words > 5:
+        return False
+    if line.isupper() or line.endswith(":"):
+        return True
+    return words <= 3 and any(p.search(line) for _, p in _SECTION_PRIORITIES)
+
+
+def _split_sections(lines: list[str]) -> list[tuple[int, list[str]]]:
+    """Split into (priority, lines) sections; the text before the first heading (name, contact) ranks first."""
+    sections = [(0, [])]
+    for line in lines:
+        if _is_heading(line):
+            sections.append((_section_priority(line), [line]))
+        else:
+            sections[-1][1].append(line)
+    return [s for s in sections if s[1]]
+
+
+def _fit_to_budget(lines: list[str], token_budget: int) -> list[str]:
+    sections = _split_sections(lines)
+    remaining = token_budget
+    kept: dict[int, list[str]] = {}
+    for index in sorted(range(len(sections)), key=lambda i: (sections[i][0], i)):
+        section_lines = sections[index][1]
+        cost = estimate_tokens("\n".join(section_lines)) + 1
+        if cost <= remaining:
+            kept[index] = section_lines
+            remaining -= cost
+            continue
+        # Keep the beginning of the first section that doesn't fit, then stop
+        partial = []
+        for line in section_lines:
+            cost = estimate_tokens(line) + 1
+            if cost > remaining:
+                break
+            partial.append(line)
+            remaining -= cost
+        if partial:
+            kept[index] = partial + [_TRUNCATED_MARKER]
+        break
+
+    output = []
+    for index in range(len(sections)):
+        output.extend(kept.get(index, []))
+    return output
+
+
+def _is_page_number(page: list[str], i: int) -> bool:
+    # Only at the top or bottom of a page; elsewhere a bare number is content
+    return i in (0, len(page) - 1) and bool(_PAGE_NUMBER_RE.match(page[i]))
+
+
+def display_text(text: str | None) -> str | None:
+    """Extracted text without the page separators, as shown to users."""
+    return text.replace(PAGE_BREAK, "") if text else text
+
+
+def compact_resume_text(text: str, token_budget: int = 0) -> tuple[str, bool]:
+    """
+    Normalize extracted resume text for prompting.
+
+    Removes repeated page headers/footers and page numbers, collapses whitespace,
+    drops duplicate long lines and, if token_budget > 0, trims the text to the budget
+    by dropping or truncating the lowest-priority sections first.
+
+    Returns:
+        tuple: (compacted_text, truncated), truncated being True if content was
+        dropped to fit the budget.
+    """
+    if not text:
+        return "", False
+
+    pages = []
+    for page in text.split(PAGE_BREAK):
+        lines = [_SPACES_RE.sub(" ", line).strip() for line in page.splitlines()]
+        pages.append([line for line in lines if line])
+    pages = _strip_page_furniture(pages)
+
+    lines = []
+    seen = set()
+    for line in (line for page in pages for i, line in enumerate(page) if not _is_page_number(page, i)):
+        if lines and line == lines[-1]:
+            continue
+        if len(line) >= _MIN_DEDUPE_LENGTH:
+            if line in seen:
+                continue
+            seen.add(line)
+        lines.append(line)
+
+    truncated = token_budget > 0 and estimate_tokens("\n".join(lines)) > token_budget
+    if truncated:
+        lines = _fit_to_budget(lines, token_budget)
+    return "\n".join(lines), truncated
+
+
+def prompt_text(original_text: str | None) -> tuple[str, bool]:
+    """
+    Resume text as sent to the LLM, compacted per RESUME_COMPACTION_ENABLED /
+    RESUME_TOKEN_BUDGET, and whether it was trimmed to the budget.
+    """
+    if not original_text:
+        return "", False
+    if not settings.RESUME_COMPACTION_ENABLED:
+        return display_text(original_text), False
+    return compact_resume_text(original_text, settings.RESUME_TOKEN_BUDGET)
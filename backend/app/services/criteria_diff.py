@@ -0,0 +1,107 @@
+from dataclasses import dataclass, field
+from app.schemas.common import CriteriaSchema, CriteriaCategory
+from pydantic import ValidationError
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CriteriaDiff:
+    """What changed between the criteria candidates were scored against and the current ones."""
+    changed: set[str] = field(default_factory=set)  # Category ids that are new, renamed or whose items changed
+    removed: set[str] = field(default_factory=set)
+    weights_changed: bool = False
+    requires_full_rescore: bool = False
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.changed or self.removed or self.weights_changed or self.requires_full_rescore)
+
+
+def _parse(criteria_json: dict | None) -> CriteriaSchema | None:
+    if not criteria_json:
+        return None
+    try:
+        return CriteriaSchema.model_validate(criteria_json)
+    except ValidationError as e:
+        logger.warning(f"Criteria do not match CriteriaSchema, falling back to full rescore: {e}")
+        return None
+
+
+def _normalize_items(category: CriteriaCategory) -> list[tuple[str, str | None]]:
+    # Whitespace and case edits don't change what the LLM evaluates
+    return [(" ".join(item.text.split()).casefold(), item.key) for item in category.items]
+
+
+def diff_criteria(old_json: dict | None, new_json: dict | None) -> CriteriaDiff:
+    """
+    Compare two structured criteria documents category by category.
+
+    Any change to a dealbreaker category (or a category switching dealbreaker status)
+    requires a full rescore, since it can flip passed_dealbreakers. Changes to weighted
+    categories only require those categories to be rescored. A renamed category
+    counts as changed, since its name is part of what the LLM evaluates against.
+    """
+    old, new = _parse(old_json), _parse(new_json)
+    if old is None or new is None:
+        return CriteriaDiff(requires_full_rescore=True)
+
+    diff = CriteriaDiff()
+    old_by_id = {c.id: c for c in old.categories}
+    new_by_id = {c.id: c for c in new.categories}
+
+    for cat_id, old_cat in old_by_id.items():
+        if cat_id not in new_by_id:
+            diff.removed.add(cat_id)
+            if old_cat.is_dealbreaker:
+                diff.requires_full_rescore = True
+
+    for cat_id, new_cat in new_by_id.items():
+        old_cat = old_by_id.get(cat_id)
+        if old_cat is None:
+            diff.changed.add(cat_id)
+            if new_cat.is_dealbreaker:
+                diff.requires_full_rescore = True
+            continue
+
+        if old_cat.is_dealbreaker != new_cat.is_dealbreaker:
+            diff.requires_full_rescore = True
+            continue
+
+        if _normalize_items(old_cat) != _normalize_items(new_cat) or old_cat.display_name != new_cat.display_name:
+            diff.changed.add(cat_id)
+            if new_cat.is_dealbreaker:
+                diff.requires_full_rescore = True
+
+        if (old_cat.weight or 0) != (new_cat.weight or 0):
+            diff.weights_changed = True
+
+    return diff
+
+
+def compute_final_score(category_scores: dict, criteria_json: dict) -> int | None:
+    """
+    Weighted average of the non-dealbreaker category scores.
+
+    Returns None when there are no weighted categories with scores to combine.
+    """
+    criteria = _parse(criteria_json)
+    if criteria is None or not category_scores:
+        return None
+
+    weighted_sum = 0.0
+    weight_total = 0.0
+    for category in criteria.categories:
+        if category.is_dealbreaker or not category.weight:
+            continue
+        entry = category_scores.get(category.id)
+        score = entry.get("score") if isinstance(entry, dict) else None
+        if not isinstance(score, (int, float)):
+            continue
+        weighted_sum += category.weight * score
+        weight_total += category.weight
+
+    if weight_total == 0:
+        return None
+    return round(weighted_sum / weight_total)
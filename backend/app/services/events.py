@@ -0,0 +1,130 @@
+from app.config import settings
+from app.models.session import ScreeningSession
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+import asyncio
+import logging
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# In-process pub/sub of processing events, consumed by GET /screening/{id}/events.
+#
+# Job threads publish (candidate scored, progress counters, status changes) and the
+# API's event loop streams them to clients. Each session keeps its last
+# EVENTS_BUFFER_SIZE events so a reconnecting client resumes from Last-Event-ID.
+# Event ids are "<epoch>-<seq>"; the epoch changes with every process, so ids from
+# before a restart are recognized as stale and the client gets a fresh snapshot.
+# Jobs scored by separate `python -m app.worker` processes publish nothing here; the
+# endpoint falls back to polling the session row for those.
+
+TERMINAL_STATUSES = ("completed", "failed")
+_MAX_SESSIONS = 100  # Sessions whose buffers are kept, least recently published dropped first
+
+
+def session_progress(session: ScreeningSession) -> dict:
+    """Payload of a progress event: the session's counters, status and token usage."""
+    return {
+        "status": session.status,
+        "total_resumes": session.total_resumes,
+        "processed_count": session.processed_count or 0,
+        "qualified_count": session.qualified_count or 0,
+        "score_cache_hits": session.score_cache_hits or 0,
+        "prefilter_rejected_count": session.prefilter_rejected_count or 0,
+        "duplicates_reused": session.duplicates_reused or 0,
+        "unscored_count": session.unscored_count or 0,
+        "budget_exhausted": bool(session.budget_exhausted),
+        "error": session.error,
+        "total_input_tokens": session.total_input_tokens or 0,
+        "total_output_tokens": session.total_output_tokens or 0,
+        "total_cache_read_tokens": session.total_cache_read_tokens or 0,
+        "total_cache_write_tokens": session.total_cache_write_tokens or 0,
+    }
+
+
+class _Stream:
+    def __init__(self):
+        self.seq = 0
+        self.events: deque = deque(maxlen=max(1, settings.EVENTS_BUFFER_SIZE))  # (seq, event, data)
+        self.waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+
+class SessionEvents:
+    """Per-session event buffers; publish() is thread-safe, subscribers live on an event loop."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._epoch = uuid.uuid4().hex[:8]
+        self._streams: OrderedDict[str, _Stream] = OrderedDict()
+
+    def _stream(self, session_id: str) -> _Stream:
+        stream = self._streams.get(session_id)
+        if stream is None:
+            stream = self._streams[session_id] = _Stream()
+            while len(self._streams) > _MAX_SESSIONS:
+                oldest = next(iter(self._streams))
+                if self._streams[oldest].waiters:
+                    self._streams.move_to_end(oldest)
+                    break
+                del self._streams[oldest]
+        self._streams.move_to_end(session_id)
+        return stream
+
+    def _event_id(self, seq: int) -> str:
+        return f"{self._epoch}-{seq}"
+
+    def publish(self, session_id: str, event: str, data: dict):
+        with self._lock:
+            stream = self._stream(session_id)
+            stream.seq += 1
+            stream.events.append((stream.seq, event, data))
+            waiters = list(stream.waiters)
+        for loop, wake in waiters:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass  # Subscriber's loop already closed
+
+    def last_id(self, session_id: str) -> str:
+        """Id of the newest event, to tag a snapshot with so the client resumes after it."""
+        with self._lock:
+            stream = self._streams.get(session_id)
+            return self._event_id(stream.seq if stream else 0)
+
+    def since(self, session_id: str, last_event_id: str) -> list[tuple[str, str, dict]] | None:
+        """
+        Events after last_event_id as (id, event, data).
+
+        Returns:
+            None if the id is from another process or older than the buffer, in
+            which case the client needs a fresh snapshot.
+        """
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self._epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        with self._lock:
+            stream = self._streams.get(session_id)
+            if stream is None:
+                return [] if seq == 0 else None
+            if seq > stream.seq or (stream.events and stream.events[0][0] > seq + 1):
+                return None
+            return [(self._event_id(s), event, data) for s, event, data in stream.events if s > seq]
+
+    @contextmanager
+    def subscribe(self, session_id: str):
+        """Register the running event loop for wake-ups; yields an asyncio.Event set on every publish."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._stream(session_id).waiters.add(waiter)
+        try:
+            yield waiter[1]
+        finally:
+            with self._lock:
+                stream = self._streams.get(session_id)
+                if stream:
+                    stream.waiters.discard(waiter)
+
+
+session_events = SessionEvents()
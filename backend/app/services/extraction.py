@@ -0,0 +1,318 @@
+from sqlmodel import Session, select
+from sqlalchemy import update, or_
+from app.config import settings
+from app.database import engine
+from app.models.candidate import Candidate
+from app.services.events import session_events
+from app.services.extraction_cache import extraction_cache
+from app.services.file_store import candidate_file_path
+from app.services.fingerprint import index_candidate
+from app.services.job_queue import job_runner, release_waiting_items
+from app.services.pdf_extractor import extract_text_from_file
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionPool:
+    """
+    Process pool for PDF text extraction, so parsing and OCR run on every core
+    without blocking the API's event loop.
+
+    Workers are spawned rather than forked: the API process runs threads (job
+    runner, LLM clients) that a forked child would inherit in an undefined state.
+    The pool starts on first use.
+
+    A worker that dies (out of memory, or a crash in a native PDF or OCR library on
+    a malformed file) breaks the whole pool. The pool is then replaced, and the files
+    that were in flight are retried once, each in a process of its own, so only the
+    file that caused the crash fails.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+
+    @property
+    def workers(self) -> int:
+        return max(1, settings.EXTRACTION_WORKERS or os.cpu_count() or 1)
+
+    def _spawn(self, workers: int) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._spawn(self.workers)
+                logger.info(f"Started PDF extraction pool with {self.workers} processes")
+            return self._executor
+
+    async def extract(self, path: str) -> tuple[str, str | None]:
+        """Extract one file's text in the pool; returns (text, warning) like extract_text_from_pdf."""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            return await loop.run_in_executor(executor, extract_text_from_file, path)
+        except BrokenProcessPool:
+            self._replace(executor)
+        logger.warning(f"Extraction pool broke while reading {path}, retrying it in its own process")
+        isolated = self._spawn(1)
+        try:
+            return await loop.run_in_executor(isolated, extract_text_from_file, path)
+        except BrokenProcessPool:
+            raise RuntimeError("The extraction process crashed on this file")
+        finally:
+            isolated.shutdown(wait=False)
+
+    def _replace(self, broken: ProcessPoolExecutor):
+        """Drop a broken pool (unless another caller already has); the next call starts a new one."""
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+                logger.error("A PDF extraction process died, restarting the pool")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    async def extract_many(self, paths: list[str]) -> list[tuple[str, str | None] | Exception]:
+        """Extract files concurrently; a file that raised gets its exception in place of a result."""
+        return await asyncio.gather(*(self.extract(path) for path in paths), return_exceptions=True)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+extraction_pool = ExtractionPool()
+
+
+class ExtractionStage:
+    """
+    Background text extraction for uploaded resumes, run on the API's event loop.
+
+    Uploads store the files and add candidates in the "extracting" state. This stage
+    takes them oldest first, at most EXTRACTION_QUEUE_SIZE at a time, extracts them
+    in the process pool and writes each text as soon as it is ready, releasing any
+    work items that were waiting for it to the scoring runners. A processing run can
+    therefore start while files are still being extracted, and scoring keeps pace
+    with extraction. The candidates table is the queue, so resumes still waiting
+    when the API stops are extracted after the next start.
+
+    Candidates are claimed with a lease (renewed while they are extracted, like
+    job_queue's work items), so several API processes can run the stage against one
+    database without extracting the same file twice, and a dead process's files are
+    taken over once its leases expire. A candidate whose text could not be stored is
+    retried after an increasing delay, and given up on after EXTRACTION_MAX_ATTEMPTS.
+    """
+
+    def __init__(self):
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._in_flight: set[str] = set()  # Candidate ids
+        self._extractions: set[asyncio.Task] = set()
+        self._renewed_at = 0.0
+        # Stores run in worker threads; one at a time, so each fingerprints against
+        # the ones committed before it (see fingerprint.index_candidate)
+        self._store_lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return max(1, settings.EXTRACTION_QUEUE_SIZE or 2 * extraction_pool.workers)
+
+    def start(self):
+        """Start the stage on the running event loop."""
+        if self._task and not self._task.done():
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        for task in [self._task, *self._extractions]:
+            if task:
+                task.cancel()
+        await asyncio.gather(*(t for t in [self._task, *self._extractions] if t), return_exceptions=True)
+        self._task = None
+        self._extractions.clear()
+        self._in_flight.clear()
+
+    def notify(self):
+        """Look for new candidates to extract now (call from the event loop)."""
+        if self._wake:
+            self._wake.set()
+
+    async def _loop(self):
+        while True:
+            self._wake.clear()
+            if self._in_flight and time.monotonic() - self._renewed_at > settings.JOB_LEASE_SECONDS / 3:
+                try:
+                    await asyncio.to_thread(self._renew, set(self._in_flight))
+                    self._renewed_at = time.monotonic()
+                except Exception as e:
+                    logger.error(f"Renewing extraction leases failed: {e}")
+            room = self.capacity - len(self._in_flight)
+            if room > 0:
+                try:
+                    groups, served = await asyncio.to_thread(self._next, room, set(self._in_flight))
+                except Exception as e:
+                    logger.error(f"Fetching candidates to extract failed: {e}")
+                    await asyncio.sleep(settings.JOB_POLL_SECONDS)
+                    continue
+                for path, file_hash, candidate_ids in groups:
+                    self._in_flight.update(candidate_ids)
+                    task = asyncio.create_task(self._extract(path, file_hash, candidate_ids))
+                    self._extractions.add(task)
+                    task.add_done_callback(self._extractions.discard)
+                if served:
+                    continue  # There may be more waiting behind the cache hits
+            # Woken by uploads and by every finished extraction; polls for expired
+            # leases (retries, other processes' files) and to renew its own
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def _renew(self, candidate_ids: set[str]):
+        with Session(engine) as db:
+            db.execute(
+                update(Candidate)
+                .where(Candidate.id.in_(list(candidate_ids)), Candidate.extraction_status == "extracting")
+                .values(extraction_lease_expires_at=_lease_expiry())
+            )
+            db.commit()
+
+    def _retry_later(self, candidate_ids: list[str]):
+        """Hold failed candidates back for a delay that doubles with every attempt."""
+        with Session(engine) as db:
+            for candidate in db.exec(select(Candidate).where(Candidate.id.in_(candidate_ids))).all():
+                delay = settings.JOB_POLL_SECONDS * 2 ** max(0, candidate.extraction_attempts - 1)
+                candidate.extraction_lease_expires_at = datetime.utcnow() + timedelta(seconds=delay)
+                db.add(candidate)
+            db.commit()
+
+    def _next(self, limit: int, in_flight: set[str]) -> tuple[list[tuple[str, str | None, list[str]]], int]:
+        """
+        Up to limit candidates to extract, as (path, file_hash, candidate ids) groups
+        with identical files grouped. Candidates whose file is in the extraction cache
+        by now (e.g. a duplicate extracted a moment ago) are completed right away;
+        returns the groups and how many candidates were completed that way.
+        """
+        with Session(engine) as db:
+            now = datetime.utcnow()
+            claimable = (
+                Candidate.extraction_status == "extracting",
+                or_(Candidate.extraction_lease_expires_at.is_(None), Candidate.extraction_lease_expires_at < now),
+            )
+            query = select(
+                Candidate.id, Candidate.session_id, Candidate.filename, Candidate.file_hash, Candidate.extraction_attempts
+            ).where(*claimable)
+            if in_flight:
+                query = query.where(Candidate.id.not_in(in_flight))
+            rows = db.exec(query.order_by(Candidate.uploaded_at).limit(limit)).all()
+            if not rows:
+                return [], 0
+            # Another process may have claimed some of them since
+            claimed = set(db.execute(
+                update(Candidate)
+                .where(Candidate.id.in_([r.id for r in rows]), *claimable)
+                .values(extraction_lease_expires_at=_lease_expiry(), extraction_attempts=Candidate.extraction_attempts + 1)
+                .returning(Candidate.id)
+            ).scalars().all())
+            db.commit()
+            rows = [r for r in rows if r.id in claimed]
+            given_up = [
+                (r.id, "", f"Extraction failed: text could not be stored after {r.extraction_attempts} attempts")
+                for r in rows if r.extraction_attempts >= max(1, settings.EXTRACTION_MAX_ATTEMPTS)
+            ]
+            if given_up:
+                logger.error(f"Giving up on extracting {len(given_up)} candidates")
+                rows = [r for r in rows if r.extraction_attempts < max(1, settings.EXTRACTION_MAX_ATTEMPTS)]
+            cached = (
+                extraction_cache.get_many(db, [r.file_hash for r in rows if r.file_hash]) if extraction_cache.enabled else {}
+            )
+            groups: dict[str, tuple[str, str | None, list[str]]] = {}
+            for candidate_id, session_id, filename, file_hash, _ in rows:
+                if file_hash in cached:
+                    continue
+                path = candidate_file_path(session_id, filename, file_hash)
+                groups.setdefault(file_hash or path, (path, file_hash, []))[2].append(candidate_id)
+            hits = [(r.id, *cached[r.file_hash]) for r in rows if r.file_hash in cached]
+            if hits or given_up:
+                self._store(db, hits + given_up)
+            return list(groups.values()), len(hits) + len(given_up)
+
+    async def _extract(self, path: str, file_hash: str | None, candidate_ids: list[str]):
+        try:
+            try:
+                text, warning = await extraction_pool.extract(path)
+                cacheable = True
+            except Exception as e:
+                logger.error(f"Extraction of {path} failed: {e}")
+                text, warning, cacheable = "", f"Extraction failed: {e}", False
+            await asyncio.to_thread(self._complete, candidate_ids, file_hash if cacheable else None, text, warning)
+        except Exception as e:
+            logger.error(f"Storing extracted text for {path} failed, retrying later: {e}")
+            try:
+                await asyncio.to_thread(self._retry_later, candidate_ids)
+            except Exception as e:
+                logger.error(f"Scheduling the retry failed (the lease expiry applies instead): {e}")
+        finally:
+            self._in_flight.difference_update(candidate_ids)
+            self._wake.set()
+
+    def _complete(self, candidate_ids: list[str], file_hash: str | None, text: str, warning: str | None):
+        with Session(engine) as db:
+            if file_hash and extraction_cache.enabled:
+                extraction_cache.put(db, file_hash, text, warning)
+            self._store(db, [(candidate_id, text, warning) for candidate_id in candidate_ids])
+            if file_hash and extraction_cache.enabled:
+                extraction_cache.evict(db)
+
+    def _store(self, db: Session, outcomes: list[tuple[str, str, str | None]]):
+        """Write extracted texts and fingerprints, commit, then release the work items waiting for them."""
+        with self._store_lock:
+            events = self._write(db, outcomes)
+        released = release_waiting_items(db, candidate_ids=[cid for cid, _, _ in outcomes])
+        db.commit()
+        if released:
+            job_runner.notify()
+        for session_id, data in events:
+            session_events.publish(session_id, "extracted", data)
+
+    def _write(self, db: Session, outcomes: list[tuple[str, str, str | None]]) -> list[tuple[str, dict]]:
+        """Write texts and fingerprints and commit; returns the "extracted" events to publish."""
+        now = datetime.utcnow()
+        texts = {cid: (text, warning) for cid, text, warning in outcomes}
+        events = []
+        candidates = db.exec(
+            select(Candidate).where(Candidate.id.in_(list(texts))).order_by(Candidate.uploaded_at)
+        ).all()
+        for candidate in candidates:
+            candidate.original_text, candidate.extraction_warning = texts[candidate.id]
+            candidate.extraction_status = "ready"
+            candidate.extraction_lease_expires_at = None
+            candidate.parsed_at = now
+            db.add(candidate)
+            index_candidate(db, candidate)
+            events.append((candidate.session_id, {
+                "id": candidate.id,
+                "filename": candidate.filename,
+                "status": "warning" if candidate.extraction_warning else "ok",
+                "warning": candidate.extraction_warning,
+            }))
+        db.commit()
+        return events
+
+
+def _lease_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+
+
+extraction_stage = ExtractionStage()
@@ -0,0 +1,109 @@
+from sqlmodel import Session, select
+from sqlalchemy import func
+from app.config import settings
+from app.models.cache import ExtractionCacheEntry
+from app.services.pdf_extractor import EXTRACTOR_VERSION, OCR_AVAILABLE, get_engine
+from app.services.score_cache import evict_lru
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def hash_file(path: str) -> str:
+    """sha256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_extraction_key(file_hash: str) -> str:
+    # Engines differ in their output, and results extracted without OCR must not
+    # be reused once OCR is installed
+    engine, _ = get_engine()
+    return f"{file_hash}:{engine}:v{EXTRACTOR_VERSION}{'' if OCR_AVAILABLE else '-noocr'}"
+
+
+class ExtractionCache:
+    """
+    Persistent cache of extracted PDF text, stored in the extraction_cache table.
+
+    Entries are keyed by the file's content hash and the extractor version, so the
+    same resume uploaded to another session (or again) skips parsing and OCR.
+    Least-recently-used entries are evicted once the cache grows past
+    EXTRACTION_CACHE_MAX_MB.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.EXTRACTION_CACHE_ENABLED
+
+    def get_many(self, db: Session, file_hashes: list[str]) -> dict[str, tuple[str, str | None]]:
+        """Look up files by content hash; records hits on the entries (committed by the caller)."""
+        keys = {make_extraction_key(h): h for h in set(file_hashes)}
+        found = {}
+        now = datetime.utcnow()
+        key_list = list(keys)
+        for i in range(0, len(key_list), 500):
+            for entry in db.exec(select(ExtractionCacheEntry).where(ExtractionCacheEntry.key.in_(key_list[i:i + 500]))):
+                entry.hit_count += 1
+                entry.last_used_at = now
+                db.add(entry)
+                found[keys[entry.key]] = (entry.text, entry.warning)
+        with self._lock:
+            self.hits += sum(1 for h in file_hashes if h in found)
+            self.misses += sum(1 for h in file_hashes if h not in found)
+        return found
+
+    def put(self, db: Session, file_hash: str, text: str, warning: str | None):
+        """Store an extraction result (committed by the caller). Transient OCR failures are not cached."""
+        if warning and warning.startswith("OCR failed"):
+            return
+        key = make_extraction_key(file_hash)
+        entry = db.get(ExtractionCacheEntry, key) or ExtractionCacheEntry(key=key, text=text)
+        entry.text = text
+        entry.warning = warning
+        entry.size_bytes = len(text.encode("utf-8"))
+        entry.last_used_at = datetime.utcnow()
+        db.add(entry)
+
+    def evict(self, db: Session) -> int:
+        """Drop least-recently-used entries until the cache is under its size limit."""
+        evicted, freed = evict_lru(db, ExtractionCacheEntry, settings.EXTRACTION_CACHE_MAX_MB * 1024 * 1024)
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+            logger.info(f"Extraction cache evicted {evicted} entries ({freed} bytes)")
+        return evicted
+
+    def stats(self, db: Session) -> dict:
+        entries, size = db.exec(
+            select(func.count(ExtractionCacheEntry.key), func.coalesce(func.sum(ExtractionCacheEntry.size_bytes), 0))
+        ).one()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "extractor_version": EXTRACTOR_VERSION,
+                "engine": get_engine()[0],
+                "entries": entries,
+                "size_bytes": size,
+                "max_bytes": settings.EXTRACTION_CACHE_MAX_MB * 1024 * 1024,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+extraction_cache = ExtractionCache()
@@ -0,0 +1,60 @@
+from typing import BinaryIO, NamedTuple
+import hashlib
+import os
+import tempfile
+
+# Uploaded resumes are stored content-addressed, as uploads/{session_id}/{sha256}.pdf,
+# so two files with the same name never overwrite each other and identical files
+# are stored once per session. Candidates uploaded before file_hash existed are
+# still found under their original filename.
+
+UPLOAD_ROOT = "../data/uploads"
+_CHUNK_SIZE = 1024 * 1024
+
+
+class StoredFile(NamedTuple):
+    path: str
+    sha256: str
+    size: int
+
+
+def session_upload_dir(session_id: str) -> str:
+    return os.path.join(UPLOAD_ROOT, session_id)
+
+
+def store_stream(source: BinaryIO, session_id: str, max_bytes: int | None = None) -> StoredFile:
+    """
+    Copy a stream into the session's upload directory in fixed-size chunks,
+    hashing as it writes, and move it into place under its content hash.
+    Only one chunk is held in memory regardless of file size.
+
+    Raises:
+        ValueError: the stream is longer than max_bytes (nothing is stored).
+    """
+    upload_dir = session_upload_dir(session_id)
+    os.makedirs(upload_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=upload_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in iter(lambda: source.read(_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise ValueError(f"File is larger than {max_bytes // (1024 * 1024)} MB")
+        path = os.path.join(upload_dir, f"{digest.hexdigest()}.pdf")
+        os.replace(temp_path, path)  # Same content, same name: replacing is harmless
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return StoredFile(path, digest.hexdigest(), size)
+
+
+def candidate_file_path(session_id: str, filename: str, file_hash: str | None) -> str:
+    """Where a candidate's original PDF is stored."""
+    if file_hash:
+        return os.path.join(session_upload_dir(session_id), f"{file_hash}.pdf")
+    return os.path.join(session_upload_dir(session_id), filename)
@@ -0,0 +1,135 @@
+from sqlmodel import Session, select
+from sqlalchemy import or_
+from app.config import settings
+from app.models.candidate import Candidate
+from app.models.fingerprint import ResumeFingerprint
+from app.services.compaction import PAGE_BREAK
+import hashlib
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Near-duplicate detection with 64-bit SimHash over word 3-gram shingles. Resumes
+# that differ in a few words (a re-export, a fixed typo, another recruiter's
+# footer) get fingerprints a few bits apart. Fingerprints are stored in four
+# 16-bit bands: two fingerprints at most 3 bits apart agree on at least one band,
+# so candidates are found with indexed equality lookups instead of a scan.
+
+_SHINGLE_SIZE = 3
+_MIN_WORDS = 50  # Too little text to tell resumes apart (e.g. failed extractions)
+_BANDS = 4
+_BAND_BITS = 16
+_WORD = re.compile(r"\w+")
+# Farther fingerprints can differ in every band, so band lookups would miss them
+_MAX_DISTANCE = _BANDS - 1
+
+if settings.DUPLICATE_MAX_DISTANCE > _MAX_DISTANCE:
+    logger.warning(f"DUPLICATE_MAX_DISTANCE={settings.DUPLICATE_MAX_DISTANCE} is above the supported {_MAX_DISTANCE}, using {_MAX_DISTANCE}")
+
+
+def simhash(text: str) -> int | None:
+    """64-bit SimHash of the text, or None if it is too short to fingerprint."""
+    words = _WORD.findall(text.lower())
+    if len(words) < _MIN_WORDS:
+        return None
+    hashes = {
+        int.from_bytes(hashlib.blake2b(" ".join(words[i:i + _SHINGLE_SIZE]).encode(), digest_size=8).digest(), "big")
+        for i in range(len(words) - _SHINGLE_SIZE + 1)
+    }
+    half = len(hashes) / 2
+    value = 0
+    for bit in range(64):
+        if sum((h >> bit) & 1 for h in hashes) > half:
+            value |= 1 << bit
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _bands(value: int) -> list[int]:
+    mask = (1 << _BAND_BITS) - 1
+    return [(value >> (i * _BAND_BITS)) & mask for i in range(_BANDS)]
+
+
+def resume_fingerprints(text: str | None) -> list[int]:
+    """
+    Fingerprints of a resume: its whole text and, for multi-page resumes, the text
+    without the first page, so a copy with an added cover page still matches.
+    """
+    if not text:
+        return []
+    values = [simhash(text)]
+    pages = text.split(PAGE_BREAK)
+    if len(pages) > 1:
+        values.append(simhash(PAGE_BREAK.join(pages[1:])))
+    return list(dict.fromkeys(v for v in values if v is not None))
+
+
+def _matches(db: Session, values: list[int], session_id: str | None = None) -> dict[str, int]:
+    """Candidate ids with a fingerprint near any of values, with the smallest distance."""
+    clauses = [
+        getattr(ResumeFingerprint, f"band{i}") == band for value in values for i, band in enumerate(_bands(value))
+    ]
+    query = select(ResumeFingerprint).where(or_(*clauses))
+    if session_id:
+        query = query.where(ResumeFingerprint.session_id == session_id)
+    found = {}
+    for row in db.exec(query).all():
+        distance = min(hamming(int(row.simhash, 16), value) for value in values)
+        if distance <= min(settings.DUPLICATE_MAX_DISTANCE, _MAX_DISTANCE):
+            found[row.candidate_id] = min(distance, found.get(row.candidate_id, distance))
+    return found
+
+
+def index_candidate(db: Session, candidate: Candidate) -> str | None:
+    """
+    Fingerprint a candidate's extracted text and link it to the earliest
+    near-duplicate in its session. Not committed; returns the canonical
+    candidate's id if the candidate is a duplicate.
+
+    Only fingerprints already committed (or pending in db) are seen: two
+    near-duplicates indexed concurrently in separate transactions miss each other
+    and are both scored. The extraction stage indexes one batch at a time, so this
+    only happens across API processes, or between an upload served from the
+    extraction cache and the stage.
+    """
+    if not settings.DUPLICATE_DETECTION_ENABLED:
+        return None
+    values = resume_fingerprints(candidate.original_text)
+    if not values:
+        return None
+    matches = _matches(db, values, candidate.session_id)
+    matches.pop(candidate.id, None)
+    if matches:
+        first = db.exec(
+            select(Candidate).where(Candidate.id.in_(list(matches))).order_by(Candidate.uploaded_at)
+        ).first()
+        candidate.duplicate_of_id = first.duplicate_of_id or first.id
+        db.add(candidate)
+        logger.info(f"Candidate {candidate.id} ({candidate.filename}) is a near-duplicate of {candidate.duplicate_of_id}")
+    for value in values:
+        db.add(ResumeFingerprint(
+            candidate_id=candidate.id,
+            session_id=candidate.session_id,
+            simhash=f"{value:016x}",
+            **{f"band{i}": band for i, band in enumerate(_bands(value))}
+        ))
+    return candidate.duplicate_of_id
+
+
+def find_duplicates(db: Session, candidate: Candidate) -> list[tuple[Candidate, int]]:
+    """Near-duplicates of a candidate in any session, as (candidate, distance), closest first."""
+    values = [
+        int(h, 16) for h in db.exec(select(ResumeFingerprint.simhash).where(ResumeFingerprint.candidate_id == candidate.id))
+    ]
+    if not values:
+        return []
+    matches = _matches(db, values)
+    matches.pop(candidate.id, None)
+    if not matches:
+        return []
+    found = db.exec(select(Candidate).where(Candidate.id.in_(list(matches)))).all()
+    return sorted(((c, matches[c.id]) for c in found), key=lambda pair: (pair[1], str(pair[0].uploaded_at)))
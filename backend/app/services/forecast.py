@@ -0,0 +1,133 @@
+from sqlmodel import Session, select
+from sqlalchemy.dialects.sqlite import insert
+from app.config import settings
+from app.models.candidate import Candidate
+from app.models.cache import ScoreCacheEntry
+from app.models.session import ScreeningSession
+from app.models.usage import ModelUsageStats
+from app.prompts.resume_score import RESUME_SCORE_USER_TEMPLATE
+from app.services.compaction import prompt_text
+from app.services.llm.scoring import render_scoring_system_prompt
+from app.services.prefilter import compile_prefilter, run_prefilter
+from app.services.score_cache import score_cache, hash_text, hash_criteria, make_cache_key
+from app.services.tokens import estimate_tokens
+from datetime import datetime
+import json
+
+# Pre-run forecasts of a session's token use and duration.
+#
+# Input tokens are estimated from the resume texts as they would be prompted and
+# the rendered criteria prompt. Output tokens and time per resume come from the
+# running per-model totals in model_usage_stats, which the batch processor updates
+# as it scores; until a model has history the defaults below are used.
+
+DEFAULT_OUTPUT_TOKENS_PER_RESUME = 700
+DEFAULT_SECONDS_PER_RESUME = 15.0
+
+
+def record_usage(db: Session, model: str, resumes: int, input_tokens: int, output_tokens: int,
+                 timed_resumes: int = 0, timed_seconds: float = 0.0):
+    """Add scoring usage to the model's totals, in the caller's transaction."""
+    if not (resumes or input_tokens or output_tokens or timed_resumes):
+        return
+    values = {
+        "resumes_scored": resumes, "input_tokens": input_tokens, "output_tokens": output_tokens,
+        "timed_resumes": timed_resumes, "timed_seconds": timed_seconds,
+    }
+    statement = insert(ModelUsageStats).values(model=model, updated_at=datetime.utcnow(), **values)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[ModelUsageStats.model],
+        set_={
+            **{name: getattr(ModelUsageStats, name) + getattr(statement.excluded, name) for name in values},
+            "updated_at": statement.excluded.updated_at,
+        }
+    ))
+
+
+def expected_output_tokens(stats: ModelUsageStats | None) -> int:
+    """Output tokens per scored resume for a model."""
+    if stats and stats.resumes_scored:
+        return round(stats.output_tokens / stats.resumes_scored)
+    return DEFAULT_OUTPUT_TOKENS_PER_RESUME
+
+
+def estimate_session(db: Session, session: ScreeningSession, model: str, token_budget: int | None = None) -> dict:
+    """
+    Forecast a full (non-incremental) processing run of the session.
+
+    Candidates the score cache or the pre-filter would serve, and near-duplicates
+    of other candidates, need no LLM call and are left out of the token and time
+    figures.
+    """
+    criteria_json = json.loads(session.criteria_json) if session.criteria_json else {}
+    system_tokens = estimate_tokens(render_scoring_system_prompt(criteria_json))
+    template_tokens = estimate_tokens(RESUME_SCORE_USER_TEMPLATE.format(resume_text=""))
+    prefilter_rules = compile_prefilter(criteria_json) if settings.PREFILTER_ENABLED else []
+    criteria_hash = hash_criteria(criteria_json)
+
+    candidates = db.exec(
+        select(
+            Candidate.id, Candidate.original_text, Candidate.extraction_warning, Candidate.extraction_status,
+            Candidate.duplicate_of_id
+        )
+        .where(Candidate.session_id == session.id)
+    ).all()
+    no_text = prefilter_rejected = extracting = duplicates = 0
+    to_score: list[tuple[str, int]] = []  # (cache key, resume tokens)
+    for _, original_text, extraction_warning, extraction_status, duplicate_of_id in candidates:
+        if duplicate_of_id:
+            duplicates += 1
+            continue
+        if extraction_status == "extracting":
+            extracting += 1
+            continue
+        text, _ = prompt_text(original_text)
+        if not text:
+            no_text += 1
+            continue
+        if prefilter_rules and not extraction_warning and run_prefilter(prefilter_rules, original_text):
+            prefilter_rejected += 1
+            continue
+        to_score.append((make_cache_key(hash_text(text), criteria_hash, model), estimate_tokens(text)))
+
+    cached = set()
+    if score_cache.enabled:
+        keys = list({key for key, _ in to_score})
+        for i in range(0, len(keys), 500):
+            cached.update(db.exec(select(ScoreCacheEntry.key).where(ScoreCacheEntry.key.in_(keys[i:i + 500]))).all())
+    uncached = [tokens for key, tokens in to_score if key not in cached]
+    # Resumes still being extracted are assumed to cost what the others do on average
+    calls = len(uncached)
+    resume_tokens = sum(uncached)
+    if extracting:
+        average_tokens = round(sum(tokens for _, tokens in to_score) / len(to_score)) if to_score else 0
+        calls += extracting
+        resume_tokens += extracting * average_tokens
+
+    stats = db.get(ModelUsageStats, model)
+    seconds_per_resume = (
+        stats.timed_seconds / stats.timed_resumes if stats and stats.timed_resumes else DEFAULT_SECONDS_PER_RESUME
+    )
+    concurrency = max(1, min(settings.SCORING_CONCURRENCY, settings.SCORING_GLOBAL_CONCURRENCY, settings.LLM_MAX_CONCURRENCY))
+
+    input_tokens = resume_tokens + calls * (template_tokens + system_tokens)
+    output_tokens = calls * expected_output_tokens(stats)
+    total_tokens = input_tokens + output_tokens
+    return {
+        "model": model,
+        "candidates": len(candidates),
+        "llm_calls": calls,
+        "cached": len(to_score) - len(uncached),
+        "prefilter_rejected": prefilter_rejected,
+        "duplicates": duplicates,
+        "no_text": no_text,
+        "extracting": extracting,
+        "input_tokens": input_tokens,
+        "cacheable_input_tokens": calls * system_tokens,  # Criteria prompt, eligible for provider prompt caching
+        "output_tokens": output_tokens,
+        "total_tokens": total_tokens,
+        "duration_seconds": round(calls * seconds_per_resume / concurrency, 1),
+        "history_resumes": stats.resumes_scored if stats else 0,
+        "token_budget": token_budget,
+        "within_budget": total_tokens <= token_budget if token_budget else None,
+    }
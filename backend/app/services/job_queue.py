@@ -0,0 +1,421 @@
+from sqlmodel import Session, select
+from sqlalchemy import update, func, or_, and_, case
+from app.config import settings
+from app.database import engine
+from app.models.candidate import Candidate
+from app.models.job import ScoringJob, WorkItem
+from app.models.session import ScreeningSession
+from app.services.events import session_events
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import logging
+import os
+import socket
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Durable job queue for session processing.
+#
+# process_resumes enqueues a ScoringJob. One runner claims it through a lease and
+# plans it: cache hits, pre-filter and LLM-free updates are applied, and the
+# remaining candidates become WorkItems. Interactive jobs then give up the job lease
+# and any number of runners (in the API process or `python -m app.worker`) lease
+# their items in chunks. Candidates whose text is still being extracted get
+# "waiting" items, released to the runners as extraction finishes. An item is
+# marked done in the same transaction as its candidate's result (results are
+# written in batches, see RESULT_FLUSH_*), and only while the runner still holds
+# it. Bulk jobs stay with the lease holder, which polls the provider batch. If a
+# process dies, its leases expire and other runners take the work over.
+#
+# Lease operations use their own short DB sessions so they never commit a job's
+# in-flight changes.
+
+ACTIVE_JOB_STATUSES = ("queued", "running")
+
+
+def make_owner_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _lease_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+
+
+def enqueue(db: Session, session_id: str, mode: str, token_budget: int | None = None) -> ScoringJob:
+    """Queue a processing run for the session, cancelling any unfinished one. Committed by the caller."""
+    db.execute(
+        update(ScoringJob)
+        .where(ScoringJob.session_id == session_id, ScoringJob.status.in_(ACTIVE_JOB_STATUSES))
+        .values(status="cancelled", finished_at=datetime.utcnow(), lease_owner=None)
+    )
+    job = ScoringJob(session_id=session_id, mode=mode, token_budget=token_budget)
+    db.add(job)
+    return job
+
+
+def _claimable_job(now: datetime):
+    # Running jobs without an owner are planned interactive jobs, worked through their items
+    return or_(
+        ScoringJob.status == "queued",
+        and_(ScoringJob.status == "running", ScoringJob.lease_owner.is_not(None), ScoringJob.lease_expires_at < now)
+    )
+
+
+def claim_job(owner: str) -> str | None:
+    """Atomically lease the oldest queued job, or one whose planning or bulk owner stopped renewing."""
+    with Session(engine) as db:
+        now = datetime.utcnow()
+        job_ids = db.exec(
+            select(ScoringJob.id).where(_claimable_job(now)).order_by(ScoringJob.created_at).limit(5)
+        ).all()
+        for job_id in job_ids:
+            claimed = db.execute(
+                update(ScoringJob)
+                .where(ScoringJob.id == job_id, _claimable_job(now))
+                .values(
+                    status="running",
+                    lease_owner=owner,
+                    lease_expires_at=_lease_expiry(),
+                    attempts=ScoringJob.attempts + 1,
+                    started_at=func.coalesce(ScoringJob.started_at, now)
+                )
+            ).rowcount
+            db.commit()
+            if claimed:
+                return job_id
+    return None
+
+
+def find_open_job(exclude: set[str]) -> str | None:
+    """Oldest planned interactive job with work items ready to be claimed."""
+    with Session(engine) as db:
+        now = datetime.utcnow()
+        query = (
+            select(ScoringJob.id)
+            .join(WorkItem, WorkItem.job_id == ScoringJob.id)
+            .where(ScoringJob.status == "running", ScoringJob.planned, ScoringJob.mode == "interactive",
+                   _claimable_item(now))
+            .order_by(ScoringJob.created_at)
+            .limit(1)
+        )
+        if exclude:
+            query = query.where(ScoringJob.id.not_in(exclude))
+        return db.exec(query).first()
+
+
+def renew_leases(job_id: str, owner: str) -> bool:
+    """
+    Extend the job lease (if owner holds it) and owner's item leases.
+    False once the job is no longer running or its lease went to another runner.
+    """
+    with Session(engine) as db:
+        job = db.get(ScoringJob, job_id)
+        if not job or job.status != "running" or (job.lease_owner and job.lease_owner != owner):
+            return False
+        expires = _lease_expiry()
+        db.execute(
+            update(ScoringJob)
+            .where(ScoringJob.id == job_id, ScoringJob.lease_owner == owner)
+            .values(lease_expires_at=expires)
+        )
+        db.execute(
+            update(WorkItem)
+            .where(WorkItem.job_id == job_id, WorkItem.lease_owner == owner, WorkItem.state == "leased")
+            .values(lease_expires_at=expires)
+        )
+        db.commit()
+        return True
+
+
+def release_job(job_id: str, owner: str):
+    """Hand a job back to the queue (e.g. on shutdown) so the next runner picks it up at once."""
+    with Session(engine) as db:
+        db.execute(
+            update(WorkItem)
+            .where(WorkItem.job_id == job_id, WorkItem.lease_owner == owner, WorkItem.state == "leased")
+            # Not a failed attempt, so don't count it
+            .values(state="pending", lease_owner=None, lease_expires_at=None, attempts=WorkItem.attempts - 1)
+        )
+        db.execute(
+            update(ScoringJob)
+            .where(ScoringJob.id == job_id, ScoringJob.lease_owner == owner, ScoringJob.status == "running")
+            .values(status="queued", lease_owner=None, lease_expires_at=None)
+        )
+        db.commit()
+
+
+def fail_job(job_id: str, owner: str, error: str):
+    """
+    Handle a job run that raised: owner's items go back to the queue, and a job owner
+    requeues the job, or fails it and its session after JOB_MAX_ATTEMPTS.
+    """
+    with Session(engine) as db:
+        db.execute(
+            update(WorkItem)
+            .where(WorkItem.job_id == job_id, WorkItem.lease_owner == owner, WorkItem.state == "leased")
+            .values(
+                state=case((WorkItem.attempts >= settings.WORK_ITEM_MAX_ATTEMPTS, "failed"), else_="pending"),
+                lease_owner=None, lease_expires_at=None, last_error=error[:2000]
+            )
+        )
+        db.commit()
+        job = db.get(ScoringJob, job_id)
+        if not job or job.lease_owner != owner or job.status != "running":
+            logger.warning(f"Processing items of job {job_id} failed: {error}")
+            return
+        job.error = error[:2000]
+        job.lease_owner = None
+        job.lease_expires_at = None
+        if job.attempts < settings.JOB_MAX_ATTEMPTS:
+            job.status = "queued"
+            logger.warning(f"Job {job_id} failed (attempt {job.attempts}), requeueing: {error}")
+        else:
+            job.status = "failed"
+            job.finished_at = datetime.utcnow()
+            session = db.get(ScreeningSession, job.session_id)
+            if session:
+                session.status = "failed"
+                session.error = job.error
+                db.add(session)
+            logger.error(f"Job {job_id} failed after {job.attempts} attempts: {error}")
+        db.add(job)
+        db.commit()
+        if job.status == "failed":
+            session_events.publish(job.session_id, "status", {"status": "failed", "error": job.error})
+
+
+def abort_job(db: Session, job_id: str, error: str):
+    """
+    Fail a job and its session outright, without retrying (e.g. its provider batch
+    failed), along with its open items. Committed here; publishes the status.
+    """
+    fail_open_items(db, job_id, error)
+    job = db.get(ScoringJob, job_id)
+    job.status = "failed"
+    job.error = error[:2000]
+    job.finished_at = datetime.utcnow()
+    job.lease_owner = None
+    job.lease_expires_at = None
+    db.add(job)
+    session = db.get(ScreeningSession, job.session_id)
+    if session:
+        session.status = "failed"
+        session.error = job.error
+        session.bulk_batch_id = None
+        db.add(session)
+    db.commit()
+    logger.error(f"Job {job_id} failed: {error}")
+    session_events.publish(job.session_id, "status", {"status": "failed", "error": job.error})
+
+
+def _claimable_item(now: datetime):
+    return and_(
+        WorkItem.attempts < settings.WORK_ITEM_MAX_ATTEMPTS,
+        or_(WorkItem.state == "pending", and_(WorkItem.state == "leased", WorkItem.lease_expires_at < now))
+    )
+
+
+def claim_items(job_id: str, owner: str, limit: int) -> list[str]:
+    """Atomically lease up to limit open work items of a running job; returns their ids."""
+    with Session(engine) as db:
+        now = datetime.utcnow()
+        job = db.get(ScoringJob, job_id)
+        if not job or job.status != "running":
+            return []
+        # Items whose runners kept dying with them are given up on
+        db.execute(
+            update(WorkItem)
+            .where(WorkItem.job_id == job_id, WorkItem.state == "leased", WorkItem.lease_expires_at < now,
+                   WorkItem.attempts >= settings.WORK_ITEM_MAX_ATTEMPTS)
+            .values(state="failed", lease_owner=None, lease_expires_at=None, last_error="Lease expired too often")
+        )
+        item_ids = db.exec(
+            select(WorkItem.id).where(WorkItem.job_id == job_id, _claimable_item(now)).limit(limit)
+        ).all()
+        if not item_ids:
+            db.commit()
+            return []
+        expires = _lease_expiry()
+        db.execute(
+            update(WorkItem)
+            .where(WorkItem.id.in_(item_ids), _claimable_item(now))
+            .values(state="leased", lease_owner=owner, lease_expires_at=expires,
+                    attempts=WorkItem.attempts + 1, updated_at=now)
+        )
+        claimed = db.exec(
+            select(WorkItem.id).where(
+                WorkItem.id.in_(item_ids), WorkItem.lease_owner == owner, WorkItem.lease_expires_at == expires
+            )
+        ).all()
+        db.commit()
+        return list(claimed)
+
+
+def open_item_count(job_id: str, states: tuple[str, ...] = ("waiting", "pending", "leased")) -> int:
+    """Work items of the job that are neither done nor failed (or only those in states)."""
+    with Session(engine) as db:
+        return db.exec(
+            select(func.count(WorkItem.id)).where(WorkItem.job_id == job_id, WorkItem.state.in_(states))
+        ).one()
+
+
+def release_waiting_items(db: Session, job_id: str | None = None, candidate_ids: list[str] | None = None) -> int:
+    """
+    Make waiting items claimable once their candidates' text is extracted, for one
+    job or for the given candidates, in the caller's transaction. Both the planner
+    and the extraction stage call this after committing, so whichever commits
+    last releases the item.
+    """
+    ready = select(Candidate.id).where(Candidate.extraction_status != "extracting")
+    if candidate_ids is not None:
+        ready = ready.where(Candidate.id.in_(candidate_ids))
+    statement = update(WorkItem).where(WorkItem.state == "waiting", WorkItem.candidate_id.in_(ready))
+    if job_id is not None:
+        statement = statement.where(WorkItem.job_id == job_id)
+    return db.execute(statement.values(state="pending", updated_at=datetime.utcnow())).rowcount
+
+
+def finish_item(db: Session, item_id: str, owner: str | None, succeeded: bool, error: str | None = None, final: bool = False) -> bool:
+    """
+    Mark an item done, or failed (final, or after WORK_ITEM_MAX_ATTEMPTS), or return it
+    to the queue, in the caller's transaction. Only applies while owner still holds the
+    item (owner=None for unleased items of a bulk job) and the job is still running.
+
+    Returns:
+        False if the item was lost, in which case its result must be discarded.
+    """
+    return item_id in finish_items(db, [(item_id, succeeded, error, final)], owner)
+
+
+def finish_items(db: Session, outcomes: list[tuple[str, bool, str | None, bool]], owner: str | None) -> set[str]:
+    """
+    finish_item for many (item_id, succeeded, error, final) outcomes at once, with one
+    UPDATE per distinct outcome.
+
+    Returns:
+        ids of the items that were still held; results for the others must be discarded.
+    """
+    groups: dict[tuple[bool, str | None, bool], list[str]] = {}
+    for item_id, succeeded, error, final in outcomes:
+        groups.setdefault((succeeded, error, final), []).append(item_id)
+
+    running_jobs = select(ScoringJob.id).where(ScoringJob.status == "running")
+    finished = set()
+    for (succeeded, error, final), item_ids in groups.items():
+        if succeeded:
+            state = "done"
+        elif final:
+            state = "failed"
+        else:
+            state = case((WorkItem.attempts >= settings.WORK_ITEM_MAX_ATTEMPTS, "failed"), else_="pending")
+        finished.update(db.execute(
+            update(WorkItem)
+            .where(WorkItem.id.in_(item_ids), WorkItem.lease_owner == owner, WorkItem.job_id.in_(running_jobs))
+            .values(state=state, lease_owner=None, lease_expires_at=None, last_error=error, updated_at=datetime.utcnow())
+            .returning(WorkItem.id)
+        ).scalars())
+    return finished
+
+
+def fail_open_items(db: Session, job_id: str, error: str) -> int:
+    """Mark the job's unclaimed items (waiting, pending or with an expired lease) failed, in the caller's transaction."""
+    return db.execute(
+        update(WorkItem)
+        .where(WorkItem.job_id == job_id, or_(WorkItem.state == "waiting", _claimable_item(datetime.utcnow())))
+        .values(state="failed", lease_owner=None, lease_expires_at=None, last_error=error, updated_at=datetime.utcnow())
+    ).rowcount
+
+
+def complete_job(db: Session, job_id: str) -> bool:
+    """Mark a running job completed in the caller's transaction; True for the one caller that did."""
+    return db.execute(
+        update(ScoringJob)
+        .where(ScoringJob.id == job_id, ScoringJob.status == "running")
+        .values(status="completed", finished_at=datetime.utcnow(), lease_owner=None, lease_expires_at=None)
+    ).rowcount == 1
+
+
+class JobRunner:
+    """
+    Claims jobs to plan (or bulk jobs to poll) and open work items, and runs them in
+    a small thread pool, one event loop per job (see batch_processor.process_job).
+
+    Runs inside the API process (EMBEDDED_WORKER) and in `python -m app.worker`;
+    any number of runners can share one database.
+    """
+
+    def __init__(self, concurrency: int | None = None):
+        self.concurrency = max(1, concurrency or settings.JOB_RUNNER_CONCURRENCY)
+        self.owner = make_owner_id()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._active: set[str] = set()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="job-runner", daemon=True)
+        self._thread.start()
+        logger.info(f"Job runner {self.owner} started")
+
+    def stop(self, timeout: float = 30):
+        """Stop claiming jobs and wait for running ones to hand back their leases."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def notify(self):
+        """Check for new jobs now instead of at the next poll."""
+        self._wake.set()
+
+    def active_jobs(self) -> list[str]:
+        with self._lock:
+            return sorted(self._active)
+
+    def _loop(self):
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job") as pool:
+            while not self._stop.is_set():
+                with self._lock:
+                    has_capacity = len(self._active) < self.concurrency
+                    active = set(self._active)
+                job_id = None
+                if has_capacity:
+                    try:
+                        job_id = claim_job(self.owner) or find_open_job(exclude=active)
+                    except Exception as e:
+                        logger.error(f"Claiming a job failed: {e}")
+                if job_id:
+                    with self._lock:
+                        self._active.add(job_id)
+                    pool.submit(self._run, job_id)
+                    continue
+                self._wake.wait(settings.JOB_POLL_SECONDS)
+                self._wake.clear()
+
+    def _run(self, job_id: str):
+        from app.services.batch_processor import process_job
+        try:
+            finished = process_job(job_id, self.owner, lambda: self._stop.is_set())
+            if not finished:
+                release_job(job_id, self.owner)
+        except Exception as e:
+            logger.exception(f"Job {job_id} raised")
+            fail_job(job_id, self.owner, str(e))
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+            self._wake.set()
+
+
+job_runner = JobRunner()
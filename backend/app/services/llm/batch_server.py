@@ -0,0 +1,187 @@
+"""
+Local stand-in for the OpenAI Batch API.
+
+Local OpenAI-compatible servers (Ollama, llama.cpp, vLLM) only serve
+/v1/chat/completions. This server implements the subset of the Files and Batches
+API used by bulk mode and executes each batch line against such an upstream
+chat endpoint, so bulk processing can be run and tested fully offline.
+
+Usage:
+    python -m app.services.llm.batch_server --port 8001 --upstream http://localhost:11434/v1
+
+Then point the backend at it with LLM_BATCH_BASE_URL=http://localhost:8001/v1.
+State is kept in memory and lost on restart.
+"""
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi.responses import Response
+from pydantic import BaseModel
+from openai import AsyncOpenAI
+from typing import Optional
+import argparse
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="Local batch server")
+
+_files: dict[str, dict] = {}
+_batches: dict[str, dict] = {}
+# The event loop only keeps weak references to tasks; these keep running batches alive
+_tasks: set[asyncio.Task] = set()
+_upstream: Optional[AsyncOpenAI] = None
+_concurrency = 2
+
+
+class BatchCreate(BaseModel):
+    input_file_id: str
+    endpoint: str
+    completion_window: str = "24h"
+    metadata: Optional[dict] = None
+
+
+def _store_file(content: bytes, filename: str, purpose: str) -> dict:
+    file_id = f"file-{uuid.uuid4().hex}"
+    _files[file_id] = {
+        "id": file_id,
+        "object": "file",
+        "bytes": len(content),
+        "created_at": int(time.time()),
+        "filename": filename,
+        "purpose": purpose,
+        "status": "processed",
+        "content": content,
+    }
+    return _files[file_id]
+
+
+def _public(record: dict) -> dict:
+    return {k: v for k, v in record.items() if k != "content"}
+
+
+@app.post("/v1/files")
+async def create_file(file: UploadFile = File(...), purpose: str = Form(...)):
+    return _public(_store_file(await file.read(), file.filename or "upload.jsonl", purpose))
+
+
+@app.get("/v1/files/{file_id}")
+async def get_file(file_id: str):
+    if file_id not in _files:
+        raise HTTPException(status_code=404, detail="File not found")
+    return _public(_files[file_id])
+
+
+@app.get("/v1/files/{file_id}/content")
+async def get_file_content(file_id: str):
+    if file_id not in _files:
+        raise HTTPException(status_code=404, detail="File not found")
+    return Response(content=_files[file_id]["content"], media_type="application/jsonl")
+
+
+@app.post("/v1/batches")
+async def create_batch(request: BatchCreate):
+    if request.input_file_id not in _files:
+        raise HTTPException(status_code=404, detail="Input file not found")
+    if request.endpoint != "/v1/chat/completions":
+        raise HTTPException(status_code=400, detail="Only /v1/chat/completions is supported")
+
+    batch_id = f"batch_{uuid.uuid4().hex}"
+    _batches[batch_id] = {
+        "id": batch_id,
+        "object": "batch",
+        "endpoint": request.endpoint,
+        "input_file_id": request.input_file_id,
+        "completion_window": request.completion_window,
+        "status": "in_progress",
+        "output_file_id": None,
+        "error_file_id": None,
+        "created_at": int(time.time()),
+        "in_progress_at": int(time.time()),
+        "completed_at": None,
+        "errors": None,
+        "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        "metadata": request.metadata,
+    }
+    task = asyncio.create_task(_run_batch(batch_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return _batches[batch_id]
+
+
+@app.get("/v1/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    if batch_id not in _batches:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return _batches[batch_id]
+
+
+async def _run_line(line: dict, slots: asyncio.Semaphore) -> tuple[dict, bool]:
+    async with slots:
+        try:
+            completion = await _upstream.chat.completions.create(**line["body"])
+            return {
+                "id": f"batch_req_{uuid.uuid4().hex}",
+                "custom_id": line["custom_id"],
+                "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": completion.model_dump()},
+                "error": None,
+            }, True
+        except Exception as e:
+            logger.error(f"Upstream request {line.get('custom_id')} failed: {e}")
+            return {
+                "id": f"batch_req_{uuid.uuid4().hex}",
+                "custom_id": line["custom_id"],
+                "response": None,
+                "error": {"code": "upstream_error", "message": str(e)},
+            }, False
+
+
+async def _run_batch(batch_id: str):
+    batch = _batches[batch_id]
+    try:
+        raw = _files[batch["input_file_id"]]["content"].decode("utf-8")
+        lines = [json.loads(line) for line in raw.splitlines() if line.strip()]
+        batch["request_counts"]["total"] = len(lines)
+
+        slots = asyncio.Semaphore(_concurrency)
+        outputs, errors = [], []
+        for next_done in asyncio.as_completed([_run_line(line, slots) for line in lines]):
+            entry, ok = await next_done
+            (outputs if ok else errors).append(entry)
+            batch["request_counts"]["completed" if ok else "failed"] += 1
+
+        if outputs:
+            content = "\n".join(json.dumps(e) for e in outputs).encode("utf-8") + b"\n"
+            batch["output_file_id"] = _store_file(content, f"{batch_id}_output.jsonl", "batch_output")["id"]
+        if errors:
+            content = "\n".join(json.dumps(e) for e in errors).encode("utf-8") + b"\n"
+            batch["error_file_id"] = _store_file(content, f"{batch_id}_errors.jsonl", "batch_output")["id"]
+        batch["status"] = "completed"
+        batch["completed_at"] = int(time.time())
+    except Exception as e:
+        logger.error(f"Batch {batch_id} failed: {e}")
+        batch["status"] = "failed"
+        batch["errors"] = {"object": "list", "data": [{"code": "batch_failed", "message": str(e)}]}
+
+
+def main():
+    global _upstream, _concurrency
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--upstream", default="http://localhost:11434/v1", help="OpenAI-compatible chat endpoint")
+    parser.add_argument("--api-key", default="ollama")
+    parser.add_argument("--concurrency", type=int, default=2, help="Upstream requests in flight per batch")
+    args = parser.parse_args()
+
+    _upstream = AsyncOpenAI(base_url=args.upstream, api_key=args.api_key)
+    _concurrency = max(1, args.concurrency)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,18 @@ import os
 from anthropic import AsyncAnthropic
 from openai import AsyncOpenAI
 from app.config import settings
+from app.services.llm.rate_limit import RateLimiter, is_retryable, is_throttle, retry_after_seconds, backoff_delay
+from app.services.llm.pool import EndpointPool, parse_endpoints
+from app.services.tokens import estimate_tokens
+import asyncio
 import json
 import logging
+import time
+from typing import Callable
 
 logger = logging.getLogger(__name__)
 
-from app.schemas.config import LLMConfig
+from app.schemas.config import LLMConfig, LLMEndpoint
 
 class LLMClient:
     def __init__(self):
@@ -17,7 +23,16 @@ class LLMClient:
             provider=settings.LLM_PROVIDER,
             model=settings.LLM_MODEL,
             base_url=settings.LLM_BASE_URL,
-            api_key=settings.ANTHROPIC_API_KEY
+            api_key=settings.ANTHROPIC_API_KEY,
+            endpoints=[
+                LLMEndpoint(url=url, weight=weight)
+                for url, weight in parse_endpoints(settings.LLM_ENDPOINTS, LLMEndpoint.model_fields["weight"].default)
+            ] if settings.LLM_ENDPOINTS else None
+        )
+        self.rate_limiter = RateLimiter(
+            requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+            max_concurrency=settings.LLM_MAX_CONCURRENCY
         )
         self.configure(initial_config)
 
@@ -28,6 +43,8 @@ class LLMClient:
         self.base_url = config.base_url
         self.api_key = config.api_key
         self.client = None # Reset client
+        self.pool = None
+        self._batch_client = None
         
         logger.info(f"Reconfiguring LLM Client: Provider={self.provider}, Model={self.model}")
 
@@ -35,16 +52,26 @@ class LLMClient:
             if not self.api_key:
                 logger.warning("ANTHROPIC_API_KEY not set. LLM features will fail.")
             else:
-                self.client = AsyncAnthropic(api_key=self.api_key)
+                # Retries are handled by _call_with_retry so they respect the rate limiter
+                self.client = AsyncAnthropic(api_key=self.api_key, max_retries=0)
         
         elif self.provider == "openai":
             # For Ollama or other local LLMs
-            if not self.base_url:
-                logger.warning("LLM_BASE_URL not set for openai provider.")
+            if config.endpoints:
+                endpoints = [(e.url, e.weight) for e in config.endpoints]
+            elif self.base_url:
+                # A single server is only bounded by the rate limiter's concurrency
+                endpoints = [(self.base_url, settings.LLM_MAX_CONCURRENCY)]
             else:
+                endpoints = []
+                logger.warning("LLM_BASE_URL not set for openai provider.")
+
+            if endpoints:
                 # API key is required by client but can be dummy for Ollama
                 key = self.api_key or "ollama"
-                self.client = AsyncOpenAI(base_url=self.base_url, api_key=key)
+                self.pool = EndpointPool(endpoints, api_key=key)
+                # Used for non-generation calls (model listing, batches)
+                self.client = self.pool.endpoints[0].client
 
     def get_config(self) -> dict:
         """Returns the current configuration (masking API key)."""
@@ -52,9 +79,17 @@ class LLMClient:
             "provider": self.provider,
             "model": self.model,
             "base_url": self.base_url,
-            "api_key": "***" if self.api_key else None
+            "api_key": "***" if self.api_key else None,
+            "endpoints": [{"url": e.url, "weight": e.weight} for e in self.pool.endpoints] if self.pool else None
         }
 
+    def get_stats(self) -> dict:
+        """Rate limiter state and throttle/retry counters."""
+        stats = {"provider": self.provider, **self.rate_limiter.stats()}
+        if self.pool:
+            stats["endpoints"] = self.pool.stats()
+        return stats
+
     async def list_models(self) -> list[str]:
         """Lists available models if supported by the provider."""
         if not self.client:
@@ -90,73 +125,93 @@ class LLMClient:
                 return {"status": "online", "provider": self.provider, "model": target_model}
 
             elif self.provider == "openai":
-                # For Ollama, we can list models or do a dummy generation
-                try:
-                    await self.client.models.list()
-                    return {"status": "online", "provider": self.provider, "model": target_model}
-                except Exception as e:
-                    return {"status": "offline", "provider": self.provider, "error": str(e)}
+                # For Ollama, we can list models or do a dummy generation.
+                # Probing also re-admits ejected pool endpoints that recovered.
+                results = await asyncio.gather(*[self.pool.probe(e) for e in self.pool.endpoints])
+                online = [r for r in results if r["status"] == "online"]
+                if online:
+                    return {"status": "online", "provider": self.provider, "model": target_model, "endpoints": results}
+                return {"status": "offline", "provider": self.provider, "error": results[0].get("error"), "endpoints": results}
 
         except Exception as e:
             return {"status": "error", "provider": self.provider, "error": str(e)}
 
-    async def generate_json(self, system: str, user: str, model: str = None) -> tuple[dict, dict]:
+    def _anthropic_params(self, system: str, user: str, model: str, cache_system: bool, max_tokens: int = None) -> dict:
+        if cache_system:
+            system_param = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+        else:
+            system_param = system
+        return {
+            "model": model,
+            "max_tokens": max_tokens or 4000,
+            "temperature": 0,
+            "system": system_param,
+            "messages": [
+                {"role": "user", "content": user}
+            ]
+        }
+
+    def _openai_params(self, system: str, user: str, model: str, max_tokens: int = None) -> dict:
+        params = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ],
+            "temperature": 0,
+            "response_format": {"type": "json_object"}
+        }
+        if max_tokens:
+            params["max_tokens"] = max_tokens
+        return params
+
+    async def generate_json(
+        self, system: str, user: str, model: str = None, cache_system: bool = False, max_tokens: int = None
+    ) -> tuple[dict, dict]:
         """
         Generate JSON response from LLM.
 
+        Args:
+            cache_system: Mark the system prompt for provider-side prompt caching.
+                Use it for large prompts that are repeated verbatim across calls.
+            max_tokens: Output token limit, for responses larger than the default 4000.
+
         Returns:
             tuple: (parsed_json_response, usage_dict)
-            usage_dict contains: input_tokens, output_tokens, model
+            usage_dict contains: input_tokens, output_tokens, cache_read_tokens,
+            cache_write_tokens, model
         """
         if not self.client:
             raise ValueError(f"LLM Client ({self.provider}) not initialized properly.")
 
         target_model = model or self.model
-        usage = {"input_tokens": 0, "output_tokens": 0, "model": target_model}
+        usage = _empty_usage(target_model)
+        content = None
+        estimated_tokens = estimate_tokens(system) + estimate_tokens(user)
 
         try:
             if self.provider == "anthropic":
-                message = await self.client.messages.create(
-                    model=target_model,
-                    max_tokens=4000,
-                    temperature=0,
-                    system=system,
-                    messages=[
-                        {"role": "user", "content": user}
-                    ]
+                message = await self._call_with_retry(
+                    lambda: self.client.messages.create(**self._anthropic_params(system, user, target_model, cache_system, max_tokens)),
+                    estimated_tokens
                 )
                 content = message.content[0].text
-                usage = {
-                    "input_tokens": message.usage.input_tokens,
-                    "output_tokens": message.usage.output_tokens,
-                    "model": target_model
-                }
+                usage = _anthropic_usage(message.usage, target_model)
 
             elif self.provider == "openai":
-                response = await self.client.chat.completions.create(
-                    model=target_model,
-                    messages=[
-                        {"role": "system", "content": system},
-                        {"role": "user", "content": user}
-                    ],
-                    temperature=0,
-                    response_format={"type": "json_object"}
+                response = await self._call_with_retry(
+                    lambda: self._openai_chat(self._openai_params(system, user, target_model, max_tokens)),
+                    estimated_tokens
                 )
                 content = response.choices[0].message.content
-                usage = {
-                    "input_tokens": response.usage.prompt_tokens if response.usage else 0,
-                    "output_tokens": response.usage.completion_tokens if response.usage else 0,
-                    "model": target_model
-                }
+                usage = _openai_usage(response.usage, target_model)
 
-            # Extract JSON from response if needed (Ollama json_object mode usually returns raw JSON)
-            # But just in case of markdown wrapping:
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0]
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0]
+            self.rate_limiter.on_success(
+                usage["input_tokens"] + usage["cache_read_tokens"] + usage["cache_write_tokens"]
+                + usage["output_tokens"] - estimated_tokens
+            )
 
-            parsed = json.loads(content.strip())
+            parsed = _parse_json_content(content)
 
             # Validate that we got expected fields for criteria responses
             if "human_readable" not in parsed and "structured" not in parsed:
@@ -173,4 +228,329 @@ class LLMClient:
             logger.error(f"LLM Error ({self.provider}): {e}")
             raise e
 
+    async def generate_json_stream(
+        self,
+        system: str,
+        user: str,
+        early_exit: Callable[[str], dict | None] = None,
+        model: str = None,
+        cache_system: bool = False
+    ) -> tuple[dict, dict]:
+        """
+        Like generate_json, but streams the response.
+
+        Args:
+            early_exit: Called with the text received so far after every chunk. If it
+                returns a dict, generation is cancelled and that dict is returned in
+                place of the full response, saving the remaining output tokens.
+
+        Returns:
+            tuple: (parsed_json_response, usage_dict). After an early exit the output
+            token count is estimated from the text received (and, for OpenAI-compatible
+            servers, the input count from the prompt); usage_dict["estimated"] is then True.
+        """
+        if not self.client:
+            raise ValueError(f"LLM Client ({self.provider}) not initialized properly.")
+
+        target_model = model or self.model
+        content = None
+        estimated_tokens = estimate_tokens(system) + estimate_tokens(user)
+
+        try:
+            if self.provider == "anthropic":
+                content, usage, early = await self._call_with_retry(
+                    lambda: self._anthropic_stream(
+                        self._anthropic_params(system, user, target_model, cache_system), target_model, early_exit
+                    ),
+                    estimated_tokens
+                )
+            else:
+                content, usage, early = await self._call_with_retry(
+                    lambda: self._openai_stream(
+                        self._openai_params(system, user, target_model), target_model, early_exit, estimated_tokens
+                    ),
+                    estimated_tokens
+                )
+
+            self.rate_limiter.on_success(
+                usage["input_tokens"] + usage["cache_read_tokens"] + usage["cache_write_tokens"]
+                + usage["output_tokens"] - estimated_tokens
+            )
+            if early is not None:
+                return early, usage
+            return _parse_json_content(content), usage
+
+        except json.JSONDecodeError as e:
+            logger.error(f"LLM JSON parse error ({self.provider}): {e}")
+            logger.error(f"Raw content: {content[:1000] if content else 'empty'}")
+            raise ValueError(f"Failed to parse LLM response as JSON: {e}")
+        except Exception as e:
+            logger.error(f"LLM Error ({self.provider}): {e}")
+            raise e
+
+    async def _anthropic_stream(self, params: dict, model: str, early_exit) -> tuple[str, dict, dict | None]:
+        """Returns (text, usage, early_exit_result_or_None)."""
+        text = ""
+        async with self.client.messages.stream(**params) as stream:
+            async for chunk in stream.text_stream:
+                text += chunk
+                early = early_exit(text) if early_exit else None
+                if early is not None:
+                    # Leaving the context manager closes the connection and stops generation
+                    usage = _anthropic_usage(stream.current_message_snapshot.usage, model)
+                    usage["output_tokens"] = estimate_tokens(text)
+                    usage["estimated"] = True
+                    return text, usage, early
+            message = await stream.get_final_message()
+        return text, _anthropic_usage(message.usage, model), None
+
+    async def _openai_stream(self, params: dict, model: str, early_exit, estimated_tokens: int) -> tuple[str, dict, dict | None]:
+        """Returns (text, usage, early_exit_result_or_None)."""
+        text = ""
+        final_usage = None
+        async with self.pool.acquire() as endpoint:
+            try:
+                stream = await endpoint.client.chat.completions.create(
+                    **params, stream=True, stream_options={"include_usage": True}
+                )
+                try:
+                    async for chunk in stream:
+                        if chunk.usage:
+                            final_usage = chunk.usage
+                        if not chunk.choices or not chunk.choices[0].delta.content:
+                            continue
+                        text += chunk.choices[0].delta.content
+                        early = early_exit(text) if early_exit else None
+                        if early is not None:
+                            # The usage chunk comes last, so a stream cut short has none
+                            usage = _estimated_usage(model, estimated_tokens, text)
+                            self.pool.record_success(endpoint)
+                            return text, usage, early
+                finally:
+                    await stream.close()
+            except Exception as e:
+                if is_retryable(e) and not is_throttle(e):
+                    self.pool.record_failure(endpoint)
+                raise
+            self.pool.record_success(endpoint)
+
+        if final_usage is None:
+            # Server without include_usage support
+            return text, _estimated_usage(model, estimated_tokens, text), None
+        return text, _openai_usage(final_usage, model), None
+
+    async def _openai_chat(self, params: dict):
+        """Send a chat completion to the least-loaded healthy pool endpoint."""
+        async with self.pool.acquire() as endpoint:
+            try:
+                response = await endpoint.client.chat.completions.create(**params)
+            except Exception as e:
+                # Throttling is the limiter's concern; only outages count against the node
+                if is_retryable(e) and not is_throttle(e):
+                    self.pool.record_failure(endpoint)
+                raise
+            self.pool.record_success(endpoint)
+            return response
+
+    async def _call_with_retry(self, call, estimated_tokens: int = 0):
+        """
+        Run a provider call under the rate limiter, retrying throttles, 5xx and
+        connection errors with jittered exponential backoff (or the provider's
+        Retry-After) until LLM_MAX_RETRIES or LLM_RETRY_MAX_SECONDS is exhausted.
+        """
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                async with self.rate_limiter.slot(estimated_tokens):
+                    return await call()
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                retry_after = retry_after_seconds(e)
+                if is_throttle(e):
+                    self.rate_limiter.on_throttle(retry_after)
+                delay = retry_after if retry_after is not None else backoff_delay(attempt)
+                if attempt >= settings.LLM_MAX_RETRIES or time.monotonic() - started + delay > settings.LLM_RETRY_MAX_SECONDS:
+                    self.rate_limiter.record_failure()
+                    raise
+                self.rate_limiter.record_retry()
+                attempt += 1
+                logger.warning(f"LLM call failed ({e.__class__.__name__}), retry {attempt} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    # --- Provider batch APIs (bulk mode) ---
+
+    def _get_batch_client(self):
+        """OpenAI batches may be served by a separate endpoint (e.g. the local stand-in batch server)."""
+        if self.provider == "openai" and settings.LLM_BATCH_BASE_URL:
+            if self._batch_client is None:
+                self._batch_client = AsyncOpenAI(base_url=settings.LLM_BATCH_BASE_URL, api_key=self.api_key or "ollama")
+            return self._batch_client
+        return self.client
+
+    async def submit_batch(self, requests: list[dict], model: str = None) -> str:
+        """
+        Submit many JSON generation requests as one provider batch job.
+
+        Args:
+            requests: dicts with custom_id, system, user and optional cache_system.
+
+        Returns:
+            The provider batch id, to poll with get_batch_status.
+        """
+        client = self._get_batch_client()
+        if not client:
+            raise ValueError(f"LLM Client ({self.provider}) not initialized properly.")
+
+        target_model = model or self.model
+
+        if self.provider == "anthropic":
+            batch = await client.messages.batches.create(requests=[
+                {
+                    "custom_id": r["custom_id"],
+                    "params": self._anthropic_params(r["system"], r["user"], target_model, r.get("cache_system", False))
+                }
+                for r in requests
+            ])
+            return batch.id
+
+        lines = [
+            json.dumps({
+                "custom_id": r["custom_id"],
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._openai_params(r["system"], r["user"], target_model)
+            })
+            for r in requests
+        ]
+        batch_file = await client.files.create(
+            file=("batch.jsonl", ("\n".join(lines) + "\n").encode("utf-8")),
+            purpose="batch"
+        )
+        batch = await client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+
+    async def get_batch_status(self, batch_id: str) -> str:
+        """Returns "in_progress", "ended" (results available) or "failed"."""
+        client = self._get_batch_client()
+
+        if self.provider == "anthropic":
+            batch = await client.messages.batches.retrieve(batch_id)
+            return "ended" if batch.processing_status == "ended" else "in_progress"
+
+        batch = await client.batches.retrieve(batch_id)
+        if batch.status == "completed":
+            return "ended"
+        if batch.status in ("failed", "expired", "cancelled"):
+            return "failed"
+        return "in_progress"
+
+    async def get_batch_results(self, batch_id: str) -> dict[str, tuple[dict | None, dict, str | None]]:
+        """
+        Fetch the results of an ended batch.
+
+        Returns:
+            dict: custom_id -> (parsed_json_or_None, usage_dict, error_or_None)
+        """
+        client = self._get_batch_client()
+        results = {}
+
+        if self.provider == "anthropic":
+            async for entry in await client.messages.batches.results(batch_id):
+                if entry.result.type != "succeeded":
+                    results[entry.custom_id] = (None, _empty_usage(self.model), f"Batch request {entry.result.type}")
+                    continue
+                message = entry.result.message
+                results[entry.custom_id] = _parse_batch_content(
+                    message.content[0].text, _anthropic_usage(message.usage, message.model)
+                )
+            return results
+
+        batch = await client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get("response") or {}
+                body = response.get("body") or {}
+                if entry.get("error") or response.get("status_code") != 200:
+                    error = entry.get("error") or body.get("error") or f"status {response.get('status_code')}"
+                    results[entry["custom_id"]] = (None, _empty_usage(self.model), str(error))
+                    continue
+                usage = body.get("usage") or {}
+                results[entry["custom_id"]] = _parse_batch_content(
+                    body["choices"][0]["message"]["content"],
+                    {
+                        "input_tokens": usage.get("prompt_tokens", 0),
+                        "output_tokens": usage.get("completion_tokens", 0),
+                        "cache_read_tokens": (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0,
+                        "cache_write_tokens": 0,
+                        "model": body.get("model", self.model)
+                    }
+                )
+        return results
+
+
+def _empty_usage(model: str) -> dict:
+    return {"input_tokens": 0, "output_tokens": 0, "cache_read_tokens": 0, "cache_write_tokens": 0, "model": model}
+
+
+def _estimated_usage(model: str, input_tokens: int, text: str) -> dict:
+    """Usage of a call the provider reported none for. estimated marks it as not measured."""
+    usage = _empty_usage(model)
+    usage["input_tokens"] = input_tokens
+    usage["output_tokens"] = estimate_tokens(text)
+    usage["estimated"] = True
+    return usage
+
+
+def _anthropic_usage(usage, model: str) -> dict:
+    return {
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
+        "cache_read_tokens": getattr(usage, "cache_read_input_tokens", None) or 0,
+        "cache_write_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+        "model": model
+    }
+
+
+def _openai_usage(usage, model: str) -> dict:
+    # OpenAI-compatible servers cache repeated prefixes automatically;
+    # there is nothing to mark, but report cached reads when available.
+    prompt_details = getattr(usage, "prompt_tokens_details", None) if usage else None
+    return {
+        "input_tokens": usage.prompt_tokens if usage else 0,
+        "output_tokens": usage.completion_tokens if usage else 0,
+        "cache_read_tokens": (getattr(prompt_details, "cached_tokens", None) or 0) if prompt_details else 0,
+        "cache_write_tokens": 0,
+        "model": model
+    }
+
+
+def _parse_json_content(content: str) -> dict:
+    # Extract JSON from response if needed (Ollama json_object mode usually returns raw JSON)
+    # But just in case of markdown wrapping:
+    if "```json" in content:
+        content = content.split("```json")[1].split("```")[0]
+    elif "```" in content:
+        content = content.split("```")[1].split("```")[0]
+
+    return json.loads(content.strip())
+
+
+def _parse_batch_content(content: str, usage: dict) -> tuple[dict | None, dict, str | None]:
+    try:
+        return _parse_json_content(content), usage, None
+    except json.JSONDecodeError as e:
+        return None, usage, f"Failed to parse LLM response as JSON: {e}"
+
 llm_client = LLMClient()
@@ -0,0 +1,146 @@
+from openai import AsyncOpenAI
+from contextlib import asynccontextmanager
+from app.config import settings
+from app.services.wakeup import Wakeups, wait_woken
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Endpoint:
+    """One OpenAI-compatible inference node (e.g. an Ollama box)."""
+
+    def __init__(self, url: str, weight: int, api_key: str):
+        self.url = url
+        self.weight = max(1, weight)  # Max requests in flight on this node
+        # Retries are handled by LLMClient._call_with_retry
+        self.client = AsyncOpenAI(base_url=url, api_key=api_key, max_retries=0)
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.probing = False
+        self.requests = 0
+        self.failures = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "url": self.url,
+            "weight": self.weight,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class EndpointPool:
+    """
+    Spreads requests over several OpenAI-compatible endpoints.
+
+    Each request goes to the healthy endpoint with the fewest outstanding requests
+    relative to its weight, and waits when every endpoint is at its weight. After
+    LLM_POOL_EJECT_AFTER consecutive failures an endpoint is ejected; once
+    LLM_POOL_PROBE_SECONDS have passed the next request re-probes it (the same
+    models.list() call check_health uses) and re-admits it if it answers.
+    """
+
+    def __init__(self, endpoints: list[tuple[str, int]], api_key: str):
+        self._lock = threading.Lock()
+        self._freed = Wakeups()
+        self.endpoints = [Endpoint(url, weight, api_key) for url, weight in endpoints]
+
+    @asynccontextmanager
+    async def acquire(self):
+        endpoint = await self._pick()
+        try:
+            yield endpoint
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+            self._freed.notify()
+
+    async def _pick(self) -> Endpoint:
+        while True:
+            await self._probe_due()
+            with self._freed.waiting() as wake:
+                with self._lock:
+                    # Fail open if everything is ejected so requests still surface real errors
+                    candidates = [e for e in self.endpoints if e.healthy] or self.endpoints
+                    available = [e for e in candidates if e.outstanding < e.weight]
+                    if available:
+                        endpoint = min(available, key=lambda e: e.outstanding / e.weight)
+                        endpoint.outstanding += 1
+                        endpoint.requests += 1
+                        return endpoint
+                    now = time.monotonic()
+                    probes = [e.ejected_until - now for e in self.endpoints if not e.healthy and not e.probing]
+                # Woken when a request finishes or an endpoint changes state; wake up
+                # anyway when an ejected endpoint is due for a re-probe
+                await wait_woken(wake, max(0.0, min(probes)) if probes else None)
+
+    async def _probe_due(self):
+        now = time.monotonic()
+        with self._lock:
+            due = [e for e in self.endpoints if not e.healthy and not e.probing and e.ejected_until <= now]
+            for endpoint in due:
+                endpoint.probing = True
+        for endpoint in due:
+            await self.probe(endpoint)
+
+    async def probe(self, endpoint: Endpoint) -> dict:
+        """Health-check one endpoint and update its state."""
+        try:
+            await endpoint.client.models.list()
+            with self._lock:
+                if not endpoint.healthy:
+                    logger.info(f"LLM endpoint {endpoint.url} is healthy again")
+                endpoint.healthy = True
+                endpoint.consecutive_failures = 0
+                endpoint.probing = False
+            return {"url": endpoint.url, "status": "online"}
+        except Exception as e:
+            with self._lock:
+                endpoint.healthy = False
+                endpoint.ejected_until = time.monotonic() + settings.LLM_POOL_PROBE_SECONDS
+                endpoint.probing = False
+            return {"url": endpoint.url, "status": "offline", "error": str(e)}
+        finally:
+            self._freed.notify()
+
+    def record_success(self, endpoint: Endpoint):
+        with self._lock:
+            endpoint.consecutive_failures = 0
+
+    def record_failure(self, endpoint: Endpoint):
+        """Count a connection error or 5xx against the endpoint, ejecting it if it keeps failing."""
+        ejected = False
+        with self._lock:
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.healthy and endpoint.consecutive_failures >= settings.LLM_POOL_EJECT_AFTER:
+                endpoint.healthy = False
+                endpoint.ejected_until = time.monotonic() + settings.LLM_POOL_PROBE_SECONDS
+                ejected = True
+                logger.warning(f"Ejecting LLM endpoint {endpoint.url} after {endpoint.consecutive_failures} consecutive failures")
+        if ejected:
+            # With every endpoint ejected, waiters fail open onto the ejected ones
+            self._freed.notify()
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            return [e.to_dict() for e in self.endpoints]
+
+
+def parse_endpoints(spec: str, default_weight: int) -> list[tuple[str, int]]:
+    """Parse a comma-separated "url" or "url|weight" list."""
+    endpoints = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        url, _, weight = entry.partition("|")
+        endpoints.append((url.strip(), int(weight) if weight.strip() else default_weight))
+    return endpoints
@@ -0,0 +1,192 @@
+import anthropic
+import openai
+from app.services.wakeup import Wakeups, wait_woken
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import asyncio
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Sessions run on separate event loops in separate threads, so all state here is
+# guarded by threading locks. Callers waiting for capacity are woken through
+# Wakeups when it is released; rate buckets sleep until they have refilled.
+_POLL_SECONDS = 0.05
+
+
+class TokenBucket:
+    """Refills continuously at rate_per_minute; a rate of 0 disables the limit."""
+
+    def __init__(self, rate_per_minute: int):
+        self._lock = threading.Lock()
+        self.configure(rate_per_minute)
+
+    def configure(self, rate_per_minute: int):
+        with self._lock:
+            self.rate_per_minute = max(0, rate_per_minute)
+            self.capacity = float(self.rate_per_minute)
+            self._tokens = self.capacity
+            self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_minute / 60)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1):
+        if not self.rate_per_minute:
+            return
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) * 60 / self.rate_per_minute
+            await asyncio.sleep(min(max(wait, _POLL_SECONDS), 1.0))
+
+    def debit(self, amount: float):
+        """Charge usage discovered after the fact (may push the bucket negative)."""
+        if not self.rate_per_minute:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+
+
+class RateLimiter:
+    """
+    Client-side limits for LLM calls: requests/minute and tokens/minute buckets plus
+    an adaptive concurrency limit.
+
+    Concurrency follows AIMD: every throttle (429) halves the limit and pauses all
+    callers for the provider's Retry-After; a run of successes raises it by one
+    again, up to max_concurrency. Large sessions thereby settle close to the
+    provider's actual limit.
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0, max_concurrency: int = 8):
+        self._lock = threading.Lock()
+        self._freed = Wakeups()
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = self.max_concurrency
+        self._in_flight = 0
+        self._successes = 0
+        self._paused_until = 0.0
+
+        self.throttles = 0
+        self.retries = 0
+        self.failures = 0
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int = 0):
+        """Wait for pause, rate and concurrency budgets, then hold a concurrency slot."""
+        while True:
+            with self._freed.waiting() as wake:
+                with self._lock:
+                    pause = self._paused_until - time.monotonic()
+                    if pause <= 0 and self._in_flight < self.concurrency:
+                        self._in_flight += 1
+                        break
+                # Woken when a call finishes or the limit rises; a pause just runs out
+                await wait_woken(wake, pause if pause > 0 else None)
+        try:
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._freed.notify()
+
+    def on_success(self, extra_tokens: int = 0):
+        """Record a successful call; extra_tokens is actual usage beyond the estimate."""
+        if extra_tokens > 0:
+            self.tokens.debit(extra_tokens)
+        with self._lock:
+            self._successes += 1
+            raised = self._successes >= self.concurrency and self.concurrency < self.max_concurrency
+            if raised:
+                self.concurrency += 1
+                self._successes = 0
+        if raised:
+            self._freed.notify()
+
+    def on_throttle(self, retry_after: float | None):
+        with self._lock:
+            self.throttles += 1
+            self._successes = 0
+            self.concurrency = max(1, self.concurrency // 2)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        logger.warning(f"LLM provider throttled request; concurrency now {self.concurrency}, retry after {retry_after or 'n/a'}s")
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "concurrency_limit": self.concurrency,
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self._in_flight,
+                "requests_per_minute": self.requests.rate_per_minute,
+                "tokens_per_minute": self.tokens.rate_per_minute,
+                "throttles": self.throttles,
+                "retries": self.retries,
+                "failures": self.failures,
+            }
+
+
+def is_retryable(error: Exception) -> bool:
+    """429s, 5xx (including Anthropic's 529 overloaded) and connection errors/timeouts."""
+    if isinstance(error, (anthropic.APIConnectionError, openai.APIConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status == 429 or (isinstance(status, int) and status >= 500)
+
+
+def is_throttle(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """Parse Retry-After (seconds or HTTP date) from a provider error response."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
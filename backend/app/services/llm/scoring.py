@@ -1,17 +1,146 @@
 from app.services.llm.client import llm_client
-from app.prompts.resume_score import RESUME_SCORE_SYSTEM_TEMPLATE, RESUME_SCORE_USER_TEMPLATE
+from app.prompts.resume_score import (
+    RESUME_SCORE_SYSTEM_TEMPLATE, RESUME_SCORE_USER_TEMPLATE, RESUME_CATEGORY_SCORE_USER_TEMPLATE,
+    RESUME_PACK_ENTRY_TEMPLATE, RESUME_PACK_SCORE_USER_TEMPLATE
+)
+from app.config import settings
 import json
+import logging
+import re
 
-async def score_resume(resume_text: str, criteria_json: dict) -> tuple[dict, dict]:
+logger = logging.getLogger(__name__)
+
+# Output budget per resume in a packed request (a full scoring result is ~600-900 tokens)
+PACK_OUTPUT_TOKENS_PER_RESUME = 1200
+
+def render_scoring_system_prompt(criteria_json: dict) -> str:
+    """
+    Render the scoring system prompt (rubric + criteria).
+
+    Render this once per session and criteria version and pass it to score_resume:
+    the prompt must be byte-identical across calls for provider prompt caching to hit.
+    """
+    return RESUME_SCORE_SYSTEM_TEMPLATE.format(
+        structured_criteria_json=json.dumps(criteria_json, indent=2)
+    )
+
+_PASSED_RE = re.compile(r'"passed_dealbreakers"\s*:\s*(true|false)')
+_REJECTION_RE = re.compile(r'"rejection_reason"\s*:\s*(null|"(?:[^"\\]|\\.)*")')
+
+def rejected_early(partial_json: str) -> dict | None:
+    """
+    Minimal result for a candidate who failed the dealbreakers, as soon as the
+    streamed response contains both the verdict and the complete rejection reason.
+    """
+    passed = _PASSED_RE.search(partial_json)
+    if not passed or passed.group(1) != "false":
+        return None
+    reason = _REJECTION_RE.search(partial_json)
+    if not reason:
+        return None
+    return {
+        "passed_dealbreakers": False,
+        "rejection_reason": json.loads(reason.group(1)),
+        "final_score": None,
+        "one_liner": None,
+        "category_scores": None,
+        "strengths": None,
+        "concerns": None,
+        "highlights": None,
+    }
+
+async def score_resume(resume_text: str, criteria_json: dict, system_prompt: str = None) -> tuple[dict, dict]:
     """
     Score a resume against the given criteria.
 
+    With SCORING_STREAM_EARLY_EXIT the response is streamed and cut off once the
+    candidate is known to fail the dealbreakers; only a minimal record is returned.
+
+    Args:
+        system_prompt: Pre-rendered output of render_scoring_system_prompt(criteria_json).
+            Rendered on the fly when omitted.
+
     Returns:
         tuple: (score_result_dict, usage_dict)
     """
-    system_prompt = RESUME_SCORE_SYSTEM_TEMPLATE.format(
-        structured_criteria_json=json.dumps(criteria_json, indent=2)
-    )
+    if system_prompt is None:
+        system_prompt = render_scoring_system_prompt(criteria_json)
     user_prompt = RESUME_SCORE_USER_TEMPLATE.format(resume_text=resume_text)
 
-    return await llm_client.generate_json(system=system_prompt, user=user_prompt)
+    if settings.SCORING_STREAM_EARLY_EXIT:
+        return await llm_client.generate_json_stream(
+            system=system_prompt, user=user_prompt, early_exit=rejected_early, cache_system=True
+        )
+    return await llm_client.generate_json(system=system_prompt, user=user_prompt, cache_system=True)
+
+async def score_resume_pack(resumes: dict[str, str], criteria_json: dict, system_prompt: str = None) -> tuple[dict[str, dict], dict]:
+    """
+    Score several resumes in one request, sharing a single copy of the criteria prompt.
+
+    Args:
+        resumes: resume_id -> resume text. Ids should be short (e.g. "1", "2").
+        system_prompt: Pre-rendered output of render_scoring_system_prompt(criteria_json).
+
+    Returns:
+        tuple: (results keyed by resume_id, usage_dict). Resumes whose entry is missing
+        or malformed are left out, so callers can score them individually.
+    """
+    if system_prompt is None:
+        system_prompt = render_scoring_system_prompt(criteria_json)
+    user_prompt = RESUME_PACK_SCORE_USER_TEMPLATE.format(
+        resumes="".join(RESUME_PACK_ENTRY_TEMPLATE.format(resume_id=rid, resume_text=text) for rid, text in resumes.items()),
+        count=len(resumes),
+        resume_ids=", ".join(resumes)
+    )
+
+    result, usage = await llm_client.generate_json(
+        system=system_prompt, user=user_prompt, cache_system=True,
+        max_tokens=PACK_OUTPUT_TOKENS_PER_RESUME * len(resumes)
+    )
+
+    entries = result.get("results")
+    if not isinstance(entries, list):
+        logger.warning(f"Packed scoring response has no results list. Keys: {list(result.keys())}")
+        return {}, usage
+
+    scored = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        rid = str(entry.pop("resume_id", ""))
+        if rid not in resumes or rid in scored:
+            continue
+        if not isinstance(entry.get("passed_dealbreakers"), bool):
+            continue
+        if entry["passed_dealbreakers"] and not isinstance(entry.get("category_scores"), dict):
+            continue
+        scored[rid] = entry
+    return scored, usage
+
+async def score_resume_categories(resume_text: str, criteria_json: dict, category_ids: set[str], system_prompt: str = None) -> tuple[dict, dict]:
+    """
+    Score a resume against a subset of the criteria categories only.
+
+    Used after a criteria refinement that touched a few categories, so unchanged
+    category scores can be kept.
+
+    Args:
+        system_prompt: Pre-rendered prompt for the same category subset. Rendered on
+            the fly when omitted.
+
+    Returns:
+        tuple: (category_scores_dict, usage_dict)
+    """
+    if system_prompt is None:
+        system_prompt = render_category_scoring_system_prompt(criteria_json, category_ids)
+    user_prompt = RESUME_CATEGORY_SCORE_USER_TEMPLATE.format(resume_text=resume_text)
+
+    result, usage = await llm_client.generate_json(system=system_prompt, user=user_prompt, cache_system=True)
+    category_scores = result.get("category_scores") or {}
+    return {cat_id: category_scores[cat_id] for cat_id in category_ids if cat_id in category_scores}, usage
+
+def render_category_scoring_system_prompt(criteria_json: dict, category_ids: set[str]) -> str:
+    """Render the scoring system prompt restricted to the given categories."""
+    narrowed = dict(criteria_json)
+    narrowed["categories"] = [c for c in criteria_json.get("categories", []) if c.get("id") in category_ids]
+    return render_scoring_system_prompt(narrowed)
@@ -1,9 +1,12 @@
 import pypdf
-import io
 import logging
 import tempfile
 import os
 import platform
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple
+from app.config import settings
+from app.services.compaction import PAGE_BREAK
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +15,7 @@ OCR_AVAILABLE = False
 POPPLER_PATH = None
 
 try:
-    from pdf2image import convert_from_bytes
+    from pdf2image import convert_from_path, pdfinfo_from_path
     import pytesseract
 
     # Configure Tesseract path for Windows
@@ -57,72 +60,241 @@ except ImportError as e:
     logger.warning(f"OCR dependencies not installed: {e}. Run: pip install pdf2image pytesseract pillow")
 
 
-def extract_text_from_pdf(file_content: bytes) -> tuple[str, str | None]:
+# Bump when extraction changes in a way that invalidates cached results
+EXTRACTOR_VERSION = 2
+
+# Pages with less extracted text than this are treated as scans and OCR'd
+_MIN_PAGE_TEXT = 20
+# Rasterize so a page's long side is about this many pixels (200 DPI on US Letter),
+# within [_MIN_DPI, _MAX_DPI]
+_OCR_TARGET_PIXELS = 2200
+_MIN_DPI = 120
+_MAX_DPI = 300
+
+
+def _page_dpi(width: float, height: float) -> int:
+    """DPI that gives small pages enough pixels for OCR without blowing up large ones (size in points)."""
+    long_side_inches = max(width, height) / 72
+    if long_side_inches <= 0:
+        return 200
+    return int(min(_MAX_DPI, max(_MIN_DPI, _OCR_TARGET_PIXELS / long_side_inches)))
+
+
+def _has_images(page) -> bool:
+    """Whether a pypdf page draws any XObject (scanned pages are one big image)."""
+    try:
+        resources = page.get("/Resources")
+        resources = resources.get_object() if resources is not None else None
+        xobjects = resources.get("/XObject") if resources else None
+        return bool(xobjects.get_object()) if xobjects is not None else False
+    except Exception:
+        return True  # Can't tell; let OCR decide
+
+
+def _ocr_page(path: str, page_number: int, dpi: int) -> str:
+    """Rasterize one page (1-based) and OCR it; only this page's image is held in memory."""
+    kwargs = {"dpi": dpi, "first_page": page_number, "last_page": page_number}
+    if POPPLER_PATH:
+        kwargs["poppler_path"] = POPPLER_PATH
+    images = convert_from_path(path, **kwargs)
+    try:
+        return "".join(pytesseract.image_to_string(image) for image in images)
+    finally:
+        for image in images:
+            image.close()
+
+
+class PageText(NamedTuple):
+    text: str
+    dpi: int  # For OCR, from the page size
+    has_images: bool  # Only checked on pages with less than _MIN_PAGE_TEXT characters
+
+
+# Text layer engines. Each takes a PDF path and returns its pages, with "" for a
+# page whose text could not be read; it raises if the document can't be opened.
+# The engine is chosen by PDF_TEXT_ENGINE; `python -m app.extraction_benchmark`
+# compares them on a folder of PDFs.
+TextEngine = Callable[[str], list[PageText]]
+_ENGINES: dict[str, TextEngine] = {}
+_missing_engines: set[str] = set()  # Already warned about
+
+
+def register_engine(name: str, engine: TextEngine):
+    _ENGINES[name] = engine
+
+
+def available_engines() -> list[str]:
+    return list(_ENGINES)
+
+
+def get_engine(name: str | None = None) -> tuple[str, TextEngine]:
+    """The named engine (default PDF_TEXT_ENGINE), or pypdf if it isn't available."""
+    name = name or settings.PDF_TEXT_ENGINE
+    if name not in _ENGINES:
+        if name not in _missing_engines:
+            _missing_engines.add(name)
+            logger.warning(f"PDF text engine '{name}' is not available (installed: {', '.join(_ENGINES)}), using pypdf")
+        name = "pypdf"
+    return name, _ENGINES[name]
+
+
+def _pypdf_pages(path: str) -> list[PageText]:
+    pages = []
+    # pypdf reads objects from the open file as it needs them
+    with open(path, "rb") as f:
+        for i, page in enumerate(pypdf.PdfReader(f).pages):
+            try:
+                text = page.extract_text() or ""
+            except Exception as e:
+                logger.error(f"Error extracting text from page {i + 1}: {e}")
+                text = ""
+            try:
+                dpi = _page_dpi(float(page.mediabox.width), float(page.mediabox.height))
+            except Exception:
+                dpi = 200
+            pages.append(PageText(text, dpi, len(text.strip()) < _MIN_PAGE_TEXT and _has_images(page)))
+    return pages
+
+
+register_engine("pypdf", _pypdf_pages)
+
+try:
+    import pypdfium2 as pdfium
+    import pypdfium2.raw as pdfium_c
+
+    def _pdfium_pages(path: str) -> list[PageText]:
+        pages = []
+        document = pdfium.PdfDocument(path)
+        try:
+            for i in range(len(document)):
+                page = document[i]
+                try:
+                    try:
+                        textpage = page.get_textpage()
+                        text = textpage.get_text_range().replace("\r\n", "\n")
+                        textpage.close()
+                    except Exception as e:
+                        logger.error(f"Error extracting text from page {i + 1}: {e}")
+                        text = ""
+                    has_images = len(text.strip()) < _MIN_PAGE_TEXT and any(
+                        True for _ in page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_IMAGE], max_depth=3)
+                    )
+                    pages.append(PageText(text, _page_dpi(*page.get_size()), has_images))
+                finally:
+                    page.close()
+        finally:
+            document.close()
+        return pages
+
+    register_engine("pdfium", _pdfium_pages)
+except ImportError:
+    pass
+
+try:
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer, LTImage, LTContainer
+
+    def _lt_has_image(item) -> bool:
+        if isinstance(item, LTImage):
+            return True
+        return isinstance(item, LTContainer) and any(_lt_has_image(child) for child in item)
+
+    def _pdfminer_pages(path: str) -> list[PageText]:
+        pages = []
+        for layout in extract_pages(path):
+            text = "".join(element.get_text() for element in layout if isinstance(element, LTTextContainer))
+            has_images = len(text.strip()) < _MIN_PAGE_TEXT and _lt_has_image(layout)
+            pages.append(PageText(text, _page_dpi(layout.width, layout.height), has_images))
+        return pages
+
+    register_engine("pdfminer", _pdfminer_pages)
+except ImportError:
+    pass
+
+
+def extract_text_from_file(path: str, engine: str | None = None) -> tuple[str, str | None]:
     """
-    Extracts text from a PDF file content (bytes).
+    Extracts text from a PDF file on disk (what the extraction pool's workers run).
+
+    Uses the text layer (read by the engine, default PDF_TEXT_ENGINE) where a page
+    has one and OCRs only the pages that don't, rasterizing one page at a time at
+    a DPI suited to the page size, with up to OCR_PAGE_CONCURRENCY pages in flight.
 
     Returns:
         tuple: (extracted_text, warning_message)
         - extracted_text: The text content from the PDF
         - warning_message: None if successful, or a warning string if OCR was used or extraction failed
     """
-    warning = None
-
-    # First try standard text extraction
+    # Engines read from the path and poppler renders from it, so the document is
+    # never loaded into memory as a whole
+    _, read_pages = get_engine(engine)
     try:
-        pdf_file = io.BytesIO(file_content)
-        reader = pypdf.PdfReader(pdf_file)
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        text = text.strip()
-
-        # If we got meaningful text, return it
-        if len(text) > 50:
-            return text, None
-
+        pages = read_pages(path)
     except Exception as e:
         logger.error(f"Error in standard PDF extraction: {e}")
-        text = ""
-
-    # If standard extraction failed or returned minimal text, try OCR
-    if OCR_AVAILABLE:
-        logger.info("Standard extraction returned minimal text, attempting OCR...")
-        try:
-            # Convert PDF pages to images (pass poppler_path on Windows)
-            if POPPLER_PATH:
-                images = convert_from_bytes(file_content, dpi=200, poppler_path=POPPLER_PATH)
-            else:
-                images = convert_from_bytes(file_content, dpi=200)
+        pages = []
+    page_texts = [page.text for page in pages]
 
-            ocr_text = ""
-            for i, image in enumerate(images):
-                page_text = pytesseract.image_to_string(image)
-                if page_text:
-                    ocr_text += page_text + "\n"
+    # Pages without a usable text layer (index, dpi). Unless the document has
+    # next to no text at all (e.g. outlined fonts), skip pages that draw no image.
+    nearly_empty = sum(len(t.strip()) for t in page_texts) <= 50
+    scanned = [
+        (i, page.dpi) for i, page in enumerate(pages)
+        if len(page.text.strip()) < _MIN_PAGE_TEXT and (nearly_empty or page.has_images)
+    ]
 
-            ocr_text = ocr_text.strip()
+    warning = None
+    ocr_error = None
+    if not pages and OCR_AVAILABLE:
+        # pypdf couldn't read the document; poppler may still render it
+        logger.info("Standard extraction failed, attempting OCR of the whole document...")
+        try:
+            info = pdfinfo_from_path(path, poppler_path=POPPLER_PATH)
+            page_texts = [""] * int(info["Pages"])
+            scanned = [(i, 200) for i in range(len(page_texts))]
+        except Exception as e:
+            logger.error(f"OCR extraction failed: {e}")
+            ocr_error = f"OCR failed: {str(e)}"
 
-            if len(ocr_text) > 50:
+    if scanned and OCR_AVAILABLE:
+        logger.info(f"OCR of {len(scanned)} of {len(pages)} pages without a text layer...")
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, settings.OCR_PAGE_CONCURRENCY)) as pool:
+                ocr_texts = list(pool.map(lambda job: _ocr_page(path, job[0] + 1, job[1]), scanned))
+        except Exception as e:
+            logger.error(f"OCR extraction failed: {e}")
+            ocr_texts = None
+            ocr_error = f"OCR failed: {str(e)}"
+        if ocr_texts is not None:
+            for (i, _), ocr_text in zip(scanned, ocr_texts):
+                if len(ocr_text.strip()) > len(page_texts[i].strip()):
+                    page_texts[i] = ocr_text
+            if len(scanned) == len(page_texts):
                 warning = "Text extracted using OCR (image-based PDF)"
-                return ocr_text, warning
             else:
-                warning = "Could not extract text from PDF (may be encrypted or corrupted)"
-                return "", warning
+                warning = f"Text extracted using OCR for page(s) {', '.join(str(i + 1) for i, _ in scanned)} (image-based pages)"
+    elif scanned and len(scanned) < len(pages):
+        warning = f"Page(s) {', '.join(str(i + 1) for i, _ in scanned)} are image-based and OCR is not available"
 
-        except Exception as e:
-            logger.error(f"OCR extraction failed: {e}")
-            warning = f"OCR failed: {str(e)}"
-            return text if text else "", warning
-    else:
-        # OCR not available
-        if len(text) < 50:
-            warning = "Image-based PDF detected but OCR is not available. Install Tesseract OCR to process this file."
-            return "", warning
-
-    return text, warning
+    text = "".join(page_text + "\n" + PAGE_BREAK for page_text in page_texts if page_text).strip()
+    if len(text) > 50:
+        return text, warning or ocr_error
+    if ocr_error:
+        return text, ocr_error
+    if not OCR_AVAILABLE:
+        return "", "Image-based PDF detected but OCR is not available. Install Tesseract OCR to process this file."
+    return "", "Could not extract text from PDF (may be encrypted or corrupted)"
+
+
+def extract_text_from_pdf(file_content: bytes) -> tuple[str, str | None]:
+    """extract_text_from_file for PDF content in memory, via a temporary file."""
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(file_content)
+        return extract_text_from_file(path)
+    finally:
+        os.remove(path)
 
 
 def extract_text_simple(file_content: bytes) -> str:
@@ -0,0 +1,195 @@
+from dataclasses import dataclass, field
+from app.schemas.common import CriteriaSchema
+from pydantic import ValidationError
+import re
+
+# Deterministic dealbreaker checks that run before any LLM call.
+#
+# Only dealbreaker items that clearly name a degree level, security clearance,
+# spoken language or well-known certification are compiled into rules, and a rule
+# only fails when the resume contains no mention of the requirement at all. Anything
+# ambiguous is left to the LLM: a false rejection here is far worse than a wasted call.
+
+_SOFT_RE = re.compile(
+    r"\b(or equivalent|equivalent experience|preferred|ideally|nice to have|bonus|plus)\b"
+    r"|\bor\b[^.;]*\b(experience|years)\b"
+    # Requirements the candidate can meet later: "able to obtain a clearance", "CPA-eligible"
+    r"|\b(obtain\w*|eligib\w*|able to|willing(ness)? to)\b",
+    re.IGNORECASE,
+)
+
+_DEGREE_LEVELS = [
+    # (level, name, item pattern, resume pattern)
+    (1, "associate degree",
+     re.compile(r"\bassociate'?s?\s+degree\b", re.IGNORECASE),
+     re.compile(r"\bassociate'?s?\s+(degree|of)\b", re.IGNORECASE)),
+    (2, "bachelor's degree",
+     re.compile(r"\b(bachelor'?s?|undergraduate degree|b\.?s\.?c?\.?\s+degree)\b", re.IGNORECASE),
+     re.compile(r"\b([Bb]achelor'?s?|BACHELOR|[Uu]ndergraduate|UNDERGRADUATE|B\.?Sc?\.?|B\.?A\.?|B\.?Eng\.?|B\.?Tech\.?|B\.?Com\.?)(?![a-z])")),
+    (3, "master's degree",
+     re.compile(r"\b(master'?s?|mba|graduate degree)\b", re.IGNORECASE),
+     re.compile(r"\b([Mm]aster'?s?|MASTER|MBA|M\.?Sc?\.?|M\.?A\.?|M\.?Eng\.?|M\.?Tech\.?|M\.?Phil\.?)(?![a-z])")),
+    (4, "doctorate",
+     re.compile(r"\b(ph\.?\s?d|doctorate|doctoral)\b", re.IGNORECASE),
+     re.compile(r"\b(ph\.?\s?d|doctorate|doctoral|d\.?phil)\b", re.IGNORECASE)),
+]
+_GENERIC_DEGREE_ITEM_RE = re.compile(r"\bdegree\b", re.IGNORECASE)
+# For bachelor-or-lower requirements any sign of higher education counts, since
+# degree names are often abbreviated or left implicit
+_ANY_HIGHER_EDUCATION_RE = re.compile(r"\b(university|college|degree|institute of technology)\b", re.IGNORECASE)
+
+_CLEARANCE_ITEM_RE = re.compile(r"\b(security clearance|clearance|ts/sci|top secret|polygraph)\b", re.IGNORECASE)
+_CLEARANCE_RESUME_RE = re.compile(r"\b(clearance|cleared|ts/sci|top secret|secret|sci|polygraph)\b", re.IGNORECASE)
+
+_LANGUAGES = {
+    "spanish": ["spanish", "español", "espanol"],
+    "french": ["french", "français", "francais"],
+    "german": ["german", "deutsch"],
+    "mandarin": ["mandarin", "chinese", "putonghua"],
+    "chinese": ["chinese", "mandarin", "cantonese"],
+    "cantonese": ["cantonese", "chinese"],
+    "japanese": ["japanese"],
+    "korean": ["korean"],
+    "portuguese": ["portuguese"],
+    "italian": ["italian"],
+    "russian": ["russian"],
+    "arabic": ["arabic"],
+    "hindi": ["hindi"],
+    "dutch": ["dutch"],
+    "swedish": ["swedish"],
+    "polish": ["polish"],
+    "turkish": ["turkish"],
+    "vietnamese": ["vietnamese"],
+    "hebrew": ["hebrew"],
+    "greek": ["greek"],
+}
+_LANGUAGE_CONTEXT_RE = re.compile(r"\b(fluent|fluency|proficien\w*|native|bilingual|speak\w*|spoken|written|language)\b", re.IGNORECASE)
+
+_CERTIFICATIONS = {
+    "PMP": ["project management professional"],
+    "CPA": ["certified public accountant"],
+    "CFA": ["chartered financial analyst"],
+    "CMA": ["certified management accountant"],
+    "ACCA": [],
+    "CFP": ["certified financial planner"],
+    "FRM": ["financial risk manager"],
+    "CISSP": [],
+    "CISM": [],
+    "CISA": [],
+    "CCNA": [],
+    "CCNP": [],
+    "CCIE": [],
+    "PE": ["professional engineer"],
+    "RN": ["registered nurse"],
+    "LPN": ["licensed practical nurse"],
+    "PHR": ["professional in human resources"],
+    "SPHR": ["senior professional in human resources"],
+    "SHRM-CP": [],
+    "SHRM-SCP": [],
+    "CSM": ["certified scrummaster", "certified scrum master"],
+}
+# Two-letter codes are too easily something else ("PE" in finance or schools), so
+# an item naming one only becomes a rule if it also reads as a license
+_SHORT_CODE_CONTEXT_RE = re.compile(r"\b(licen[cs]\w*|registered|registration|certified|certification)\b", re.IGNORECASE)
+
+
+@dataclass
+class PrefilterRule:
+    """A compiled dealbreaker item: the resume must match at least one pattern."""
+    category_id: str
+    item_text: str
+    kind: str  # degree, clearance, language, certification
+    requirement: str
+    patterns: list[re.Pattern] = field(default_factory=list)
+
+    def matches(self, text: str) -> bool:
+        return any(p.search(text) for p in self.patterns)
+
+    def describe(self) -> str:
+        return f"{self.kind}: no mention of {self.requirement} (dealbreaker \"{self.item_text}\" in {self.category_id})"
+
+
+def _word_pattern(words: list[str], flags=re.IGNORECASE) -> re.Pattern:
+    return re.compile(r"(?<![\w-])(" + "|".join(re.escape(w) for w in words) + r")(?![\w-])", flags)
+
+
+def _compile_item(category_id: str, text: str) -> PrefilterRule | None:
+    if _SOFT_RE.search(text):
+        return None
+
+    if _CLEARANCE_ITEM_RE.search(text):
+        return PrefilterRule(category_id, text, "clearance", "a security clearance", [_CLEARANCE_RESUME_RE])
+
+    certs = [c for c in _CERTIFICATIONS if re.search(r"(?<![\w-])" + re.escape(c) + r"(?![\w-])", text)]
+    certs = [
+        c for c in certs
+        if len(c) > 2 or _SHORT_CODE_CONTEXT_RE.search(text) or _word_pattern(_CERTIFICATIONS[c]).search(text)
+    ]
+    if certs:
+        patterns = [_word_pattern(certs, flags=0)]
+        expansions = [e for c in certs for e in _CERTIFICATIONS[c]]
+        if expansions:
+            patterns.append(_word_pattern(expansions))
+        return PrefilterRule(category_id, text, "certification", " or ".join(certs), patterns)
+
+    if _LANGUAGE_CONTEXT_RE.search(text):
+        languages = [lang for lang in _LANGUAGES if re.search(r"\b" + lang + r"\b", text, re.IGNORECASE)]
+        if languages:
+            accepted = sorted({w for lang in languages for w in _LANGUAGES[lang]})
+            return PrefilterRule(category_id, text, "language", " or ".join(languages).title(), [_word_pattern(accepted)])
+
+    levels = [(level, name, resume_re) for level, name, item_re, resume_re in _DEGREE_LEVELS if item_re.search(text)]
+    if levels:
+        # "Bachelor's or Master's" means the lowest mentioned level is enough
+        required = min(level for level, _, _ in levels)
+        name = next(name for level, name, _ in levels if level == required)
+        patterns = [resume_re for level, _, _, resume_re in _DEGREE_LEVELS if level >= required]
+        if required <= 2:
+            patterns.append(_ANY_HIGHER_EDUCATION_RE)
+        return PrefilterRule(category_id, text, "degree", f"a {name} or higher", patterns)
+    if _GENERIC_DEGREE_ITEM_RE.search(text):
+        patterns = [resume_re for _, _, _, resume_re in _DEGREE_LEVELS] + [_ANY_HIGHER_EDUCATION_RE]
+        return PrefilterRule(category_id, text, "degree", "any degree", patterns)
+
+    return None
+
+
+def compile_prefilter(criteria_json: dict) -> list[PrefilterRule]:
+    """Compile the dealbreaker items that have an unambiguous local check."""
+    if not criteria_json:
+        return []
+    try:
+        criteria = CriteriaSchema.model_validate(criteria_json)
+    except ValidationError:
+        return []
+
+    rules = []
+    for category in criteria.categories:
+        if not category.is_dealbreaker:
+            continue
+        for item in category.items:
+            rule = _compile_item(category.id, item.text)
+            if rule:
+                rules.append(rule)
+    return rules
+
+
+def run_prefilter(rules: list[PrefilterRule], resume_text: str) -> dict | None:
+    """
+    Returns a rejected scoring result if the resume clearly fails a rule, else None.
+    The result's prefilter_rule records which rule fired.
+    """
+    for rule in rules:
+        if not rule.matches(resume_text):
+            return {
+                "passed_dealbreakers": False,
+                "rejection_reason": f"Lacks {rule.item_text}",
+                "final_score": 0,
+                "one_liner": f"Rejected by pre-filter: no mention of {rule.requirement}.",
+                "category_scores": {},
+                "strengths": [],
+                "concerns": [f"Resume does not mention {rule.requirement}"],
+                "highlights": [],
+                "prefilter_rule": rule.describe(),
+            }
+    return None
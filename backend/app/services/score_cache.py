@@ -0,0 +1,130 @@
+from sqlmodel import Session, select
+from sqlalchemy import func, delete
+from app.config import settings
+from app.models.cache import ScoreCacheEntry
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Bump when the scoring prompts change in a way that invalidates cached results
+SCORE_CACHE_VERSION = 1
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_criteria(criteria_json: dict) -> str:
+    """Hash criteria in canonical form so key order and whitespace don't matter."""
+    canonical = json.dumps(criteria_json, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hash_text(canonical)
+
+
+def make_cache_key(resume_hash: str, criteria_hash: str, model: str) -> str:
+    return hash_text(f"v{SCORE_CACHE_VERSION}:{resume_hash}:{criteria_hash}:{model}")
+
+
+def evict_lru(db: Session, entry_model, max_bytes: int) -> tuple[int, int]:
+    """
+    Delete least-recently-used rows of a cache table (key, size_bytes, last_used_at)
+    down to 90% of max_bytes once it is over, so we don't evict on every run.
+
+    Returns:
+        tuple: (entries_evicted, bytes_freed)
+    """
+    total = db.exec(select(func.coalesce(func.sum(entry_model.size_bytes), 0))).one()
+    if total <= max_bytes:
+        return 0, 0
+
+    to_free = total - int(max_bytes * 0.9)
+    victims = []
+    freed = 0
+    rows = db.exec(select(entry_model.key, entry_model.size_bytes).order_by(entry_model.last_used_at.asc()))
+    for key, size in rows:
+        if freed >= to_free:
+            break
+        victims.append(key)
+        freed += size
+
+    for i in range(0, len(victims), 500):
+        db.execute(delete(entry_model).where(entry_model.key.in_(victims[i:i + 500])))
+    db.commit()
+    return len(victims), freed
+
+
+class ScoreCache:
+    """
+    Persistent cache of scoring results, stored in the score_cache table.
+
+    Entries are keyed by the resume text, canonicalized criteria and model, so a
+    reprocess with unchanged inputs (e.g. criteria refined and then reverted)
+    costs no LLM calls. Least-recently-used entries are evicted once the cache
+    grows past SCORE_CACHE_MAX_MB.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.SCORE_CACHE_ENABLED
+
+    def get(self, db: Session, key: str) -> dict | None:
+        """Look up a result; records the hit on the entry (committed by the caller)."""
+        entry = db.get(ScoreCacheEntry, key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        entry.hit_count += 1
+        entry.last_used_at = datetime.utcnow()
+        db.add(entry)
+        return json.loads(entry.result_json)
+
+    def put(self, db: Session, key: str, resume_hash: str, criteria_hash: str, model: str, result: dict):
+        """Store a result (committed by the caller)."""
+        result_json = json.dumps(result)
+        entry = db.get(ScoreCacheEntry, key) or ScoreCacheEntry(
+            key=key, resume_hash=resume_hash, criteria_hash=criteria_hash, model=model, result_json=result_json
+        )
+        entry.result_json = result_json
+        entry.size_bytes = len(result_json.encode("utf-8"))
+        entry.last_used_at = datetime.utcnow()
+        db.add(entry)
+
+    def evict(self, db: Session) -> int:
+        """Drop least-recently-used entries until the cache is under its size limit."""
+        evicted, freed = evict_lru(db, ScoreCacheEntry, settings.SCORE_CACHE_MAX_MB * 1024 * 1024)
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+            logger.info(f"Score cache evicted {evicted} entries ({freed} bytes)")
+        return evicted
+
+    def stats(self, db: Session) -> dict:
+        entries, size = db.exec(
+            select(func.count(ScoreCacheEntry.key), func.coalesce(func.sum(ScoreCacheEntry.size_bytes), 0))
+        ).one()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": entries,
+                "size_bytes": size,
+                "max_bytes": settings.SCORE_CACHE_MAX_MB * 1024 * 1024,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+score_cache = ScoreCache()
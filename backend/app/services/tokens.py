@@ -0,0 +1,38 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# tiktoken gives exact counts for OpenAI models and a close estimate for others;
+# without it we fall back to a characters-per-token ratio.
+_encoding = None
+TIKTOKEN_AVAILABLE = False
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    logger.info("tiktoken not installed, estimating tokens from text length. Run: pip install tiktoken")
+
+
+def _get_encoding():
+    global _encoding, TIKTOKEN_AVAILABLE
+    if _encoding is None and TIKTOKEN_AVAILABLE:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # The encoding file is downloaded on first use, which fails offline
+            logger.warning(f"Could not load tiktoken encoding, estimating tokens from text length: {e}")
+            TIKTOKEN_AVAILABLE = False
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Token count for budgeting: tiktoken's cl100k_base when available, else about
+    four characters per token. Not exact for every provider's tokenizer.
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4
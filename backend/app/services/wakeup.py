@@ -0,0 +1,50 @@
+from contextlib import contextmanager
+import asyncio
+import threading
+
+# Jobs run in their own threads, each with its own event loop, so capacity they
+# share (global scoring slots, rate limits, endpoint weights) is guarded by
+# threading locks. Wakeups lets a coroutine on any of those loops sleep until
+# another thread releases capacity, instead of polling for it.
+
+
+class Wakeups:
+    """
+    Wakes coroutines on any thread's event loop when shared capacity is released
+    (the same loop/asyncio.Event pairs SessionEvents uses for subscribers).
+
+    Enter waiting() before checking for capacity, so a release between the check
+    and the wait still wakes the caller.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    @contextmanager
+    def waiting(self):
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            yield waiter[1]
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+    def notify(self):
+        with self._lock:
+            waiters = list(self._waiters)
+        for loop, wake in waiters:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass  # Waiter's loop already closed
+
+
+async def wait_woken(wake: asyncio.Event, timeout: float | None = None):
+    """Wait for wake, or at most timeout seconds."""
+    try:
+        await asyncio.wait_for(wake.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
@@ -0,0 +1,50 @@
+"""
+Standalone scoring worker.
+
+Claims queued jobs and work items from the database and scores them, exactly like
+the runner embedded in the API process. Start as many as needed, on one or more
+hosts sharing the database; throughput scales with the number of workers up to the
+LLM provider's limits. Set EMBEDDED_WORKER=false on the API to leave all scoring
+to these workers.
+
+Usage:
+    python -m app.worker [--concurrency N]
+"""
+from app.config import settings
+from app.database import create_db_and_tables
+from app.services.job_queue import JobRunner
+import argparse
+import logging
+import signal
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_RUNNER_CONCURRENCY,
+                        help="Jobs worked on at once by this worker")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    create_db_and_tables()
+
+    runner = JobRunner(concurrency=args.concurrency)
+    stopped = threading.Event()
+
+    def handle_signal(signum, frame):
+        logger.info("Shutting down, handing unfinished work back to the queue")
+        stopped.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    runner.start()
+    while not stopped.wait(1):
+        pass
+    runner.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import os
+import tempfile
+
+# Point the app at a throwaway SQLite file before app.config is first imported
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+
+import pytest
+from sqlmodel import SQLModel, Session
+from app.database import engine, create_db_and_tables
+
+
+@pytest.fixture
+def db():
+    """A fresh, empty database for each test."""
+    SQLModel.metadata.drop_all(engine)
+    create_db_and_tables()
+    with Session(engine) as session:
+        yield session
@@ -0,0 +1,90 @@
+import asyncio
+import io
+import tarfile
+import zipfile
+import pytest
+from fastapi import HTTPException, UploadFile
+from sqlmodel import select
+from app.api.screening import upload_resume_archive
+from app.config import settings
+from app.models.candidate import Candidate
+from app.models.session import ScreeningSession
+from app.services import file_store
+from app.services.archive import open_archive
+
+FILES = [
+    ("resumes/alice.pdf", b"%PDF alice"),
+    ("resumes/notes.txt", b"not a resume"),
+    ("__MACOSX/resumes/._alice.pdf", b"resource fork"),
+    ("resumes/.DS_Store", b"finder"),
+    ("resumes/nested/BOB.PDF", b"%PDF bob"),
+]
+
+
+def _zip(files) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("resumes/", "")
+        for name, data in files:
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+
+def _tar(files, mode: str = "w:gz") -> io.BytesIO:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as archive:
+        for name, data in files:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    buffer.seek(0)
+    return buffer
+
+
+def _read(entries) -> list[tuple[str, bytes | str]]:
+    read = []
+    for name, opener in entries:
+        try:
+            with opener() as f:
+                read.append((name, f.read()))
+        except ValueError as e:
+            read.append((name, str(e)))
+    return read
+
+
+@pytest.mark.parametrize("make", [_zip, _tar, lambda files: _tar(files, "w")], ids=["zip", "tar.gz", "tar"])
+def test_entries_are_read_in_order_without_metadata(make):
+    assert _read(open_archive(make(FILES))) == [
+        ("alice.pdf", b"%PDF alice"), ("notes.txt", "Not a PDF file"), ("BOB.PDF", b"%PDF bob")
+    ]
+
+
+def test_tar_entries_left_unread_are_skipped():
+    names = [name for name, _ in open_archive(_tar(FILES))]
+    assert names == ["alice.pdf", "notes.txt", "BOB.PDF"]
+
+
+def test_other_files_are_rejected():
+    with pytest.raises(ValueError, match="Unsupported archive"):
+        open_archive(io.BytesIO(b"%PDF-1.4 just a pdf"))
+
+
+def test_upload_stores_each_entry_and_reports_oversized_ones(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(file_store, "UPLOAD_ROOT", str(tmp_path))
+    monkeypatch.setattr(settings, "ARCHIVE_MAX_ENTRY_MB", 1)
+    session = ScreeningSession(job_description="t", keep_count=5, status="created")
+    db.add(session)
+    db.commit()
+    files = [("a.pdf", b"%PDF a"), ("big.pdf", b"%PDF" + b"x" * (1024 * 1024)), ("b.pdf", b"%PDF b")]
+
+    response = asyncio.run(upload_resume_archive(session.id, UploadFile(_tar(files), filename="r.tar.gz"), db=db))
+    assert response["uploaded_count"] == 2
+    assert response["failed_files"] == [{"filename": "big.pdf", "error": "File is larger than 1 MB"}]
+    db.expire_all()
+    assert sorted(db.exec(select(Candidate.filename)).all()) == ["a.pdf", "b.pdf"]
+    assert db.get(ScreeningSession, session.id).total_resumes == 2
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(upload_resume_archive(session.id, UploadFile(io.BytesIO(b"plain"), filename="r.rar"), db=db))
+    assert error.value.status_code == 400
@@ -0,0 +1,69 @@
+from app.services import compaction
+from app.services.compaction import PAGE_BREAK, compact_resume_text, display_text, prompt_text
+from app.services.tokens import estimate_tokens
+
+
+def _section(heading: str, line: str, count: int) -> list[str]:
+    return [heading] + [f"{line} {i}" for i in range(count)]
+
+
+RESUME = "\n".join(
+    ["Jane Doe", "jane@example.com"]
+    + _section("INTERESTS", "Hiking, chess and amateur astronomy in the mountains", 20)
+    + _section("EXPERIENCE", "Led the migration of billing services to a new platform", 20)
+    + _section("EDUCATION", "BSc Computer Science, State University, graduated with honours", 5)
+)
+
+
+def test_without_a_budget_nothing_is_truncated():
+    text, truncated = compact_resume_text(RESUME)
+    assert not truncated
+    assert "INTERESTS" in text and "EXPERIENCE" in text
+
+
+def test_budget_drops_low_priority_sections_first():
+    full = estimate_tokens(RESUME)
+    text, truncated = compact_resume_text(RESUME, token_budget=full * 2 // 3)
+    assert truncated
+    assert estimate_tokens(text) <= full * 2 // 3
+    # Contact details, experience and education outrank interests
+    assert text.startswith("Jane Doe\njane@example.com")
+    assert "Led the migration of billing services to a new platform 19" in text
+    assert "EDUCATION" in text
+    assert "Hiking, chess and amateur astronomy in the mountains 19" not in text
+
+
+def test_section_order_is_kept_and_the_cut_is_marked():
+    lines = compact_resume_text(RESUME, token_budget=estimate_tokens(RESUME) - 40)[0].splitlines()
+    assert lines.index("INTERESTS") < lines.index("EXPERIENCE") < lines.index("EDUCATION")
+    assert compaction._TRUNCATED_MARKER in lines
+
+
+def test_page_furniture_and_page_numbers_are_removed():
+    pages = [
+        f"ACME Staffing - Confidential\nLine of content on page {n}\nSee 3 references\n{n}\n"
+        for n in range(1, 4)
+    ]
+    text, _ = compact_resume_text(PAGE_BREAK.join(pages))
+    lines = text.splitlines()
+    assert lines.count("ACME Staffing - Confidential") == 1
+    assert "See 3 references" in lines
+    assert not any(line.isdigit() for line in lines)
+    assert PAGE_BREAK not in text
+
+
+def test_numbers_inside_a_page_are_content():
+    text, _ = compact_resume_text("Jane Doe\nTeam size\n12\nLanguages: Go")
+    assert "12" in text.splitlines()
+
+
+def test_display_text_removes_page_breaks():
+    assert display_text(f"Page one\n{PAGE_BREAK}Page two\n") == "Page one\nPage two\n"
+    assert display_text(None) is None
+    assert display_text("") == ""
+
+
+def test_prompt_text_without_compaction_has_no_page_breaks(monkeypatch):
+    monkeypatch.setattr(compaction.settings, "RESUME_COMPACTION_ENABLED", False)
+    assert prompt_text(f"Page one\n{PAGE_BREAK}Page two") == ("Page one\nPage two", False)
+    assert prompt_text(None) == ("", False)
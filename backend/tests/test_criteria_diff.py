@@ -0,0 +1,92 @@
+import copy
+from app.services.batch_processor import _merge_category_scores
+from app.services.criteria_diff import compute_final_score, diff_criteria
+
+CRITERIA = {"version": 1, "categories": [
+    {"id": "edu", "display_name": "Education", "emoji": "x", "is_dealbreaker": True,
+     "items": [{"text": "Bachelor's degree"}]},
+    {"id": "skills", "display_name": "Skills", "emoji": "x", "weight": 2.0, "is_dealbreaker": False,
+     "items": [{"text": "Python", "key": "python"}]},
+    {"id": "domain", "display_name": "Domain", "emoji": "x", "weight": 1.0, "is_dealbreaker": False,
+     "items": [{"text": "Payments experience"}]},
+]}
+
+
+def _changed(edit) -> dict:
+    criteria = copy.deepcopy(CRITERIA)
+    edit({c["id"]: c for c in criteria["categories"]})
+    return criteria
+
+
+def test_identical_and_cosmetic_edits_change_nothing():
+    assert diff_criteria(CRITERIA, copy.deepcopy(CRITERIA)).is_empty
+    edited = _changed(lambda c: c["domain"]["items"][0].update(text="  payments   EXPERIENCE "))
+    assert diff_criteria(CRITERIA, edited).is_empty
+
+
+def test_weight_only_change_needs_no_rescore():
+    diff = diff_criteria(CRITERIA, _changed(lambda c: c["domain"].update(weight=3.0)))
+    assert diff.weights_changed
+    assert not diff.changed and not diff.requires_full_rescore
+
+
+def test_weighted_item_change_rescores_that_category():
+    diff = diff_criteria(CRITERIA, _changed(lambda c: c["skills"]["items"].append({"text": "Go"})))
+    assert diff.changed == {"skills"}
+    assert not diff.requires_full_rescore
+
+
+def test_dealbreaker_changes_force_a_full_rescore():
+    assert diff_criteria(CRITERIA, _changed(lambda c: c["edu"]["items"][0].update(text="Master's degree"))).requires_full_rescore
+    assert diff_criteria(CRITERIA, _changed(lambda c: c["domain"].update(is_dealbreaker=True))).requires_full_rescore
+    without_edu = copy.deepcopy(CRITERIA)
+    without_edu["categories"] = without_edu["categories"][1:]
+    assert diff_criteria(CRITERIA, without_edu).requires_full_rescore
+    assert diff_criteria(None, CRITERIA).requires_full_rescore
+
+
+def test_renames_and_item_keys_count_as_changes():
+    assert diff_criteria(CRITERIA, _changed(lambda c: c["domain"].update(display_name="Industry"))).changed == {"domain"}
+    assert diff_criteria(CRITERIA, _changed(lambda c: c["skills"]["items"][0].update(key="py"))).changed == {"skills"}
+    renamed_dealbreaker = diff_criteria(CRITERIA, _changed(lambda c: c["edu"].update(display_name="Degree")))
+    assert renamed_dealbreaker.requires_full_rescore
+
+
+def test_removed_weighted_category():
+    criteria = copy.deepcopy(CRITERIA)
+    criteria["categories"] = [c for c in criteria["categories"] if c["id"] != "domain"]
+    diff = diff_criteria(CRITERIA, criteria)
+    assert diff.removed == {"domain"}
+    assert not diff.requires_full_rescore
+
+
+def test_compute_final_score_is_the_weighted_average_of_weighted_categories():
+    scores = {"edu": {"score": 0}, "skills": {"score": 90}, "domain": {"score": 60}}
+    assert compute_final_score(scores, CRITERIA) == 80
+    # Categories without a numeric score are left out of the average
+    assert compute_final_score({"skills": {"score": 90}, "domain": {"score": "n/a"}}, CRITERIA) == 90
+    assert compute_final_score({"edu": {"score": 100}}, CRITERIA) is None
+    assert compute_final_score({}, CRITERIA) is None
+
+
+PREVIOUS = {
+    "passed_dealbreakers": True, "final_score": 80, "one_liner": "Strong Python, payments background",
+    "category_scores": {"skills": {"score": 90}, "domain": {"score": 60}},
+    "strengths": ["Python"], "concerns": ["No Go"], "highlights": ["Led migration"],
+}
+
+
+def test_merge_recomputes_the_score_and_clears_the_stale_summary():
+    criteria = _changed(lambda c: c["domain"]["items"][0].update(text="Fintech experience"))
+    merged = _merge_category_scores(PREVIOUS, {"domain": {"score": 30}}, diff_criteria(CRITERIA, criteria), criteria)
+    assert merged["final_score"] == 70
+    assert merged["category_scores"]["skills"] == {"score": 90}
+    assert (merged["one_liner"], merged["strengths"], merged["concerns"]) == (None, None, None)
+    assert merged["highlights"] == ["Led migration"]
+
+
+def test_merge_after_a_weight_change_keeps_the_summary():
+    criteria = _changed(lambda c: c["domain"].update(weight=2.0))
+    merged = _merge_category_scores(PREVIOUS, {}, diff_criteria(CRITERIA, criteria), criteria)
+    assert merged["final_score"] == 75
+    assert merged["one_liner"] == PREVIOUS["one_liner"]
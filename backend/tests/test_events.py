@@ -0,0 +1,89 @@
+import asyncio
+import threading
+from app.api.screening import stream_events
+from app.config import settings
+from app.models.session import ScreeningSession
+from app.services.events import SessionEvents
+
+
+def test_since_resumes_after_the_last_event_id():
+    events = SessionEvents()
+    start = events.last_id("s")
+    assert events.since("s", start) == []
+    events.publish("s", "candidate", {"id": "c1"})
+    middle = events.last_id("s")
+    events.publish("s", "progress", {"processed_count": 2})
+    assert [data for _, _, data in events.since("s", start)] == [{"id": "c1"}, {"processed_count": 2}]
+    assert events.since("s", middle) == [(events.last_id("s"), "progress", {"processed_count": 2})]
+    assert events.since("s", events.last_id("s")) == []
+
+
+def test_ids_from_another_process_need_a_snapshot():
+    before, after = SessionEvents(), SessionEvents()  # A restart starts a new epoch
+    before.publish("s", "candidate", {"id": "c1"})
+    assert after.since("s", before.last_id("s")) is None
+    assert after.since("s", "garbage") is None
+    assert after.since("s", after.last_id("s").split("-")[0] + "-5") is None  # Ahead of the stream
+
+
+def test_ids_older_than_the_buffer_need_a_snapshot(monkeypatch):
+    monkeypatch.setattr(settings, "EVENTS_BUFFER_SIZE", 3)
+    events = SessionEvents()
+    start = events.last_id("s")
+    events.publish("s", "candidate", {"id": "c1"})
+    first = events.last_id("s")
+    for i in range(2, 5):
+        events.publish("s", "candidate", {"id": f"c{i}"})
+    assert events.since("s", start) is None  # c1 was dropped
+    assert [data["id"] for _, _, data in events.since("s", first)] == ["c2", "c3", "c4"]
+
+
+def test_publish_from_another_thread_wakes_subscribers():
+    events = SessionEvents()
+
+    async def run():
+        with events.subscribe("s") as wake:
+            thread = threading.Thread(target=events.publish, args=("s", "status", {"status": "processing"}))
+            thread.start()
+            await asyncio.wait_for(wake.wait(), timeout=1)
+            thread.join()
+        assert not events._streams["s"].waiters
+
+    asyncio.run(run())
+
+
+class _Request:
+    async def is_disconnected(self):
+        return False
+
+
+def _stream(session_id: str, last_event_id: str | None) -> list[str]:
+    async def run():
+        response = await stream_events(session_id, _Request(), last_event_id=last_event_id)
+        return [chunk async for chunk in response.body_iterator]
+    return asyncio.run(asyncio.wait_for(run(), timeout=5))
+
+
+def test_stream_replays_events_after_last_event_id(db, monkeypatch):
+    events = SessionEvents()
+    monkeypatch.setattr("app.api.screening.session_events", events)
+    session = ScreeningSession(job_description="t", keep_count=5, status="processing")
+    db.add(session)
+    db.commit()
+
+    events.publish(session.id, "candidate", {"id": "c1"})
+    resume_from = events.last_id(session.id)
+    events.publish(session.id, "candidate", {"id": "c2"})
+    events.publish(session.id, "status", {"status": "completed"})
+
+    resumed = _stream(session.id, resume_from)
+    assert len(resumed) == 2
+    assert resumed[0].startswith(f"id: {resume_from.split('-')[0]}-2\n") and '"c2"' in resumed[0]
+    assert '"completed"' in resumed[1]
+
+    # A stale id gets a progress snapshot of the session row instead
+    session.status = "completed"
+    db.add(session)
+    db.commit()
+    [snapshot] = _stream(session.id, "0000-1")
+    assert "event: progress" in snapshot and '"completed"' in snapshot
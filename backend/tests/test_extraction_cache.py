@@ -0,0 +1,72 @@
+import hashlib
+from datetime import datetime, timedelta
+from sqlmodel import select
+from app.config import settings
+from app.models.cache import ExtractionCacheEntry
+from app.models.candidate import Candidate
+from app.models.session import ScreeningSession
+from app.services import extraction_cache as cache_module
+from app.services import pdf_extractor
+from app.services.extraction import ExtractionStage
+from app.services.extraction_cache import ExtractionCache, hash_file, make_extraction_key
+
+
+def test_hash_file(tmp_path):
+    path = tmp_path / "r.pdf"
+    path.write_bytes(b"%PDF" * 500_000)
+    assert hash_file(str(path)) == hashlib.sha256(b"%PDF" * 500_000).hexdigest()
+
+
+def test_key_covers_engine_and_ocr(monkeypatch):
+    key = make_extraction_key("h")
+    monkeypatch.setitem(pdf_extractor._ENGINES, "other", lambda path: [])
+    monkeypatch.setattr(settings, "PDF_TEXT_ENGINE", "other")
+    assert make_extraction_key("h") != key
+    monkeypatch.setattr(settings, "PDF_TEXT_ENGINE", "pypdf")
+    monkeypatch.setattr(cache_module, "OCR_AVAILABLE", not cache_module.OCR_AVAILABLE)
+    assert make_extraction_key("h") != key
+
+
+def test_put_and_get_many(db):
+    cache = ExtractionCache()
+    cache.put(db, "a", "Resume A", None)
+    cache.put(db, "b", "Resume B", "Text extracted using OCR (image-based PDF)")
+    cache.put(db, "c", "", "OCR failed: tesseract crashed")  # Transient, not cached
+    db.commit()
+    found = cache.get_many(db, ["a", "b", "c", "a"])
+    db.commit()
+    assert found == {"a": ("Resume A", None), "b": ("Resume B", "Text extracted using OCR (image-based PDF)")}
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert db.get(ExtractionCacheEntry, make_extraction_key("a")).hit_count == 1
+
+
+def test_evict_drops_least_recently_used(db, monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACTION_CACHE_MAX_MB", 1)
+    cache = ExtractionCache()
+    for i, age in enumerate([5, 10, 1]):
+        cache.put(db, f"f{i}", "x" * 400_000, None)
+        db.get(ExtractionCacheEntry, make_extraction_key(f"f{i}")).last_used_at = datetime.utcnow() - timedelta(minutes=age)
+    db.commit()
+    assert cache.evict(db) == 1
+    assert cache.get_many(db, ["f0", "f1", "f2"]).keys() == {"f0", "f2"}
+    assert cache.stats(db)["entries"] == 2
+
+
+def test_stage_serves_cached_files_without_extracting(db):
+    ExtractionCache().put(db, "same", "Resume text from the first upload", None)
+    session = ScreeningSession(job_description="t", keep_count=5, status="created")
+    db.add(session)
+    db.commit()
+    db.add_all([
+        Candidate(session_id=session.id, filename="again.pdf", file_hash="same", extraction_status="extracting"),
+        Candidate(session_id=session.id, filename="new.pdf", file_hash="new", extraction_status="extracting"),
+    ])
+    db.commit()
+
+    groups, served = ExtractionStage()._next(10, set())
+    assert served == 1
+    [(path, file_hash, _)] = groups
+    assert file_hash == "new" and path.endswith("new.pdf")
+    db.expire_all()
+    again = db.exec(select(Candidate).where(Candidate.filename == "again.pdf")).one()
+    assert (again.extraction_status, again.original_text) == ("ready", "Resume text from the first upload")
@@ -0,0 +1,39 @@
+import asyncio
+import os
+import pytest
+from app.config import settings
+from app.services import extraction
+from app.services.extraction import ExtractionPool
+
+
+def _extract(path: str) -> tuple[str, str | None]:
+    """Stands in for extract_text_from_file in the worker processes."""
+    if "crash" in path:
+        os._exit(1)  # Like a segfault in a native PDF library
+    return f"text of {path}", None
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACTION_WORKERS", 2)
+    monkeypatch.setattr(extraction, "extract_text_from_file", _extract)
+    pool = ExtractionPool()
+    yield pool
+    pool.shutdown()
+
+
+def test_extracts_in_worker_processes(pool):
+    assert asyncio.run(pool.extract_many(["a.pdf", "b.pdf"])) == [("text of a.pdf", None), ("text of b.pdf", None)]
+
+
+def test_a_crashing_file_fails_alone_and_the_pool_recovers(pool):
+    async def run():
+        results = await pool.extract_many(["a.pdf", "crash.pdf", "b.pdf"])
+        return results, await pool.extract("c.pdf")
+
+    first = pool._get_executor()
+    results, after = asyncio.run(run())
+    assert results[0] == ("text of a.pdf", None) and results[2] == ("text of b.pdf", None)
+    assert isinstance(results[1], RuntimeError)
+    assert after == ("text of c.pdf", None)
+    assert pool._executor is not None and pool._executor is not first
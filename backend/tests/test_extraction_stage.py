@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timedelta
+from sqlmodel import select
+from app.config import settings
+from app.models.candidate import Candidate
+from app.models.job import ScoringJob, WorkItem
+from app.models.session import ScreeningSession
+from app.services import extraction
+from app.services.extraction import ExtractionStage
+
+
+def _candidates(db, *file_hashes: str, attempts: int = 0) -> list[str]:
+    session = ScreeningSession(job_description="t", keep_count=5, status="created")
+    db.add(session)
+    db.commit()
+    candidates = [
+        Candidate(session_id=session.id, filename=f"r{i}.pdf", file_hash=file_hash, extraction_status="extracting",
+                  extraction_attempts=attempts, uploaded_at=datetime.utcnow() + timedelta(seconds=i))
+        for i, file_hash in enumerate(file_hashes)
+    ]
+    db.add_all(candidates)
+    db.commit()
+    return [c.id for c in candidates]
+
+
+def _candidate(db, candidate_id: str) -> Candidate:
+    db.expire_all()
+    return db.get(Candidate, candidate_id)
+
+
+def test_claims_are_leased_and_taken_over_once_expired(db, monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACTION_CACHE_ENABLED", False)
+    ids = _candidates(db, "h1", "h2", "h1")
+    groups, served = ExtractionStage()._next(10, set())
+    assert served == 0
+    # Identical files are extracted once for all their candidates
+    assert sorted((file_hash, len(ids)) for _, file_hash, ids in groups) == [("h1", 2), ("h2", 1)]
+    # Another process finds nothing to claim while the leases last
+    assert ExtractionStage()._next(10, set()) == ([], 0)
+
+    db.execute(Candidate.__table__.update().values(extraction_lease_expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.commit()
+    groups, _ = ExtractionStage()._next(1, set())
+    assert [candidate_ids for _, _, candidate_ids in groups] == [[ids[0]]]  # Oldest upload first
+    assert _candidate(db, ids[0]).extraction_attempts == 2
+
+
+def test_extracted_text_is_stored_and_releases_waiting_items(db, monkeypatch):
+    async def extract(path):
+        return "Extracted resume text", None
+
+    monkeypatch.setattr(extraction.extraction_pool, "extract", extract)
+    [candidate_id] = _candidates(db, "h1")
+    job = ScoringJob(session_id=_candidate(db, candidate_id).session_id, status="running", planned=True)
+    db.add(job)
+    db.commit()
+    item = WorkItem(job_id=job.id, candidate_id=candidate_id, state="waiting")
+    db.add(item)
+    db.commit()
+
+    async def run():
+        stage = ExtractionStage()
+        stage.start()
+        try:
+            for _ in range(100):
+                if _candidate(db, candidate_id).extraction_status == "ready":
+                    return
+                await asyncio.sleep(0.02)
+        finally:
+            await stage.stop()
+
+    asyncio.run(run())
+    candidate = _candidate(db, candidate_id)
+    assert (candidate.original_text, candidate.extraction_warning) == ("Extracted resume text", None)
+    assert candidate.extraction_lease_expires_at is None
+    assert db.get(WorkItem, item.id).state == "pending"
+
+
+def test_failed_stores_are_retried_with_backoff(db, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_POLL_SECONDS", 10)
+
+    async def extract(path):
+        return "Extracted resume text", None
+
+    def complete(*args):
+        raise RuntimeError("database is locked")
+
+    stage = ExtractionStage()
+    monkeypatch.setattr(extraction.extraction_pool, "extract", extract)
+    monkeypatch.setattr(stage, "_complete", complete)
+    [candidate_id] = _candidates(db, "h1", attempts=2)  # Claimed for its second attempt
+
+    async def run():
+        stage._wake = asyncio.Event()
+        await stage._extract("r0.pdf", "h1", [candidate_id])
+
+    started = datetime.utcnow()
+    asyncio.run(run())
+    candidate = _candidate(db, candidate_id)
+    assert candidate.extraction_status == "extracting"
+    # Delay doubles per failed attempt: 10s, then 20s
+    assert timedelta(seconds=19) < candidate.extraction_lease_expires_at - started < timedelta(seconds=21)
+    assert not stage._in_flight
+
+
+def test_gives_up_after_max_attempts(db, monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACTION_MAX_ATTEMPTS", 3)
+    retried = _candidates(db, "h1", "h2", attempts=2)
+    [given_up] = _candidates(db, "h3", attempts=3)
+    groups, served = ExtractionStage()._next(10, set())
+    assert served == 1
+    assert sorted(cid for _, _, ids in groups for cid in ids) == sorted(retried)
+    candidate = _candidate(db, given_up)
+    assert candidate.extraction_status == "ready" and candidate.original_text == ""
+    assert candidate.extraction_warning == "Extraction failed: text could not be stored after 3 attempts"
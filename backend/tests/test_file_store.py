@@ -0,0 +1,58 @@
+import hashlib
+import io
+import os
+import pytest
+from app.services import file_store
+from app.services.file_store import candidate_file_path, store_stream
+
+
+class _Source(io.BytesIO):
+    """A stream that records the size of every read."""
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        self.reads.append(size)
+        return super().read(size)
+
+
+@pytest.fixture(autouse=True)
+def upload_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_store, "UPLOAD_ROOT", str(tmp_path))
+    return tmp_path
+
+
+def test_stores_under_the_content_hash_in_chunks(upload_root):
+    data = os.urandom(3 * 1024 * 1024 + 17)
+    source = _Source(data)
+    stored = store_stream(source, "s1")
+    assert stored.sha256 == hashlib.sha256(data).hexdigest()
+    assert stored.size == len(data)
+    assert stored.path == candidate_file_path("s1", "resume.pdf", stored.sha256)
+    assert open(stored.path, "rb").read() == data
+    assert set(source.reads) == {1024 * 1024}
+    assert os.listdir(upload_root / "s1") == [f"{stored.sha256}.pdf"]
+
+
+def test_identical_files_are_stored_once(upload_root):
+    first = store_stream(io.BytesIO(b"same resume"), "s1")
+    second = store_stream(io.BytesIO(b"same resume"), "s1")
+    other = store_stream(io.BytesIO(b"another resume"), "s1")
+    assert first == second
+    assert other.path != first.path
+    assert len(os.listdir(upload_root / "s1")) == 2
+
+
+def test_oversized_stream_stores_nothing(upload_root):
+    source = _Source(b"x" * (2 * 1024 * 1024 + 1))
+    with pytest.raises(ValueError, match="larger than 2 MB"):
+        store_stream(source, "s1", max_bytes=2 * 1024 * 1024)
+    assert os.listdir(upload_root / "s1") == []
+    # Stopped reading at the chunk that crossed the limit
+    assert len(source.reads) == 3
+
+
+def test_legacy_candidates_are_found_by_filename():
+    assert candidate_file_path("s1", "resume.pdf", None).endswith(os.path.join("s1", "resume.pdf"))
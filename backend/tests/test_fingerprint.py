@@ -0,0 +1,110 @@
+import random
+from sqlmodel import select
+from app.config import settings
+from app.models.candidate import Candidate
+from app.models.fingerprint import ResumeFingerprint
+from app.models.session import ScreeningSession
+from app.services import fingerprint
+from app.services.compaction import PAGE_BREAK
+from app.services.fingerprint import _bands, _matches, find_duplicates, hamming, index_candidate, simhash
+
+def _resume(seed: int, words: int = 400) -> str:
+    rng = random.Random(seed)
+    return " ".join(f"word{rng.randrange(3000)}" for _ in range(words))
+
+
+def _flip(value: int, *bits: int) -> int:
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def test_simhash_is_stable_and_close_for_small_edits():
+    text = _resume(1)
+    assert simhash(text) == simhash(text.upper())
+    edited = text.replace(text.split()[200], "edited", 1)
+    # A one-word edit moves a few bits; an unrelated resume about half of them
+    assert hamming(simhash(text), simhash(edited)) < 8 < hamming(simhash(text), simhash(_resume(2)))
+    assert simhash("too short to fingerprint") is None
+
+
+def test_bands_split_the_value_into_four_16_bit_parts():
+    assert _bands(0x0123_4567_89AB_CDEF) == [0xCDEF, 0x89AB, 0x4567, 0x0123]
+
+
+def test_any_three_bit_difference_keeps_a_band():
+    rng = random.Random(0)
+    for _ in range(2000):
+        value = rng.getrandbits(64)
+        other = _flip(value, *rng.sample(range(64), 3))
+        assert any(a == b for a, b in zip(_bands(value), _bands(other)))
+
+
+def _fingerprint(db, session_id: str, candidate_id: str, value: int):
+    db.add(ResumeFingerprint(
+        candidate_id=candidate_id, session_id=session_id, simhash=f"{value:016x}",
+        **{f"band{i}": band for i, band in enumerate(_bands(value))}
+    ))
+    db.commit()
+
+
+def test_matches_within_the_supported_distance(db):
+    value = 0x0123_4567_89AB_CDEF
+    _fingerprint(db, "s", "same", value)
+    _fingerprint(db, "s", "three", _flip(value, 0, 16, 32))  # Only band 3 left intact
+    _fingerprint(db, "s", "four", _flip(value, 0, 16, 32, 48))  # Differs in every band
+    _fingerprint(db, "s", "four-in-one-band", _flip(value, 0, 1, 2, 3))
+    assert _matches(db, [value]) == {"same": 0, "three": 3}
+
+
+def test_distance_above_the_bands_is_clamped(db, monkeypatch):
+    monkeypatch.setattr(settings, "DUPLICATE_MAX_DISTANCE", 10)
+    value = 0x0123_4567_89AB_CDEF
+    _fingerprint(db, "s", "four-in-one-band", _flip(value, 0, 1, 2, 3))
+    # Found by its bands, but farther than the band lookup can guarantee to find
+    assert _matches(db, [value]) == {}
+    assert fingerprint._MAX_DISTANCE == 3
+
+
+def _candidate(db, session_id: str, text: str) -> Candidate:
+    candidate = Candidate(session_id=session_id, filename="r.pdf", original_text=text)
+    db.add(candidate)
+    db.commit()
+    index_candidate(db, candidate)
+    db.commit()
+    return candidate
+
+
+def _session(db) -> str:
+    session = ScreeningSession(job_description="t", keep_count=5)
+    db.add(session)
+    db.commit()
+    return session.id
+
+
+def test_duplicates_are_linked_within_a_session_only(db):
+    first_session, second_session = _session(db), _session(db)
+    text = _resume(1)
+    original = _candidate(db, first_session, text)
+    copy = _candidate(db, first_session, text)
+    cover_page = _candidate(db, first_session, f"Presented by ACME Staffing\n{PAGE_BREAK}{text}")
+    other_session = _candidate(db, second_session, text)
+    unrelated = _candidate(db, first_session, _resume(2))
+
+    assert original.duplicate_of_id is None
+    assert copy.duplicate_of_id == original.id
+    assert cover_page.duplicate_of_id == original.id
+    assert other_session.duplicate_of_id is None
+    assert unrelated.duplicate_of_id is None
+
+    # The duplicates view looks across sessions
+    found = {c.id: distance for c, distance in find_duplicates(db, other_session)}
+    assert found == {original.id: 0, copy.id: 0, cover_page.id: 0}
+
+
+def test_detection_can_be_disabled(db, monkeypatch):
+    monkeypatch.setattr(settings, "DUPLICATE_DETECTION_ENABLED", False)
+    session_id = _session(db)
+    _candidate(db, session_id, _resume(1))
+    assert _candidate(db, session_id, _resume(1)).duplicate_of_id is None
+    assert db.exec(select(ResumeFingerprint)).all() == []
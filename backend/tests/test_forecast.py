@@ -0,0 +1,78 @@
+import json
+from sqlmodel import select
+from app.config import settings
+from app.models.cache import ScoreCacheEntry
+from app.models.candidate import Candidate
+from app.models.session import ScreeningSession
+from app.services.forecast import (
+    DEFAULT_OUTPUT_TOKENS_PER_RESUME, DEFAULT_SECONDS_PER_RESUME, estimate_session, record_usage
+)
+from app.services.compaction import prompt_text
+from app.services.score_cache import hash_criteria, hash_text, make_cache_key
+from app.services.tokens import estimate_tokens
+
+CRITERIA = {"version": 1, "categories": [
+    {"id": "lang", "display_name": "Lang", "emoji": "x", "is_dealbreaker": True, "items": [{"text": "Fluent in Spanish"}]},
+    {"id": "skills", "display_name": "Skills", "emoji": "x", "weight": 1.0, "is_dealbreaker": False,
+     "items": [{"text": "Python"}]},
+]}
+MODEL = "test-model"
+
+
+def _session(db, texts: list[str | None], **fields) -> ScreeningSession:
+    session = ScreeningSession(job_description="t", keep_count=5, criteria_json=json.dumps(CRITERIA))
+    db.add(session)
+    db.commit()
+    for i, text in enumerate(texts):
+        db.add(Candidate(session_id=session.id, filename=f"r{i}.pdf", original_text=text, **fields))
+    db.commit()
+    return session
+
+
+def test_every_candidate_needs_a_call_without_history(db):
+    texts = [f"Resume {i}: Python developer, native Spanish speaker" for i in range(4)]
+    session = _session(db, texts)
+    estimate = estimate_session(db, session, MODEL, token_budget=10)
+
+    assert estimate["candidates"] == estimate["llm_calls"] == 4
+    assert estimate["output_tokens"] == 4 * DEFAULT_OUTPUT_TOKENS_PER_RESUME
+    assert estimate["input_tokens"] > sum(estimate_tokens(t) for t in texts)
+    assert estimate["total_tokens"] == estimate["input_tokens"] + estimate["output_tokens"]
+    concurrency = min(settings.SCORING_CONCURRENCY, settings.SCORING_GLOBAL_CONCURRENCY, settings.LLM_MAX_CONCURRENCY)
+    assert estimate["duration_seconds"] == round(4 * DEFAULT_SECONDS_PER_RESUME / concurrency, 1)
+    assert estimate["within_budget"] is False
+
+
+def test_candidates_without_a_call_are_left_out(db, monkeypatch):
+    monkeypatch.setattr(settings, "PREFILTER_ENABLED", True)
+    session = _session(db, ["Python developer, native Spanish speaker", "Python developer, fluent in Spanish", None,
+                            "Python developer, German and French only"])
+    db.add(Candidate(session_id=session.id, filename="extracting.pdf", extraction_status="extracting"))
+    canonical = db.exec(select(Candidate).where(Candidate.filename == "r0.pdf")).one()
+    db.add(Candidate(session_id=session.id, filename="copy.pdf", original_text="copy", duplicate_of_id=canonical.id))
+    cached_text, _ = prompt_text("Python developer, fluent in Spanish")
+    db.add(ScoreCacheEntry(
+        key=make_cache_key(hash_text(cached_text), hash_criteria(CRITERIA), MODEL), resume_hash=hash_text(cached_text),
+        criteria_hash=hash_criteria(CRITERIA), model=MODEL, result_json="{}", size_bytes=2
+    ))
+    db.commit()
+
+    estimate = estimate_session(db, session, MODEL)
+    assert estimate["candidates"] == 6
+    assert (estimate["duplicates"], estimate["no_text"], estimate["prefilter_rejected"], estimate["cached"]) == (1, 1, 1, 1)
+    # One uncached resume plus the extracting one, assumed to cost the average
+    assert (estimate["extracting"], estimate["llm_calls"]) == (1, 2)
+    assert estimate["within_budget"] is None
+
+
+def test_history_drives_output_tokens_and_duration(db):
+    record_usage(db, MODEL, resumes=10, input_tokens=5000, output_tokens=2000, timed_resumes=10, timed_seconds=40.0)
+    db.commit()
+    session = _session(db, ["Python developer, native Spanish speaker"])
+
+    estimate = estimate_session(db, session, MODEL, token_budget=10_000)
+    assert estimate["output_tokens"] == 200
+    concurrency = min(settings.SCORING_CONCURRENCY, settings.SCORING_GLOBAL_CONCURRENCY, settings.LLM_MAX_CONCURRENCY)
+    assert estimate["duration_seconds"] == round(4.0 / concurrency, 1)
+    assert estimate["history_resumes"] == 10
+    assert estimate["within_budget"] is True
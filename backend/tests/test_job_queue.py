@@ -0,0 +1,211 @@
+import copy
+import json
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlmodel import select
+from app.config import settings
+from app.models.candidate import Candidate
+from app.models.job import ScoringJob, WorkItem
+from app.models.session import ScreeningSession
+from app.services import batch_processor
+from app.services import job_queue
+
+CRITERIA = {"version": 1, "categories": [
+    {"id": "edu", "display_name": "Edu", "emoji": "x", "is_dealbreaker": True, "items": [{"text": "Bachelor's degree"}]},
+    {"id": "skills", "display_name": "Skills", "emoji": "x", "weight": 1.0, "is_dealbreaker": False,
+     "items": [{"text": "Python"}]},
+]}
+
+
+def _session(db, count: int) -> str:
+    session = ScreeningSession(job_description="t", keep_count=5, criteria_json=json.dumps(CRITERIA),
+                               status="processing", total_resumes=count)
+    db.add(session)
+    db.commit()
+    for i in range(count):
+        db.add(Candidate(session_id=session.id, filename=f"r{i}.pdf", original_text=f"Resume {i}: BS, Python developer"))
+    db.commit()
+    return session.id
+
+
+def _job(db, items: int = 3) -> tuple[str, list[str]]:
+    """A planned, running interactive job with pending items, as the planner leaves it."""
+    session_id = _session(db, items)
+    job = ScoringJob(session_id=session_id, status="running", planned=True, started_at=datetime.utcnow())
+    db.add(job)
+    db.commit()
+    candidates = db.exec(select(Candidate.id).where(Candidate.session_id == session_id)).all()
+    work = [WorkItem(job_id=job.id, candidate_id=candidate_id) for candidate_id in candidates]
+    db.add_all(work)
+    db.commit()
+    return job.id, [item.id for item in work]
+
+
+def _items(db, job_id: str) -> dict[str, WorkItem]:
+    db.expire_all()
+    return {item.id: item for item in db.exec(select(WorkItem).where(WorkItem.job_id == job_id))}
+
+
+def test_claim_items_leases_each_item_once(db):
+    job_id, item_ids = _job(db, 3)
+    first = job_queue.claim_items(job_id, "a", 2)
+    second = job_queue.claim_items(job_id, "b", 5)
+    assert len(first) == 2
+    assert sorted(first + second) == sorted(item_ids)
+    assert job_queue.claim_items(job_id, "a", 5) == []
+
+
+def test_finish_items_only_applies_for_the_holder(db):
+    job_id, _ = _job(db, 1)
+    [item_id] = job_queue.claim_items(job_id, "a", 1)
+
+    assert job_queue.finish_items(db, [(item_id, True, None, False)], "b") == set()
+    db.commit()
+    assert _items(db, job_id)[item_id].state == "leased"
+
+    assert job_queue.finish_items(db, [(item_id, True, None, False)], "a") == {item_id}
+    db.commit()
+    item = _items(db, job_id)[item_id]
+    assert (item.state, item.lease_owner) == ("done", None)
+
+
+def test_expired_lease_is_taken_over(db):
+    job_id, _ = _job(db, 1)
+    [item_id] = job_queue.claim_items(job_id, "a", 1)
+    assert job_queue.claim_items(job_id, "b", 1) == []
+
+    item = _items(db, job_id)[item_id]
+    item.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.add(item)
+    db.commit()
+
+    assert job_queue.claim_items(job_id, "b", 1) == [item_id]
+    # The original holder's late result is discarded
+    assert job_queue.finish_items(db, [(item_id, True, None, False)], "a") == set()
+    db.commit()
+    item = _items(db, job_id)[item_id]
+    assert (item.state, item.lease_owner, item.attempts) == ("leased", "b", 2)
+
+
+def test_expired_lease_fails_after_max_attempts(db, monkeypatch):
+    monkeypatch.setattr(settings, "WORK_ITEM_MAX_ATTEMPTS", 1)
+    job_id, _ = _job(db, 1)
+    [item_id] = job_queue.claim_items(job_id, "a", 1)
+    item = _items(db, job_id)[item_id]
+    item.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.add(item)
+    db.commit()
+
+    assert job_queue.claim_items(job_id, "b", 1) == []
+    item = _items(db, job_id)[item_id]
+    assert (item.state, item.last_error) == ("failed", "Lease expired too often")
+
+
+def test_release_job_requeues_without_counting_the_attempt(db):
+    job_id, item_ids = _job(db, 2)
+    job = db.get(ScoringJob, job_id)
+    job.status = "queued"
+    db.add(job)
+    db.commit()
+    assert job_queue.claim_job("a") == job_id
+    job_queue.claim_items(job_id, "a", 1)
+
+    job_queue.release_job(job_id, "a")
+
+    db.expire_all()
+    job = db.get(ScoringJob, job_id)
+    assert (job.status, job.lease_owner) == ("queued", None)
+    assert all(
+        (item.state, item.lease_owner, item.attempts) == ("pending", None, 0) for item in _items(db, job_id).values()
+    )
+
+
+def test_fail_job_requeues_until_max_attempts(db, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 2)
+    job_id, _ = _job(db, 1)
+    job = db.get(ScoringJob, job_id)
+    job.status = "queued"
+    db.add(job)
+    db.commit()
+
+    assert job_queue.claim_job("a") == job_id
+    job_queue.fail_job(job_id, "a", "boom")
+    db.expire_all()
+    job = db.get(ScoringJob, job_id)
+    assert (job.status, job.attempts, job.error) == ("queued", 1, "boom")
+
+    assert job_queue.claim_job("b") == job_id
+    job_queue.fail_job(job_id, "b", "boom again")
+    db.expire_all()
+    job = db.get(ScoringJob, job_id)
+    session = db.get(ScreeningSession, job.session_id)
+    assert (job.status, job.attempts) == ("failed", 2)
+    assert (session.status, session.error) == ("failed", "boom again")
+
+
+def test_fail_job_returns_items_until_their_max_attempts(db, monkeypatch):
+    monkeypatch.setattr(settings, "WORK_ITEM_MAX_ATTEMPTS", 2)
+    job_id, _ = _job(db, 1)
+    [item_id] = job_queue.claim_items(job_id, "a", 1)
+    job_queue.fail_job(job_id, "a", "boom")
+    item = _items(db, job_id)[item_id]
+    assert (item.state, item.last_error) == ("pending", "boom")
+    # A runner that doesn't hold the job lease leaves the job alone
+    assert db.get(ScoringJob, job_id).status == "running"
+
+    assert job_queue.claim_items(job_id, "b", 1) == [item_id]
+    job_queue.fail_job(job_id, "b", "boom")
+    assert _items(db, job_id)[item_id].state == "failed"
+
+
+def _run(db, session_id: str, owner: str = "runner") -> str:
+    job = job_queue.enqueue(db, session_id, "interactive")
+    db.commit()
+    assert job_queue.claim_job(owner) == job.id
+    batch_processor.process_job(job.id, owner)
+    return job.id
+
+
+def test_finish_keeps_the_snapshot_after_partial_failure(db, monkeypatch):
+    async def score(text, criteria, system_prompt=None):
+        return ({"passed_dealbreakers": True, "rejection_reason": None, "final_score": 80, "one_liner": "ok",
+                 "category_scores": {"skills": {"score": 80}}, "strengths": [], "concerns": [], "highlights": []},
+                {"input_tokens": 10, "output_tokens": 5})
+
+    monkeypatch.setattr(batch_processor, "score_resume", score)
+    session_id = _session(db, 6)
+    _run(db, session_id)
+    db.expire_all()
+    assert db.get(ScreeningSession, session_id).scored_criteria_json == json.dumps(CRITERIA)
+
+    # Changing a scored category rescores it incrementally; every other call fails
+    changed = copy.deepcopy(CRITERIA)
+    changed["categories"][1]["items"][0]["text"] = "Python and Go"
+    session = db.get(ScreeningSession, session_id)
+    session.criteria_json = json.dumps(changed)
+    db.add(session)
+    db.commit()
+    calls = []
+
+    async def rescore(text, criteria, ids, system_prompt=None):
+        calls.append(text)
+        if len(calls) % 2:
+            raise RuntimeError("boom")
+        return {"skills": {"score": 40}}, {"input_tokens": 10, "output_tokens": 5}
+
+    monkeypatch.setattr(batch_processor, "score_resume_categories", rescore)
+    monkeypatch.setattr(settings, "WORK_ITEM_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(settings, "SCORE_CACHE_ENABLED", False)
+    job_id = _run(db, session_id)
+
+    db.expire_all()
+    session = db.get(ScreeningSession, session_id)
+    assert session.status == "completed"
+    assert session.scored_criteria_json == json.dumps(CRITERIA)
+    assert session.unscored_count == 3
+    assert db.get(ScoringJob, job_id).status == "completed"
+    failed = set(db.exec(select(WorkItem.candidate_id).where(WorkItem.job_id == job_id, WorkItem.state == "failed")))
+    candidates = db.exec(select(Candidate).where(Candidate.session_id == session_id)).all()
+    assert len(failed) == 3
+    # Failed candidates lose their results under the old criteria instead of keeping them
+    assert Counter((c.id in failed, c.processed_at is None) for c in candidates) == {(True, True): 3, (False, False): 3}
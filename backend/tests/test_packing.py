@@ -0,0 +1,115 @@
+import asyncio
+import json
+import pytest
+from sqlmodel import select
+from app.config import settings
+from app.models.candidate import Candidate
+from app.models.session import ScreeningSession
+from app.services import batch_processor, job_queue
+from app.services.llm import scoring
+
+CRITERIA = {"version": 1, "categories": [
+    {"id": "skills", "display_name": "Skills", "emoji": "x", "weight": 1.0, "is_dealbreaker": False,
+     "items": [{"text": "Python"}]},
+]}
+
+
+def _result(score: int) -> dict:
+    return {"passed_dealbreakers": True, "rejection_reason": None, "final_score": score, "one_liner": "ok",
+            "category_scores": {"skills": {"score": score}}, "strengths": [], "concerns": [], "highlights": []}
+
+
+@pytest.fixture
+def word_tokens(monkeypatch):
+    """One token per word, so pack sizes are easy to reason about."""
+    monkeypatch.setattr(batch_processor, "estimate_tokens", lambda text: len(text.split()))
+    monkeypatch.setattr(settings, "SCORING_PACK_TOKEN_BUDGET", 100)
+    monkeypatch.setattr(settings, "SCORING_PACK_MAX_RESUMES", 3)
+
+
+def _work(*sizes, previous=None):
+    to_score = [(Candidate(id=f"c{i}", session_id="s", filename="r.pdf"), previous) for i in range(len(sizes))]
+    return to_score, {f"c{i}": "word " * size for i, size in enumerate(sizes)}
+
+
+def _sizes(packs) -> list[list[str]]:
+    return [[candidate.id for candidate, _ in pack] for pack in packs]
+
+
+def test_packing_is_off_by_default():
+    to_score, texts = _work(10, 10)
+    assert _sizes(batch_processor._pack(to_score, texts)) == [["c0"], ["c1"]]
+
+
+def test_short_resumes_share_requests_up_to_the_budget_and_count(word_tokens):
+    to_score, texts = _work(10, 10, 10, 10, 40, 40, 30)
+    assert _sizes(batch_processor._pack(to_score, texts)) == [["c0", "c1", "c2"], ["c3", "c4", "c5"], ["c6"]]
+
+
+def test_large_empty_and_incremental_resumes_stay_alone(word_tokens):
+    to_score, texts = _work(10, 60, 0, 10)
+    assert _sizes(batch_processor._pack(to_score, texts)) == [["c1"], ["c2"], ["c0", "c3"]]
+    to_score, texts = _work(10, 10, previous=_result(50))
+    assert _sizes(batch_processor._pack(to_score, texts)) == [["c0"], ["c1"]]
+
+
+def test_pack_response_drops_malformed_entries(monkeypatch):
+    async def generate_json(**kwargs):
+        return {"results": [
+            {"resume_id": "1", **_result(80)},
+            {"resume_id": "1", **_result(10)},  # Repeated: first one wins
+            {"resume_id": "2", "passed_dealbreakers": "yes"},
+            {"resume_id": "3", "passed_dealbreakers": True},  # No category scores
+            {"resume_id": "9", **_result(60)},  # Not in the pack
+            "junk",
+            {"resume_id": 4, "passed_dealbreakers": False, "rejection_reason": "No Python"},
+        ]}, {"input_tokens": 100, "output_tokens": 50}
+
+    monkeypatch.setattr(scoring.llm_client, "generate_json", generate_json)
+    resumes = {str(i): f"Resume {i}" for i in range(1, 5)}
+    results, usage = asyncio.run(scoring.score_resume_pack(resumes, CRITERIA, system_prompt="s"))
+    assert set(results) == {"1", "4"}
+    assert results["1"]["final_score"] == 80
+    assert usage["input_tokens"] == 100
+
+
+def test_pack_response_without_results_list(monkeypatch):
+    async def generate_json(**kwargs):
+        return {"candidates": []}, {"input_tokens": 100, "output_tokens": 5}
+
+    monkeypatch.setattr(scoring.llm_client, "generate_json", generate_json)
+    assert asyncio.run(scoring.score_resume_pack({"1": "a", "2": "b"}, CRITERIA, system_prompt="s"))[0] == {}
+
+
+def test_candidates_missing_from_a_pack_are_scored_individually(db, monkeypatch, word_tokens):
+    packed, single = [], []
+
+    async def score_pack(resumes, criteria, system_prompt=None):
+        packed.append(sorted(resumes.values()))
+        # Only the first resume of each pack comes back
+        first = next(iter(resumes))
+        return {first: _result(90)}, {"input_tokens": 300, "output_tokens": 100}
+
+    async def score(text, criteria, system_prompt=None):
+        single.append(text)
+        return _result(40), {"input_tokens": 100, "output_tokens": 50}
+
+    monkeypatch.setattr(batch_processor, "score_resume_pack", score_pack)
+    monkeypatch.setattr(batch_processor, "score_resume", score)
+    session = ScreeningSession(job_description="t", keep_count=5, criteria_json=json.dumps(CRITERIA), status="processing")
+    db.add(session)
+    db.commit()
+    for i in range(3):
+        db.add(Candidate(session_id=session.id, filename=f"r{i}.pdf", original_text=f"Resume {i}: Python developer"))
+    db.commit()
+
+    job = job_queue.enqueue(db, session.id, "interactive")
+    db.commit()
+    assert job_queue.claim_job("runner") == job.id
+    batch_processor.process_job(job.id, "runner")
+
+    db.expire_all()
+    assert len(packed) == 1 and len(packed[0]) == 3
+    assert len(single) == 2
+    assert sorted(c.final_score for c in db.exec(select(Candidate))) == [40, 40, 90]
+    assert db.get(ScreeningSession, session.id).total_input_tokens == 500
@@ -0,0 +1,82 @@
+import pytest
+from app.services import pdf_extractor
+from app.services.compaction import PAGE_BREAK
+from app.services.pdf_extractor import PageText, extract_text_from_file
+
+TEXT_PAGE = "Experienced Python developer with ten years of backend work."
+
+
+@pytest.fixture
+def ocr(monkeypatch):
+    """OCR that reads "scanned text N" off page N, recording the pages and DPIs it was asked for."""
+    calls = []
+
+    def ocr_page(path, page_number, dpi):
+        calls.append((page_number, dpi))
+        return f"scanned text of page {page_number}, long enough to keep"
+
+    monkeypatch.setattr(pdf_extractor, "OCR_AVAILABLE", True)
+    monkeypatch.setattr(pdf_extractor, "_ocr_page", ocr_page)
+    return calls
+
+
+def _engine(monkeypatch, pages: list[PageText]):
+    monkeypatch.setitem(pdf_extractor._ENGINES, "fake", lambda path: pages)
+
+
+def test_only_pages_without_a_text_layer_are_ocrd(monkeypatch, ocr):
+    _engine(monkeypatch, [
+        PageText(TEXT_PAGE, 200, False),
+        PageText("", 150, True),  # Scanned page
+        PageText("", 200, False),  # Blank page, no image
+        PageText(TEXT_PAGE, 200, False),
+    ])
+    text, warning = extract_text_from_file("x.pdf", engine="fake")
+    assert ocr == [(2, 150)]
+    assert text.split(PAGE_BREAK)[1].strip() == "scanned text of page 2, long enough to keep"
+    assert text.count(TEXT_PAGE) == 2
+    assert warning == "Text extracted using OCR for page(s) 2 (image-based pages)"
+
+
+def test_documents_with_next_to_no_text_are_ocrd_in_full(monkeypatch, ocr):
+    # Outlined fonts: no text layer, and the glyphs aren't images either
+    _engine(monkeypatch, [PageText("", 200, False), PageText("", 200, False)])
+    text, warning = extract_text_from_file("x.pdf", engine="fake")
+    assert sorted(page for page, _ in ocr) == [1, 2]
+    assert warning == "Text extracted using OCR (image-based PDF)"
+
+
+def test_ocr_text_shorter_than_the_text_layer_is_ignored(monkeypatch, ocr):
+    _engine(monkeypatch, [PageText(TEXT_PAGE, 200, False), PageText("Page 2 of 2 ....", 200, True)])
+    monkeypatch.setattr(pdf_extractor, "_ocr_page", lambda path, page, dpi: "2")
+    text, _ = extract_text_from_file("x.pdf", engine="fake")
+    assert "Page 2 of 2" in text
+
+
+def test_without_ocr_scanned_pages_are_reported(monkeypatch):
+    monkeypatch.setattr(pdf_extractor, "OCR_AVAILABLE", False)
+    _engine(monkeypatch, [PageText(TEXT_PAGE, 200, False), PageText("", 200, True)])
+    text, warning = extract_text_from_file("x.pdf", engine="fake")
+    assert text.strip(PAGE_BREAK + "\n") == TEXT_PAGE
+    assert warning == "Page(s) 2 are image-based and OCR is not available"
+
+
+def test_ocr_failure_keeps_the_text_layer(monkeypatch, ocr):
+    def fail(path, page, dpi):
+        raise RuntimeError("tesseract crashed")
+
+    monkeypatch.setattr(pdf_extractor, "_ocr_page", fail)
+    _engine(monkeypatch, [PageText(TEXT_PAGE, 200, False), PageText("", 200, True)])
+    text, warning = extract_text_from_file("x.pdf", engine="fake")
+    assert TEXT_PAGE in text
+    assert warning == "OCR failed: tesseract crashed"
+
+
+@pytest.mark.parametrize("size, dpi", [
+    ((612, 792), 200),  # US Letter
+    ((2384, 3370), 120),  # A0: capped so the image stays small
+    ((144, 216), 300),  # Business card
+    ((0, 0), 200),
+])
+def test_page_dpi(size, dpi):
+    assert pdf_extractor._page_dpi(*size) == dpi
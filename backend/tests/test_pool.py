@@ -0,0 +1,106 @@
+import asyncio
+import time
+from types import SimpleNamespace
+import pytest
+from app.config import settings
+from app.services.llm.pool import EndpointPool, parse_endpoints
+
+
+def _fake_client(healthy: list[bool]):
+    async def list_models():
+        if not healthy[0]:
+            raise ConnectionError("down")
+        return []
+    return SimpleNamespace(models=SimpleNamespace(list=list_models))
+
+
+@pytest.fixture
+def pool():
+    pool = EndpointPool([("http://a/v1", 2), ("http://b/v1", 1)], api_key="k")
+    for endpoint in pool.endpoints:
+        endpoint.up = [True]
+        endpoint.client = _fake_client(endpoint.up)
+    return pool
+
+
+def test_parse_endpoints():
+    assert parse_endpoints(" http://a/v1|3, http://b/v1 ,", 4) == [("http://a/v1", 3), ("http://b/v1", 4)]
+
+
+def test_requests_go_to_the_least_loaded_endpoint_by_weight(pool):
+    async def run():
+        picked = []
+        for _ in range(3):
+            picked.append((await pool._pick()).url)
+        return picked
+
+    assert sorted(asyncio.run(run())) == ["http://a/v1", "http://a/v1", "http://b/v1"]
+    assert [e.outstanding for e in pool.endpoints] == [2, 1]
+
+
+def test_requests_wait_for_a_free_endpoint(pool):
+    async def run():
+        async def hold():
+            async with pool.acquire():
+                await asyncio.sleep(0.1)
+
+        holders = [asyncio.create_task(hold()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        started = time.monotonic()
+        async with pool.acquire():
+            waited = time.monotonic() - started
+        await asyncio.gather(*holders)
+        return waited
+
+    assert 0.05 < asyncio.run(run()) < 0.5
+    assert [e.outstanding for e in pool.endpoints] == [0, 0]
+
+
+def test_failing_endpoint_is_ejected_and_reprobed(pool, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_POOL_EJECT_AFTER", 2)
+    monkeypatch.setattr(settings, "LLM_POOL_PROBE_SECONDS", 0.1)
+    a, b = pool.endpoints
+    pool.record_failure(b)
+    assert b.healthy
+    pool.record_failure(b)
+    assert not b.healthy
+
+    async def pick_url():
+        async with pool.acquire() as endpoint:
+            return endpoint.url
+
+    assert {asyncio.run(pick_url()) for _ in range(5)} == {a.url}
+
+    # Due for a re-probe, but still down
+    b.up[0] = False
+    time.sleep(0.15)
+    asyncio.run(pick_url())
+    assert not b.healthy
+
+    # Back up: the next request after the probe delay re-admits it
+    b.up[0] = True
+    time.sleep(0.15)
+    asyncio.run(pick_url())
+    assert b.healthy and b.consecutive_failures == 0
+
+
+def test_success_resets_the_failure_streak(pool, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_POOL_EJECT_AFTER", 2)
+    endpoint = pool.endpoints[1]
+    pool.record_failure(endpoint)
+    pool.record_success(endpoint)
+    pool.record_failure(endpoint)
+    assert endpoint.healthy
+
+
+def test_all_ejected_fails_open(pool, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_POOL_EJECT_AFTER", 1)
+    monkeypatch.setattr(settings, "LLM_POOL_PROBE_SECONDS", 60)
+    for endpoint in pool.endpoints:
+        pool.record_failure(endpoint)
+
+    async def pick_url():
+        async with pool.acquire() as endpoint:
+            return endpoint.url
+
+    assert asyncio.run(pick_url()) in {"http://a/v1", "http://b/v1"}
@@ -0,0 +1,78 @@
+import pytest
+from app.services.prefilter import compile_prefilter, run_prefilter
+
+
+def _criteria(*items):
+    return {"version": 1, "categories": [
+        {"id": "must", "display_name": "Must", "emoji": "x", "is_dealbreaker": True, "items": [{"text": t} for t in items]},
+    ]}
+
+
+RESUME = "Jane Doe\nSenior accountant, 8 years of audit work at a Big Four firm.\nBA Economics, State University."
+
+
+@pytest.mark.parametrize("item", [
+    "Ability to obtain a security clearance",
+    "Must be eligible for a security clearance",
+    "Able to obtain Secret clearance",
+    "Willingness to undergo a polygraph",
+    "CPA-eligible",
+    "CPA eligibility",
+    "PE ratio analysis for equity research",
+])
+def test_items_the_candidate_can_still_meet_are_left_to_the_llm(item):
+    assert compile_prefilter(_criteria(item)) == []
+
+
+@pytest.mark.parametrize("item, kind", [
+    ("Active TS/SCI security clearance", "clearance"),
+    ("CPA required", "certification"),
+    ("Licensed PE", "certification"),
+    ("RN (registered nurse) license", "certification"),
+    ("Fluent in Spanish", "language"),
+    ("Bachelor's degree in Finance", "degree"),
+])
+def test_hard_requirements_compile(item, kind):
+    rules = compile_prefilter(_criteria(item))
+    assert [rule.kind for rule in rules] == [kind]
+
+
+def test_rejects_only_when_the_requirement_is_never_mentioned():
+    rules = compile_prefilter(_criteria("Active security clearance", "CPA required"))
+    rejected = run_prefilter(rules, RESUME)
+    assert rejected["passed_dealbreakers"] is False
+    assert "clearance" in rejected["prefilter_rule"]
+
+    cleared = RESUME + "\nHolds an active Secret clearance. Certified Public Accountant."
+    assert run_prefilter(rules, cleared) is None
+
+
+def test_degree_rule_accepts_abbreviations_and_higher_levels():
+    rules = compile_prefilter(_criteria("Bachelor's degree"))
+    assert run_prefilter(rules, "MSc Computer Science") is None
+    assert run_prefilter(rules, "B.Eng. Mechanical") is None
+    assert run_prefilter(rules, "Self-taught developer, 10 years") is not None
+
+
+@pytest.mark.parametrize("item", [
+    "Bachelor's degree preferred",
+    "Bachelor's degree or equivalent experience",
+    "Degree in Computer Science or 5 years of experience",
+    "Master's degree ideally",
+    "Bachelor's degree (nice to have)",
+    "Spanish a plus",
+    "CPA preferred",
+])
+def test_near_miss_wording_is_left_to_the_llm(item):
+    assert compile_prefilter(_criteria(item)) == []
+
+
+@pytest.mark.parametrize("item, resume", [
+    ("Bachelor's degree", "Bachelor of Arts, History"),
+    ("Bachelor's degree", "BACHELOR OF SCIENCE - BIOLOGY"),
+    ("Master's degree", "Master of Public Health"),
+    ("Fluent in Spanish", "Native Spanish speaker, 5 years in sales"),
+    ("Fluent in Spanish", "Idiomas: español (nativo), inglés"),
+])
+def test_resumes_that_word_the_requirement_differently_pass(item, resume):
+    assert run_prefilter(compile_prefilter(_criteria(item)), resume) is None
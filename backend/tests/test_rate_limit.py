@@ -0,0 +1,170 @@
+import asyncio
+import threading
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.config import settings
+from app.services.llm import client as client_module
+from app.services.llm.client import LLMClient
+from app.services.llm.rate_limit import RateLimiter, TokenBucket, is_retryable, retry_after_seconds
+
+
+class _Response:
+    def __init__(self, headers: dict):
+        self.headers = headers
+
+
+class _ProviderError(Exception):
+    def __init__(self, status_code: int, headers: dict | None = None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = _Response(headers or {})
+
+
+def test_token_bucket_waits_for_refill():
+    async def run():
+        bucket = TokenBucket(600)  # 10 per second
+        await bucket.acquire(600)
+        started = time.monotonic()
+        await bucket.acquire(2)
+        return time.monotonic() - started
+
+    assert 0.1 <= asyncio.run(run()) < 1.0
+
+
+def test_token_bucket_clamps_large_requests_and_takes_debits():
+    async def run():
+        bucket = TokenBucket(60)
+        await bucket.acquire(10_000)  # Larger than the bucket: waits for a full one instead of forever
+        bucket.debit(30)
+        return bucket._tokens
+
+    assert asyncio.run(run()) < -29
+    asyncio.run(TokenBucket(0).acquire(10**9))  # 0 disables the limit
+
+
+def test_throttles_halve_concurrency_and_successes_raise_it_again():
+    limiter = RateLimiter(max_concurrency=8)
+    limiter.on_throttle(None)
+    limiter.on_throttle(None)
+    assert limiter.concurrency == 2
+    for _ in range(2):
+        limiter.on_success()
+    assert limiter.concurrency == 3
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.concurrency == 8
+    assert limiter.stats()["throttles"] == 2
+
+
+def test_slots_cap_calls_in_flight():
+    limiter = RateLimiter(max_concurrency=2)
+    in_flight = peak = 0
+
+    async def call():
+        nonlocal in_flight, peak
+        async with limiter.slot():
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    async def run():
+        await asyncio.gather(*(call() for _ in range(10)))
+
+    asyncio.run(run())
+    assert peak == 2
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_retry_after_pauses_every_caller():
+    limiter = RateLimiter(max_concurrency=4)
+    limiter.on_throttle(0.2)
+
+    async def run():
+        started = time.monotonic()
+        async with limiter.slot():
+            return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.15
+
+
+def test_a_slot_freed_on_another_thread_wakes_the_waiter():
+    limiter = RateLimiter(max_concurrency=1)
+    held, release = threading.Event(), threading.Event()
+
+    def holder():
+        async def hold():
+            async with limiter.slot():
+                held.set()
+                while not release.is_set():
+                    await asyncio.sleep(0.01)
+        asyncio.run(hold())
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    held.wait()
+
+    async def wait_for_slot():
+        async with limiter.slot():
+            return time.monotonic()
+
+    threading.Timer(0.1, release.set).start()
+    released = time.monotonic() + 0.1
+    acquired = asyncio.run(asyncio.wait_for(wait_for_slot(), 5))
+    thread.join()
+    assert acquired - released < 0.5
+
+
+def test_retry_after_parsing():
+    assert retry_after_seconds(_ProviderError(429, {"retry-after": "3"})) == 3
+    assert retry_after_seconds(_ProviderError(429, {"retry-after-ms": "1500"})) == 1.5
+    date = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < retry_after_seconds(_ProviderError(429, {"retry-after": date})) <= 30
+    assert retry_after_seconds(_ProviderError(429)) is None
+
+
+def test_retryable_errors():
+    assert is_retryable(_ProviderError(429)) and is_retryable(_ProviderError(529))
+    assert not is_retryable(_ProviderError(400)) and not is_retryable(ValueError())
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    monkeypatch.setattr(client_module, "backoff_delay", lambda attempt: 0)
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 2)
+    return LLMClient()
+
+
+def _flaky(errors: list[Exception]):
+    calls = []
+
+    async def call():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+    return call, calls
+
+
+def test_transient_errors_are_retried(llm):
+    call, calls = _flaky([_ProviderError(503), _ProviderError(429, {"retry-after": "0"})])
+    assert asyncio.run(llm._call_with_retry(call)) == "ok"
+    assert len(calls) == 3
+    assert llm.rate_limiter.stats()["retries"] == 2
+
+
+def test_retries_give_up_after_the_limit(llm):
+    call, calls = _flaky([_ProviderError(503)] * 5)
+    with pytest.raises(_ProviderError):
+        asyncio.run(llm._call_with_retry(call))
+    assert len(calls) == 3
+    assert llm.rate_limiter.stats()["failures"] == 1
+
+
+def test_client_errors_are_not_retried(llm):
+    call, calls = _flaky([_ProviderError(400)])
+    with pytest.raises(_ProviderError):
+        asyncio.run(llm._call_with_retry(call))
+    assert len(calls) == 1
@@ -0,0 +1,82 @@
+import asyncio
+from datetime import datetime
+import pytest
+from fastapi import HTTPException
+from app.api.screening import get_results
+from app.models.candidate import Candidate
+from app.models.session import ScreeningSession
+
+
+def _results(db, session_id: str, **params) -> dict:
+    params = {"limit": 100, "cursor": None, "status": None, "min_score": None, "max_score": None, **params}
+    return asyncio.run(get_results(session_id, db=db, **params))
+
+
+@pytest.fixture
+def session_id(db) -> str:
+    session = ScreeningSession(job_description="t", keep_count=5, status="completed")
+    db.add(session)
+    db.commit()
+    now = datetime.utcnow()
+    rows = (
+        # (passed_dealbreakers, final_score, processed, extraction_warning, prefilter_rule)
+        [(True, 80, True, None, None)] * 4  # Tied scores
+        + [(True, 95, True, None, None), (True, 40, True, None, None), (True, None, True, None, None)]
+        + [(False, 0, True, None, "degree: no mention")] * 3  # Pre-filtered
+        + [(False, 30, True, None, None), (False, None, True, None, None), (None, None, True, None, None)]
+        + [(None, None, False, "Could not extract text", None)] * 2  # Skipped
+        + [(None, None, False, None, None)]  # Not scored yet: never listed
+    )
+    for i, (passed, score, processed, warning, rule) in enumerate(rows):
+        db.add(Candidate(
+            session_id=session.id, filename=f"r{i}.pdf", passed_dealbreakers=passed, final_score=score,
+            processed_at=now if processed else None, extraction_warning=warning, prefilter_rule=rule
+        ))
+    db.commit()
+    return session.id
+
+
+def _all_pages(db, session_id: str, limit: int, **params) -> list[dict]:
+    candidates, cursor = [], None
+    while True:
+        page = _results(db, session_id, limit=limit, cursor=cursor, **params)
+        candidates += page["candidates"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return candidates
+
+
+def test_full_ranking_puts_nulls_last(db, session_id):
+    candidates = _results(db, session_id)["candidates"]
+    assert len(candidates) == 15
+    ranking = [(c["passed_dealbreakers"], c["final_score"], bool(c.get("skipped"))) for c in candidates]
+    assert ranking[:7] == [(True, 95, False)] + [(True, 80, False)] * 4 + [(True, 40, False), (True, 0, False)]
+    assert ranking[7:11] == [(False, 30, False)] + [(False, 0, False)] * 3
+    assert ranking[11] == (False, 0, False)  # NULL score, shown as 0
+    # Unscored rows tie on both ranking columns and are ordered by id
+    assert sorted(ranking[12:], key=str) == [(None, 0, False)] + [(None, None, True)] * 2
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 7])
+def test_pages_neither_skip_nor_repeat_rows(db, session_id, limit):
+    expected = [c["id"] for c in _results(db, session_id)["candidates"]]
+    assert [c["id"] for c in _all_pages(db, session_id, limit)] == expected
+
+
+@pytest.mark.parametrize("status, count", [("qualified", 7), ("rejected", 6), ("skipped", 2)])
+def test_filtered_pages_neither_skip_nor_repeat_rows(db, session_id, status, count):
+    expected = [c["id"] for c in _results(db, session_id, status=status)["candidates"]]
+    assert len(expected) == count
+    assert [c["id"] for c in _all_pages(db, session_id, 2, status=status)] == expected
+
+
+def test_score_range_pages(db, session_id):
+    candidates = _all_pages(db, session_id, 2, min_score=40, max_score=90)
+    assert [c["final_score"] for c in candidates] == [80, 80, 80, 80, 40]
+
+
+def test_page_size_and_invalid_cursor(db, session_id):
+    page = _results(db, session_id, limit=10)
+    assert len(page["candidates"]) == 10 and page["next_cursor"]
+    with pytest.raises(HTTPException):
+        _results(db, session_id, cursor="not-a-cursor")
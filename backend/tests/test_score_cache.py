@@ -0,0 +1,76 @@
+import json
+from datetime import datetime, timedelta
+from sqlmodel import select
+from app.models.cache import ScoreCacheEntry
+from app.models.candidate import Candidate
+from app.models.session import ScreeningSession
+from app.services import batch_processor, job_queue
+from app.services.score_cache import ScoreCache, evict_lru, hash_criteria, hash_text, make_cache_key
+
+CRITERIA = {"version": 1, "categories": [
+    {"id": "skills", "display_name": "Skills", "emoji": "x", "weight": 1.0, "is_dealbreaker": False,
+     "items": [{"text": "Python"}]},
+]}
+RESULT = {"passed_dealbreakers": True, "rejection_reason": None, "final_score": 70, "one_liner": "ok",
+          "category_scores": {"skills": {"score": 70}}, "strengths": [], "concerns": [], "highlights": []}
+
+
+def test_criteria_hash_ignores_key_order_and_whitespace():
+    reordered = json.loads(json.dumps(CRITERIA, indent=4, sort_keys=True))
+    assert hash_criteria(reordered) == hash_criteria(CRITERIA)
+    assert make_cache_key("r", hash_criteria(CRITERIA), "m1") != make_cache_key("r", hash_criteria(CRITERIA), "m2")
+
+
+def test_get_counts_hits_and_misses(db):
+    cache = ScoreCache()
+    assert cache.get(db, "missing") is None
+    cache.put(db, "k", "r", "c", "m", RESULT)
+    db.commit()
+    assert cache.get(db, "k") == RESULT
+    db.commit()
+    entry = db.get(ScoreCacheEntry, "k")
+    assert (cache.hits, cache.misses, entry.hit_count) == (1, 1, 1)
+
+
+def _entry(db, key: str, size: int, age_minutes: int):
+    db.add(ScoreCacheEntry(key=key, resume_hash="r", criteria_hash="c", model="m", result_json="{}",
+                           size_bytes=size, last_used_at=datetime.utcnow() - timedelta(minutes=age_minutes)))
+    db.commit()
+
+
+def test_evict_lru_frees_least_recently_used_down_to_90_percent(db):
+    for i in range(10):
+        _entry(db, f"k{i}", 100, age_minutes=i)  # k9 is the oldest
+    assert evict_lru(db, ScoreCacheEntry, 1000) == (0, 0)
+
+    _entry(db, "new", 100, age_minutes=0)
+    # 1100 bytes against a 1000 limit: evict down to 900
+    assert evict_lru(db, ScoreCacheEntry, 1000) == (2, 200)
+    assert {entry.key for entry in db.exec(select(ScoreCacheEntry))} == {f"k{i}" for i in range(8)} | {"new"}
+
+
+def test_reprocessing_an_unchanged_session_uses_the_cache(db, monkeypatch):
+    calls = []
+
+    async def score(text, criteria, system_prompt=None):
+        calls.append(text)
+        return dict(RESULT), {"input_tokens": 10, "output_tokens": 5}
+
+    monkeypatch.setattr(batch_processor, "score_resume", score)
+    session = ScreeningSession(job_description="t", keep_count=5, criteria_json=json.dumps(CRITERIA), status="processing")
+    db.add(session)
+    db.commit()
+    for i in range(3):
+        db.add(Candidate(session_id=session.id, filename=f"r{i}.pdf", original_text=f"Resume {i}: Python developer"))
+    db.commit()
+
+    for _ in range(2):
+        job = job_queue.enqueue(db, session.id, "interactive")
+        db.commit()
+        assert job_queue.claim_job("runner") == job.id
+        batch_processor.process_job(job.id, "runner")
+
+    db.expire_all()
+    assert len(calls) == 3
+    assert db.get(ScreeningSession, session.id).score_cache_hits == 3
+    assert all(c.final_score == 70 for c in db.exec(select(Candidate)))
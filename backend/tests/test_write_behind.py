@@ -0,0 +1,100 @@
+import json
+import time
+from datetime import datetime
+from sqlmodel import select
+from app.config import settings
+from app.models.candidate import Candidate
+from app.models.job import ScoringJob, WorkItem
+from app.models.session import ScreeningSession
+from app.services import job_queue
+from app.services.batch_processor import _ScoringRun
+
+CRITERIA = {"version": 1, "categories": [
+    {"id": "skills", "display_name": "Skills", "emoji": "x", "weight": 1.0, "is_dealbreaker": False,
+     "items": [{"text": "Python"}]},
+]}
+RESULT = {"passed_dealbreakers": True, "rejection_reason": None, "final_score": 70, "one_liner": "ok",
+          "category_scores": {"skills": {"score": 70}}, "strengths": [], "concerns": [], "highlights": []}
+USAGE = {"input_tokens": 100, "output_tokens": 20}
+
+
+def _run(db, count: int) -> tuple[_ScoringRun, list[tuple[str, str]]]:
+    """A scoring run over a session with a running job, and its (item id, candidate id) pairs."""
+    session = ScreeningSession(job_description="t", keep_count=5, criteria_json=json.dumps(CRITERIA),
+                               status="processing", total_resumes=count)
+    db.add(session)
+    db.commit()
+    candidates = [Candidate(session_id=session.id, filename=f"r{i}.pdf", original_text=f"Resume {i}") for i in range(count)]
+    job = ScoringJob(session_id=session.id, status="running", planned=True, started_at=datetime.utcnow())
+    db.add_all(candidates + [job])
+    db.commit()
+    items = [WorkItem(job_id=job.id, candidate_id=c.id) for c in candidates]
+    db.add_all(items)
+    db.commit()
+    run = _ScoringRun(db, session)
+    run.job_id = job.id
+    run.texts = {c.id: c.original_text for c in candidates}
+    return run, [(item.id, item.candidate_id) for item in items]
+
+
+def test_flush_is_due_after_max_results(db, monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_FLUSH_MAX_RESULTS", 3)
+    monkeypatch.setattr(settings, "RESULT_FLUSH_INTERVAL_MS", 60_000)
+    run, items = _run(db, 3)
+    assert run.flush_wait() is None and not run.flush_due()
+    for item_id, candidate_id in items[:2]:
+        run.buffer(item_id, candidate_id, RESULT, USAGE)
+    assert not run.flush_due()
+    run.buffer(*items[2], RESULT, USAGE)
+    assert run.flush_due()
+
+
+def test_flush_is_due_after_the_interval(db, monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_FLUSH_MAX_RESULTS", 100)
+    monkeypatch.setattr(settings, "RESULT_FLUSH_INTERVAL_MS", 50)
+    run, items = _run(db, 1)
+    run.buffer(*items[0], RESULT, USAGE)
+    assert 0 < run.flush_wait() <= 0.05 and not run.flush_due()
+    time.sleep(0.06)
+    assert run.flush_wait() == 0 and run.flush_due()
+
+
+def test_flush_writes_results_items_and_counters_together(db):
+    run, items = _run(db, 2)
+    claimed = job_queue.claim_items(run.job_id, "a", 2)
+    assert len(claimed) == 2
+    run.buffer(*items[0], RESULT, USAGE)
+    run.buffer(*items[1], None, USAGE, "LLM scoring failed")
+
+    # Nothing reaches the database before the flush
+    db.expire_all()
+    assert db.get(ScreeningSession, run.session.id).processed_count == 0
+    run.flush("a")
+    assert run.pending == [] and run.flush_wait() is None
+
+    db.expire_all()
+    session = db.get(ScreeningSession, run.session.id)
+    assert (session.processed_count, session.qualified_count, session.total_input_tokens) == (1, 1, 200)
+    assert db.get(Candidate, items[0][1]).final_score == 70
+    assert db.get(Candidate, items[1][1]).processed_at is None
+    states = {item.id: item.state for item in db.exec(select(WorkItem))}
+    assert states[items[0][0]] == "done"
+    assert states[items[1][0]] == "pending"  # Retried, attempts remain
+    assert db.get(ScoringJob, run.job_id).tokens_used == 240
+
+
+def test_results_for_lost_leases_are_discarded(db):
+    run, items = _run(db, 2)
+    job_queue.claim_items(run.job_id, "a", 2)
+    # The lease on the second item expired and another runner took it over
+    db.execute(WorkItem.__table__.update().where(WorkItem.id == items[1][0]).values(lease_owner="b"))
+    db.commit()
+    for item in items:
+        run.buffer(*item, RESULT, USAGE)
+    run.flush("a")
+
+    db.expire_all()
+    assert db.get(ScreeningSession, run.session.id).processed_count == 1
+    assert db.get(Candidate, items[0][1]).final_score == 70
+    assert db.get(Candidate, items[1][1]).final_score is None
+    assert db.get(WorkItem, items[1][0]).lease_owner == "b"
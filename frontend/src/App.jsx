@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import UploadZone from './components/upload/UploadZone';
+import UploadZone, { isArchive } from './components/upload/UploadZone';
 import CriteriaChat from './components/criteria/CriteriaChat';
 import ProgressTracker from './components/processing/ProgressTracker';
 import ResultsDashboard from './components/results/ResultsDashboard';
@@ -72,12 +72,24 @@ function App() {
   };
 
   const uploadFiles = async (sid, files) => {
-    const formData = new FormData();
-    files.forEach(f => formData.append('files', f));
-    await fetch(`${API_Base}/screening/${sid}/upload`, {
-      method: 'POST',
-      body: formData
-    });
+    const pdfs = files.filter(f => !isArchive(f));
+    if (pdfs.length > 0) {
+      const formData = new FormData();
+      pdfs.forEach(f => formData.append('files', f));
+      await fetch(`${API_Base}/screening/${sid}/upload`, {
+        method: 'POST',
+        body: formData
+      });
+    }
+    // Archives are unpacked server-side, one entry at a time
+    for (const archive of files.filter(isArchive)) {
+      const formData = new FormData();
+      formData.append('file', archive);
+      await fetch(`${API_Base}/screening/${sid}/upload-archive`, {
+        method: 'POST',
+        body: formData
+      });
+    }
   };
 
   // 2. Refine Criteria
@@ -107,28 +119,47 @@ function App() {
     // Start processing
     try {
       await fetch(`${API_Base}/screening/${sessionId}/process`, { method: 'POST' });
+      setSessionData(prev => ({ ...prev, status: 'processing', processed_count: 0, qualified_count: 0 }));
       setStep('processing');
     } catch (e) {
       alert("Failed to start processing");
     }
   };
 
-  // 3. Poll for Progress
+  // 3. Stream Progress (server-sent events; the browser resumes with Last-Event-ID after a drop)
   useEffect(() => {
-    let interval;
-    if (step === 'processing') {
-      interval = setInterval(async () => {
-        const res = await fetch(`${API_Base}/screening/${sessionId}/results`);
-        const data = await res.json();
-        setResults(data); // data has session and candidates
-        setSessionData(data.session);
-
-        if (data.session.status === 'completed') {
-          clearInterval(interval);
-        }
-      }, 1000);
-    }
-    return () => clearInterval(interval);
+    if (step !== 'processing') return;
+    const events = new EventSource(`${API_Base}/screening/${sessionId}/events`);
+    let finished = false;
+
+    const handleProgress = async (e) => {
+      const progress = JSON.parse(e.data);
+      if (progress.status === 'failed') events.close();
+      if (progress.status !== 'completed') {
+        setSessionData(prev => ({ ...prev, ...progress }));
+        return;
+      }
+      if (finished) return;
+      finished = true;
+      events.close();
+      // Load the ranked results page by page, then show them
+      let data = null;
+      let cursor = null;
+      do {
+        const params = new URLSearchParams({ limit: '500' });
+        if (cursor) params.set('cursor', cursor);
+        const res = await fetch(`${API_Base}/screening/${sessionId}/results?${params}`);
+        const page = await res.json();
+        data = data ? { ...page, candidates: [...data.candidates, ...page.candidates] } : page;
+        cursor = page.next_cursor;
+      } while (cursor);
+      setResults(data);
+      setSessionData(data.session);
+    };
+
+    events.addEventListener('progress', handleProgress);
+    events.addEventListener('status', handleProgress);
+    return () => events.close();
   }, [step, sessionId]);
 
   const handleProcessingComplete = () => {
@@ -193,9 +224,9 @@ function App() {
               />
             )}
 
-            {step === 'processing' && results && (
+            {step === 'processing' && sessionData && (
               <ProgressTracker
-                session={results.session}
+                session={sessionData}
                 onComplete={handleProcessingComplete}
               />
             )}
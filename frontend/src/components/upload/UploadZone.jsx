@@ -2,6 +2,8 @@ import React, { useState, useRef } from 'react';
 import { Upload, X, FileText, ArrowRight, Sparkles, Briefcase, StickyNote } from 'lucide-react';
 import { motion, AnimatePresence } from 'framer-motion';
 
+export const isArchive = (file) => /\.(zip|tar|tar\.gz|tgz)$/i.test(file.name);
+
 export default function UploadZone({ onStart }) {
     const [files, setFiles] = useState([]);
     const [jobDescription, setJobDescription] = useState('');
@@ -29,9 +31,9 @@ export default function UploadZone({ onStart }) {
     };
 
     const handleFiles = (newFiles) => {
-        const validFiles = newFiles.filter(f => f.type === 'application/pdf');
+        const validFiles = newFiles.filter(f => f.type === 'application/pdf' || isArchive(f));
         if (validFiles.length !== newFiles.length) {
-            alert("Only PDF files are supported currently.");
+            alert("Only PDF files and ZIP/tar.gz archives of PDFs are supported.");
         }
         setFiles(prev => [...prev, ...validFiles]);
     };
@@ -133,7 +135,7 @@ export default function UploadZone({ onStart }) {
                         <input
                             type="file"
                             multiple
-                            accept=".pdf"
+                            accept=".pdf,.zip,.tar,.tar.gz,.tgz"
                             className="hidden"
                             ref={fileInputRef}
                             onChange={(e) => e.target.files && handleFiles(Array.from(e.target.files))}
@@ -145,7 +147,7 @@ export default function UploadZone({ onStart }) {
                             </div>
                             <div className="text-center space-y-1">
                                 <p className="font-serif text-xl text-secondary">Drop resumes here</p>
-                                <p className="text-sm text-secondary/50 font-mono">PDFs only supported</p>
+                                <p className="text-sm text-secondary/50 font-mono">PDFs, or a ZIP / tar.gz of PDFs</p>
                             </div>
                         </div>
 